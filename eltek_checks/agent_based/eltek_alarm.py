@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+from cmk.agent_based.v2 import CheckPlugin, Service, Result, State
+
+from cmk_addons.plugins.eltek_checks.agent_based.eltek_check import merge_eltek
+from cmk_addons.plugins.plugin_profiling.lib.profiling import profiled
+
+# Data comes from the alarm group table in the shared "eltek_base_config"
+# sections (both tiers, see eltek_check.py). Inputs of a known kind have their own
+# services (eltek_door, eltek_gene, eltek_comp, clearfield_cab_tmp); every
+# other configured input is an item here, named by its description.
+
+def _other_alarms(section):
+    """Map item -> alarm of the inputs without a dedicated plugin"""
+    alarms = {}
+    for alarm in section.alarms.values():
+        if alarm.kind is not None:
+            continue
+        item = alarm.description
+        if item in alarms:
+            item = f"{item} {alarm.index}"
+        alarms[item] = alarm
+    return alarms
+
+def discover_eltek_alarm(section_eltek_base_config, section_eltek_base_config_slow):
+    section = merge_eltek(section_eltek_base_config, section_eltek_base_config_slow)
+    if section is None:
+        return
+    for item in _other_alarms(section):
+        yield Service(item=item)
+
+def check_eltek_alarm(item, section_eltek_base_config, section_eltek_base_config_slow):
+    section = merge_eltek(section_eltek_base_config, section_eltek_base_config_slow)
+    if section is None:
+        return
+    alarm = _other_alarms(section).get(item)
+    if alarm is None:
+        return
+    if alarm.status == 1:
+        yield Result(state=State.OK, summary="Normal")
+    elif alarm.status is None:
+        yield Result(state=State.UNKNOWN, summary="Alarm status not available")
+    else:
+        yield Result(state=State.WARN, summary=f"Alarm active (status {alarm.status})")
+    if alarm.value is not None:
+        yield Result(state=State.OK, notice=f"Input value: {alarm.value}")
+    yield Result(state=State.OK, notice=f"Alarm input {alarm.index}")
+
+check_plugin_eltek_alarm = CheckPlugin(
+    name = "eltek_alarm",
+    sections = ["eltek_base_config", "eltek_base_config_slow"],
+    service_name = "Eltek Alarm %s",
+    discovery_function = profiled(discover_eltek_alarm),
+    check_function = profiled(check_eltek_alarm),
+)
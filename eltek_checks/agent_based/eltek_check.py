@@ -1,8 +1,37 @@
 #!/usr/bin/env python3
 
+import re
 import struct
+import time
 from datetime import datetime
-from cmk.agent_based.v2 import SimpleSNMPSection, CheckPlugin, Service, Result, State, Metric, check_levels, startswith, SNMPTree
+from typing import NamedTuple
+from cmk.agent_based.v2 import SNMPSection, AgentSection, CheckPlugin, Service, Result, State, Metric, check_levels, get_value_store, render, startswith, contains, all_of, any_of, SNMPTree, OIDEnd
+
+from cmk_addons.plugins.plugin_damping.lib.damping import (
+    Damping, check_damped_levels, damped_level, pending_result, upper_thresholds
+)
+from cmk_addons.plugins.plugin_metrics.lib.metrics import select_metrics
+from cmk_addons.plugins.plugin_profiling.lib.profiling import profiled
+
+# sysDescr and sysObjectID are prefetched by Checkmk for every SNMP host, so
+# conditions on them cost no extra GET during a scan. The SmartPack S
+# controller-type OID is only probed on Eltek devices whose sysDescr does
+# not already name the controller.
+DETECT_ELTEK = all_of(
+    startswith(".1.3.6.1.2.1.1.2.0", ".1.3.6.1.4.1.12148"),
+    any_of(
+        contains(".1.3.6.1.2.1.1.1.0", "SmartPack S"),
+        startswith(".1.3.6.1.4.1.12148.10.13.8.2.1.2.1", "SmartPack S"),
+    ),
+)
+
+# DETECT_ELTEK for the eltek_poller special agent (libexec/agent_eltek_poller):
+# any of the alternatives, each a tuple of (OID, regular expression) that
+# must all match, case-insensitive like Checkmk
+POLLER_DETECT_ELTEK = (
+    ((".1.3.6.1.2.1.1.2.0", r"\.1\.3\.6\.1\.4\.1\.12148.*"), (".1.3.6.1.2.1.1.1.0", r".*SmartPack S.*")),
+    ((".1.3.6.1.2.1.1.2.0", r"\.1\.3\.6\.1\.4\.1\.12148.*"), (".1.3.6.1.4.1.12148.10.13.8.2.1.2.1", r"SmartPack S.*")),
+)
 
 def decode_byte_string_to_datetime(byte_string):
     try:
@@ -35,134 +64,552 @@ temp_unitsym = {
     "k": "K",
 }
 
+# ------------------------
+# Sections: one row of scalar OIDs plus the rectifier, mains phase and
+# alarm group tables, in two tiers
+# ------------------------
+
+# Values that change within minutes (statuses, currents, voltages, runtime)
+# are in the section eltek_base_config, fetched every check interval.
+# Values that drift slowly or never change (battery health, fuse, rectifier
+# capacity and temperatures, descriptions, alarm input values such as the
+# cabinet temperature) are in eltek_base_config_slow, which the rule "Fetch
+# intervals for SNMP sections" can fetch every 15-30 minutes; Checkmk
+# caches it in between. Both tiers carry sysUpTime, so the age of the slow
+# values is known without any state. The plugins merge both tiers with
+# merge_eltek().
+
+class Field(NamedTuple):
+    """One OID of the section: record attribute, OID below the base, type, scale, tier"""
+    name: str
+    oid: str
+    type: type = str
+    scale: int = 1
+    slow: bool = False
+
+# Drive both the trees below (fetched by the SNMP sections and the eltek_poller
+# special agent) and the records returned by merge_eltek.
+# Status OIDs report 1 for normal. Static controller data (model, serial,
+# battery test time) is fetched by the inventory (eltek_inventory.py), not
+# every check interval.
+ELTEK_BASE = ".1.3.6.1.4.1.12148.10"
+ELTEK_FIELDS = (
+    Field("battery_fuse_status", "10.4.0", int, slow=True), # Battery Fuse Status
+    Field("battery_current", "10.6.5.0", int),              # Battery Current
+    Field("battery_health", "10.12.5.0", int, slow=True),   # Battery Health Value
+    Field("battery_current_status", "10.6.1.0", int),       # Battery Current Status
+    Field("battery_temp", "10.7.5.0", int),                 # Battery Temp
+    Field("battery_status", "10.1.0", int),                 # Battery Status
+    Field("rectifier_capacity", "5.3.5.0", int, slow=True), # Rectifier Capacity (%)
+    Field("rectifier_error_status", "5.4.1.0", int),        # Rectifier Error Status
+    Field("rectifier_status", "5.1.0", int),                # Rectifier Status
+    Field("rectifier_temp", "5.18.5.0", int),               # Rectifier Temp
+    Field("battery_runtime", "10.8.5.0", int),              # Battery Runtime (minutes)
+    Field("site_info", "2.7.0", slow=True),                 # System Serial Number, used for site notes
+)
+
+# Rectifier table, one row per shelf slot (indexed by OIDEnd)
+RECTIFIER_TABLE = f"{ELTEK_BASE}.5.6.1"
+RECTIFIER_FIELDS = (
+    Field("status", "2", int),                  # Rectifier Status
+    Field("current", "3", int),                 # Rectifier Output Current (A)
+    Field("temperature", "5", int, slow=True),  # Rectifier Temperature
+)
+
+# Mains table, one row per phase (indexed by OIDEnd)
+MAINS_TABLE = f"{ELTEK_BASE}.3.4.1"
+MAINS_FIELDS = (
+    Field("status", "2", int),                  # Mains Phase Status
+    Field("description", "3", slow=True),       # Mains Phase Description
+    Field("voltage", "6", int),                 # Mains Phase Voltage (V)
+)
+
+# Alarm group table, one row per alarm input, indexed by OIDEnd
+# "<group>.<input>" (the controllers here have a single group, 1)
+ALARM_TABLE = f"{ELTEK_BASE}.11.2.1"
+ALARM_FIELDS = (
+    Field("status", "2", int),                  # Alarm Status (1 = normal)
+    Field("description", "3", slow=True),       # Alarm Description, set by the installer
+    Field("value", "6", int, slow=True),        # Alarm Input Value
+)
+
+ELTEK_TABLES = (
+    (RECTIFIER_TABLE, RECTIFIER_FIELDS),
+    (MAINS_TABLE, MAINS_FIELDS),
+    (ALARM_TABLE, ALARM_FIELDS),
+)
+
+class Tree(NamedTuple):
+    """One SNMPTree as plain data, also fetched by the eltek_poller special agent"""
+    base: str
+    oids: tuple
+    indexed: bool = False   # a table, OIDEnd() ahead of oids
+
+    def snmp_tree(self):
+        return SNMPTree(base=self.base, oids=[OIDEnd(), *self.oids] if self.indexed else list(self.oids))
+
+# sysUpTime (1/100 s), last tree of both tiers
+UPTIME_TREE = Tree(".1.3.6.1.2.1.1", ("3.0",))
+UPTIME_WRAP = 2**32
+
+# Known inputs, recognised by their description wherever they are wired
+ALARM_KINDS = (
+    (re.compile(r"^cabinet temp", re.IGNORECASE), "cabinet_temp"),
+    (re.compile(r"^commercial power", re.IGNORECASE), "commercial_power"),
+    (re.compile(r"^generator", re.IGNORECASE), "generator"),
+    (re.compile(r"\bdoor\b", re.IGNORECASE), "door"),
+)
+# Where the door input was wired on our controllers before descriptions
+# were used; only used if it has no description and no input is
+# described as a door. Input 6 of group 1, the OID polled before the
+# table was walked: .1.3.6.1.4.1.12148.10.11.2.1.2.1.6
+LEGACY_DOOR_INDEX = "1.6"
+
+class EltekRectifier(NamedTuple):
+    index: str
+    status: int | None
+    current: int | None
+    temperature: int | None
+
+class EltekMainsPhase(NamedTuple):
+    index: str
+    status: int | None
+    description: str | None
+    voltage: int | None
+
+class EltekAlarm(NamedTuple):
+    index: str
+    status: int | None
+    description: str | None
+    value: int | None
+    kind: str | None
+
+class EltekTier(NamedTuple):
+    """Parsed eltek_base_config or eltek_base_config_slow"""
+    uptime: int | None  # sysUpTime when the tier was fetched (1/100 s)
+    values: list        # values of the tier's scalar fields
+    tables: tuple       # per table: {index: values of the tier's columns}
+    merged: list        # fast tier: [slow tier, EltekSection] of the last merge_eltek()
+
+EltekSection = NamedTuple(
+    "EltekSection",
+    [(f.name, f.type | None) for f in ELTEK_FIELDS]
+    + [("rectifiers", dict), ("mains_phases", dict), ("alarms", dict), ("slow_data_age", float | None)],
+)
+
+def _converter(field):
+    """Function converting one raw value, raising ValueError if malformed"""
+    if field.type is str:
+        return lambda raw: raw or None
+    if field.scale != 1:
+        return lambda raw: field.type(raw) / field.scale
+    return field.type
+
+def _tier(fields, slow):
+    return tuple(field for field in fields if field.slow is slow)
+
+def _tier_converters(slow):
+    """(scalar converters, converters per table) of a tier"""
+    return (
+        tuple(_converter(field) for field in _tier(ELTEK_FIELDS, slow)),
+        tuple(tuple(_converter(field) for field in _tier(fields, slow)) for _base, fields in ELTEK_TABLES),
+    )
+
+_TIER_CONVERTERS = {slow: _tier_converters(slow) for slow in (False, True)}
+
+def _tier_trees(slow):
+    return (
+        Tree(ELTEK_BASE, tuple(field.oid for field in _tier(ELTEK_FIELDS, slow))),
+        *(Tree(base, tuple(field.oid for field in _tier(fields, slow)), indexed=True) for base, fields in ELTEK_TABLES),
+        UPTIME_TREE,
+    )
+
+# The trees of eltek_base_config and eltek_base_config_slow
+ELTEK_TREES = _tier_trees(slow=False)
+ELTEK_SLOW_TREES = _tier_trees(slow=True)
+
+def _convert(convert, raw):
+    try:
+        return convert(raw)
+    except ValueError:
+        return None
+
+def _convert_row(converters, row):
+    """Values of one row, None where missing or malformed"""
+    if len(row) < len(converters):
+        row = row + [""] * (len(converters) - len(row))
+    try:
+        return [convert(raw) for convert, raw in zip(converters, row)]
+    except ValueError:
+        return [_convert(convert, raw) for convert, raw in zip(converters, row)]
+
+def _parse_tier(string_table, slow):
+    scalar_table, *tables, uptime_table = string_table
+    if not scalar_table and not any(tables):
+        return None
+    scalar_converters, table_converters = _TIER_CONVERTERS[slow]
+    uptime = _convert_row((int,), uptime_table[0])[0] if uptime_table else None
+    return EltekTier(
+        uptime=uptime,
+        values=_convert_row(scalar_converters, scalar_table[0] if scalar_table else []),
+        tables=tuple(
+            {row[0]: _convert_row(converters, row[1:]) for row in table if row}
+            for converters, table in zip(table_converters, tables)
+        ),
+        merged=[],
+    )
+
+# Values that are missing or malformed are None; no section at all if the
+# controller answered none of the OIDs of the tier.
 def parse_eltek(string_table):
-    result = {}
-    result["controller_type"] = string_table[0][0]
-    result["battery_fuse_status"] = string_table[0][1]
-    result["battery_current"] = string_table[0][2]
-    result["battery_health"] = string_table[0][3]
-    result["battery_current_status"] = string_table[0][4]
-    result["battery_temp"] = string_table[0][5]
-    result["battery_status"] = string_table[0][6]
-    result["mains_voltage"] = string_table[0][7]
-    result["rectifier_1_status"] = string_table[0][8]
-    result["rectifier_2_status"] = string_table[0][9]
-    result["rectifier_capacity"] = string_table[0][10]
-    result["rectifier_error_status"] = string_table[0][11]
-    result["rectifier_status"] = string_table[0][12]
-    result["rectifier_temp"] = string_table[0][13]
-    result["battery_runtime"] = string_table[0][14]
-    result["last_battery_test_time"] = string_table[0][15]
-    result["clearfield_cab_temp"] = string_table[0][16]
-    return result
-
-def discover_eltek(section):
-    yield Service()
-
-def check_eltek(section):
-    battery_runtime = int(section["battery_runtime"])
-    runtime_hours = battery_runtime // 60
-    runtime_minutes = battery_runtime % 60
+    return _parse_tier(string_table, slow=False)
+
+def parse_eltek_slow(string_table):
+    return _parse_tier(string_table, slow=True)
+
+# ------------------------
+# Merging the tiers
+# ------------------------
+
+def _merge_values(fields, fast_values, slow_values):
+    """Values in the order of fields, picked from the values of both tiers"""
+    fast_values, slow_values = iter(fast_values), iter(slow_values)
+    return [next(slow_values, None) if field.slow else next(fast_values, None) for field in fields]
+
+def _merge_rows(fields, fast_rows, slow_rows):
+    """{index: values in the order of fields}, rows of either tier"""
+    return {
+        index: _merge_values(fields, fast_rows.get(index, ()), slow_rows.get(index, ()))
+        for index in {**fast_rows, **slow_rows}
+    }
+
+def alarm_kind(description):
+    for pattern, kind in ALARM_KINDS:
+        if pattern.search(description):
+            return kind
+    return None
+
+def _alarms(rows):
+    """Configured alarm inputs (those with a description) by index"""
+    alarms = {}
+    legacy_door = None
+    for index, (status, description, value) in rows.items():
+        description = (description or "").strip()
+        if not description:
+            if index == LEGACY_DOOR_INDEX:
+                legacy_door = EltekAlarm(index, status, "Cabinet Door", value, "door")
+            continue
+        alarms[index] = EltekAlarm(index, status, description, value, alarm_kind(description))
+    if legacy_door is not None and not any(alarm.kind == "door" for alarm in alarms.values()):
+        alarms[LEGACY_DOOR_INDEX] = legacy_door
+    return alarms
+
+def _slow_data_age(fast, slow):
+    """Seconds between the fetches of both tiers, None if unknown
+
+    None as well if the controller restarted since the slow tier was read
+    (its uptime is larger than the current one).
+    """
+    if slow is None or fast.uptime is None or slow.uptime is None:
+        return None
+    ticks = (fast.uptime - slow.uptime) % UPTIME_WRAP
+    return ticks / 100 if ticks < UPTIME_WRAP // 2 else None
+
+def merge_eltek(section_eltek_base_config, section_eltek_base_config_slow):
+    """The EltekSection of both tiers, None without the fast tier
+
+    Values of a missing slow tier are None, and so is slow_data_age.
+    Every Eltek plugin of a host merges the same two parsed sections, for
+    discovery and for each item. The merge is kept in the parsed fast tier,
+    which belongs to one host, and reused while the slow tier is the same.
+    """
+    fast, slow = section_eltek_base_config, section_eltek_base_config_slow
+    if fast is None:
+        return None
+    if fast.merged and fast.merged[0] is slow:
+        return fast.merged[1]
+
+    no_slow = EltekTier(None, [], ({}, {}, {}), [])
+    slow_tier = no_slow if slow is None else slow
+    rectifiers, mains_phases, alarm_rows = (
+        _merge_rows(fields, fast_rows, slow_rows)
+        for (_base, fields), fast_rows, slow_rows in zip(ELTEK_TABLES, fast.tables, slow_tier.tables)
+    )
+    section = EltekSection._make(
+        _merge_values(ELTEK_FIELDS, fast.values, slow_tier.values)
+        + [
+            {index: EltekRectifier(index, *values) for index, values in rectifiers.items()},
+            {index: EltekMainsPhase(index, *values) for index, values in mains_phases.items()},
+            _alarms(alarm_rows),
+            _slow_data_age(fast, slow),
+        ]
+    )
+    fast.merged[:] = [slow, section]
+    return section
+
+# Core sites have an external generator, not controlled by the Eltek. The
+# installers note it in the serial number field (site_info).
+def site_has_generator(site_info):
+    return "generator" in (site_info or "").lower()
+
+def find_alarm(section, kind):
+    """The first alarm input of a known kind, or None"""
+    for alarm in section.alarms.values():
+        if alarm.kind == kind:
+            return alarm
+    return None
+
+def missing_values(record, names):
+    """UNKNOWN result naming the attributes of record that are None, else None
+
+    Used by checks that cannot say anything sensible without these values,
+    e.g. while a firmware update leaves parts of the MIB empty.
+    """
+    missing = [name.replace("_", " ") for name in names if getattr(record, name) is None]
+    if not missing:
+        return None
+    summary = f"{len(missing)} values" if len(missing) > 3 else ", ".join(missing)
+    return Result(
+        state=State.UNKNOWN,
+        summary=f"{summary} not available from the controller",
+        details="Not available: " + ", ".join(missing),
+    )
+
+def _phase_name(phase):
+    return phase.description or f"Phase {phase.index}"
+
+# The slow tier is expected to be fetched every 15-30 minutes
+SLOW_DATA_AGE_LEVELS = ("fixed", (3600.0, 7200.0))
+# Slow-tier values the health conditions use
+SLOW_CONDITIONS = ("battery_fuse_status", "battery_health", "rectifier_capacity")
+
+# Thresholds of the health conditions. Mains voltage, battery current,
+# rectifier capacity and the temperatures flap around them during
+# brown-outs, so they are damped (see plugin_damping/lib/damping.py) with
+# the hysteresis and delay of the check parameters.
+MAINS_DOWN_VOLTAGE = 100            # V, a phase at or below is down
+BATTERY_CHARGING_CURRENT = 20       # A
+RECTIFIER_CAPACITY_HIGH = 51        # %, over 50 %
+RECTIFIER_TEMP_HIGH = 170
+TEMP_LEVELS = ("fixed", (125, 140)) # Battery and cabinet temperature
+
+def _render_temp(value):
+    return f"{value:.2f}"
+
+def discover_eltek(section_eltek_base_config, section_eltek_base_config_slow):
+    if section_eltek_base_config is not None:
+        yield Service()
+
+def check_eltek(params, section_eltek_base_config, section_eltek_base_config_slow):
+    section = merge_eltek(section_eltek_base_config, section_eltek_base_config_slow)
+    if section is None:
+        return
+    # Without the fast values there is nothing to check. Missing slow
+    # values (the slow tier not fetched yet, or dropped from the cache)
+    # only skip their own conditions, so they do not hide fast-tier alarms.
+    unknown = missing_values(section, [field.name for field in _tier(ELTEK_FIELDS, slow=False)])
+    if unknown is not None:
+        yield unknown
+        return
+
+    value_store = get_value_store()
+    now = time.time()
+    mains, charging, capacity, temperature = (
+        Damping.from_params(params[name])
+        for name in ("mains", "battery_charging", "rectifier_capacity", "temperature")
+    )
+    pending = []
+
+    runtime_hours, runtime_minutes = divmod(section.battery_runtime, 60)
     error_status = False
-    mains_down = False
-    battery_temp = int(section["battery_temp"])
-    clearfield_cab_temp = int(section["clearfield_cab_temp"])
+    # Running on batteries once every phase is down; a single lost phase
+    # is only a warning
+    phases = [phase for phase in section.mains_phases.values() if phase.voltage is not None]
+    phases_down = []
+    for phase in phases:
+        damped = damped_level(
+            value_store, f"mains.{phase.index}", phase.voltage, (MAINS_DOWN_VOLTAGE,), mains, now, lower=True
+        )
+        pending.append(pending_result(damped, mains, f"Mains {_phase_name(phase)} down", f"Mains {_phase_name(phase)} back"))
+        if damped.level:
+            phases_down.append(phase)
+    mains_down = bool(phases) and len(phases_down) == len(phases)
 
-    if int(section["mains_voltage"]) <= 100:
+    battery_charging = damped_level(
+        value_store, "battery_charging", section.battery_current, (BATTERY_CHARGING_CURRENT,), charging, now
+    )
+    pending.append(pending_result(battery_charging, charging, "Battery charging", "Battery charging ended"))
+    rectifier_capacity = None
+    if section.rectifier_capacity is not None:
+        rectifier_capacity = damped_level(
+            value_store, "rectifier_capacity", section.rectifier_capacity, (RECTIFIER_CAPACITY_HIGH,), capacity, now
+        )
+        pending.append(
+            pending_result(rectifier_capacity, capacity, "Rectifier capacity over 50%", "Rectifier capacity back to normal")
+        )
+    rectifier_temp = damped_level(
+        value_store, "rectifier_temp", section.rectifier_temp, (RECTIFIER_TEMP_HIGH,), temperature, now
+    )
+    pending.append(pending_result(rectifier_temp, temperature, "Rectifier temperature high", "Rectifier temperature normal"))
+    battery_temp = damped_level(
+        value_store, "battery_temp", section.battery_temp, upper_thresholds(TEMP_LEVELS), temperature, now
+    )
+    pending.append(pending_result(battery_temp, temperature, "Battery temperature rising", "Battery temperature falling"))
+
+    if mains_down:
         yield Result(state=State.WARN, summary=f"Power Outage - Running on Batt - {runtime_hours}h {runtime_minutes}m left")
         error_status = True
-        mains_down = True
+    else:
+        for phase in phases_down:
+            yield Result(state=State.WARN, summary=f"Mains {_phase_name(phase)} is Down")
+            error_status = True
 
     if not mains_down:
-        if section["battery_fuse_status"] != "1":
+        if section.battery_fuse_status not in (None, 1):
             yield Result(state=State.WARN, summary="Battery Fuse is Open")
             error_status = True
-        if int(section["battery_current"]) >= 20:
+        if battery_charging.level:
             yield Result(state=State.WARN, summary="Battery Charging")
             error_status = True
-        if int(section["battery_health"]) < 90:
+        if section.battery_health is not None and section.battery_health < 90:
             yield Result(state=State.WARN, summary="Battery Health Less than 100%")
             error_status = True
-        if section["battery_current_status"] != "1":
+        if section.battery_current_status != 1:
             yield Result(state=State.WARN, summary="Battery Current is Abnormal")
             error_status = True
-        if section["battery_status"] != "1":
+        if section.battery_status != 1:
             yield Result(state=State.WARN, summary="Battery status is Abnormal")
             error_status = True
-        #if section["rectifier_1_status"] != "1":
-        #    yield Result(state=State.CRIT, summary="Rectifier 1 is Faulty")
-        #    error_status = True
-        #if section["rectifier_2_status"] != "1":
-        #    yield Result(state=State.CRIT, summary="Rectifier 2 is Faulty")
-        #    error_status = True
-        if int(section["rectifier_capacity"]) > 50:
+        if rectifier_capacity is not None and rectifier_capacity.level:
             yield Result(state=State.WARN, summary="Rectifier Capacity is Over 50%")
             error_status = True
-        if section["rectifier_error_status"] != "1":
+        if section.rectifier_error_status != 1:
             yield Result(state=State.WARN, summary="Rectifier Error")
             error_status = True
-        if section["rectifier_status"] != "1":
+        if section.rectifier_status != 1:
             yield Result(state=State.WARN, summary="Rectifier Status is Critical")
             error_status = True
 
-    if int(section["rectifier_temp"]) >= 170:
+    if rectifier_temp.level:
         yield Result(state=State.WARN, summary="Rectifier Temp is High")
         error_status = True
-    if int(section["battery_temp"]) >= 125:
+    if battery_temp.level:
         yield Result(state=State.WARN, summary="Battery Temp is High")
         error_status = True
     if not error_status:
         yield Result(state=State.OK, summary="Eltek Check Ok")
 
     # BATTERY
-    yield from check_levels(
-        value=battery_temp,
-        levels_upper=("fixed", (125, 140)),
+    yield from check_damped_levels(
+        battery_temp,
+        section.battery_temp,
+        TEMP_LEVELS,
         metric_name="battery_temp",
+        render_func=_render_temp,
         label="Battery Temperature",
         boundaries=(0, 150),
     )
+    # MAINS
+    for phase in phases:
+        yield Metric(f"mains_voltage_{phase.index}", phase.voltage)
     # CLEARFIELD CAB TEMP
-    yield from check_levels(
-        value=clearfield_cab_temp,
-        levels_upper=("fixed", (125, 140)),
-        metric_name="clearfield_cab_temp",
-        label="Cab Temp",
-        boundaries = (0, 200),
-    )
+    cabinet_temp = find_alarm(section, "cabinet_temp")
+    if cabinet_temp is not None and cabinet_temp.value is not None:
+        cabinet_level = damped_level(
+            value_store, "cabinet_temp", cabinet_temp.value, upper_thresholds(TEMP_LEVELS), temperature, now
+        )
+        pending.append(pending_result(cabinet_level, temperature, "Cab temperature rising", "Cab temperature falling"))
+        yield from check_damped_levels(
+            cabinet_level,
+            cabinet_temp.value,
+            TEMP_LEVELS,
+            metric_name="clearfield_cab_temp",
+            render_func=_render_temp,
+            label="Cab Temp",
+            boundaries = (0, 200),
+        )
+    # DAMPED CONDITIONS
+    yield from (result for result in pending if result is not None)
+    # SLOW TIER
+    missing_slow = [name for name in SLOW_CONDITIONS if getattr(section, name) is None]
+    if missing_slow:
+        yield Result(
+            state=State.OK,
+            notice="Not checked, not available from the controller: "
+            + ", ".join(name.replace("_", " ") for name in missing_slow),
+        )
+    if section_eltek_base_config_slow is None:
+        yield Result(state=State.OK, notice="Slow values not available")
+    elif section.slow_data_age is None:
+        yield Result(state=State.OK, notice="Age of the slow values unknown (controller restarted since they were read)")
+    else:
+        yield from check_levels(
+            value=section.slow_data_age,
+            levels_upper=SLOW_DATA_AGE_LEVELS,
+            metric_name="eltek_slow_data_age",
+            render_func=render.timespan,
+            label="Age of the slow values",
+            notice_only=True,
+        )
 
-snmp_section_eltek_base_config = SimpleSNMPSection(
+snmp_section_eltek_base_config = SNMPSection(
     name = "eltek_base_config",
-    parse_function = parse_eltek,
-    detect = startswith(".1.3.6.1.4.1.12148.10.13.8.2.1.2.1", "SmartPack S"),
-    fetch = SNMPTree(
-        base='.1.3.6.1.4.1.12148.10',
-        oids=[
-            '13.8.2.1.2.1',     # SmartPack S
-            '10.4.0',           # Battery Fuse Status
-            '10.6.5.0',         # Battery Current
-            '10.12.5.0',        # Battery Health Value
-            '10.6.1.0',         # Battery Current Status
-            '10.7.5.0',         # Battery Temp
-            '10.1.0',           # Battery Status
-            '3.4.1.6.1',        # Mains Voltage
-            '5.6.1.2.1',        # Rectifier 1 Status
-            '5.6.1.2.2',        # Rectifier 2 Status
-            '5.3.5.0',          # Rectifier Capacity (%)
-            '5.4.1.0',          # Rectifier Error Status
-            '5.1.0',            # Rectifier Status
-            '5.18.5.0',         # Rectifier Temp
-            '10.8.5.0',         # Battery Runtime
-            '10.16.4.1.2.1',    # Last Battery Test Time
-            '11.2.1.6.1.7',     # Temp Relay - Clearfield Cabs
-        ]
-    ),
+    parse_function = profiled(parse_eltek),
+    detect = DETECT_ELTEK,
+    fetch = [tree.snmp_tree() for tree in ELTEK_TREES],
+)
+
+snmp_section_eltek_base_config_slow = SNMPSection(
+    name = "eltek_base_config_slow",
+    parse_function = profiled(parse_eltek_slow),
+    detect = DETECT_ELTEK,
+    fetch = [tree.snmp_tree() for tree in ELTEK_SLOW_TREES],
 )
 
+# The eltek_poller special agent (libexec/agent_eltek_poller) delivers the
+# same tables as piggyback data, each line prefixed with the number of its
+# tree
+def _poller_tables(string_table, trees):
+    tables = [[] for _ in trees]
+    for line in string_table:
+        if line and line[0].isdigit() and int(line[0]) < len(tables):
+            tables[int(line[0])].append(line[1:])
+    return tables
+
+def parse_eltek_poller(string_table):
+    return parse_eltek(_poller_tables(string_table, ELTEK_TREES))
+
+def parse_eltek_slow_poller(string_table):
+    return parse_eltek_slow(_poller_tables(string_table, ELTEK_SLOW_TREES))
+
+agent_section_eltek_base_config_poller = AgentSection(
+    name = "eltek_base_config_poller",
+    parsed_section_name = "eltek_base_config",
+    parse_function = profiled(parse_eltek_poller),
+)
+
+agent_section_eltek_base_config_slow_poller = AgentSection(
+    name = "eltek_base_config_slow_poller",
+    parsed_section_name = "eltek_base_config_slow",
+    parse_function = profiled(parse_eltek_slow_poller),
+)
+
+# Graphed on the site dashboards
+ESSENTIAL_METRICS = ("battery_temp", "clearfield_cab_temp")
+
 check_plugin_eltek_check = CheckPlugin(
     name = "eltek_check",
-    sections = ["eltek_base_config"],
+    sections = ["eltek_base_config", "eltek_base_config_slow"],
     service_name = "Eltek Health",
-    discovery_function = discover_eltek,
-    check_function = check_eltek,
+    discovery_function = profiled(discover_eltek),
+    check_function = profiled(select_metrics(check_eltek, ESSENTIAL_METRICS)),
+    check_default_parameters = {
+        "metrics": "full",
+        # Hysteresis in the unit of the value (V, A, %, degrees), delay in seconds
+        "mains": {"hysteresis": 10.0, "delay": 120.0},
+        "battery_charging": {"hysteresis": 5.0, "delay": 300.0},
+        "rectifier_capacity": {"hysteresis": 5.0, "delay": 300.0},
+        "temperature": {"hysteresis": 3.0, "delay": 300.0},
+    },
+    check_ruleset_name = "eltek_check",
 )
@@ -1,41 +1,44 @@
 #!/usr/bin/env python3
-from cmk.agent_based.v2 import SimpleSNMPSection, CheckPlugin, Service, Result, State, startswith, SNMPTree
+from cmk.agent_based.v2 import CheckPlugin, Service, Result, State
 
-def parse_eltek(string_table):
-    result = {}
-    result["clearfield_cab_tmp"] = string_table[0][0]
-    return result
+from cmk_addons.plugins.eltek_checks.agent_based.eltek_check import find_alarm, merge_eltek
+from cmk_addons.plugins.plugin_profiling.lib.profiling import profiled
 
-def discover_eltek(section):
-    yield Service()
+# Data comes from the alarm input whose description starts with "Cabinet Temp"
+# in the shared "eltek_base_config" sections (both tiers, see eltek_check.py).
+# The input value is in the slow tier.
 
-def check_eltek(section):
+def discover_eltek(section_eltek_base_config, section_eltek_base_config_slow):
+    section = merge_eltek(section_eltek_base_config, section_eltek_base_config_slow)
+    if section is None:
+        return
+    if find_alarm(section, "cabinet_temp") is not None:
+        yield Service()
+
+def check_eltek(section_eltek_base_config, section_eltek_base_config_slow):
+    section = merge_eltek(section_eltek_base_config, section_eltek_base_config_slow)
+    if section is None:
+        return
+    cabinet_temp = find_alarm(section, "cabinet_temp")
+    if cabinet_temp is None:
+        return
+    if cabinet_temp.value is None:
+        yield Result(state=State.UNKNOWN, summary="Clearfield Cabinet Temp not available")
+        return
     error_status = False
-    if int(section["clearfield_cab_tmp"]) >= 142:
+    if cabinet_temp.value >= 142:
         yield Result(state=State.WARN, summary="Clearfield Cabinet Temp is High >142f")
         error_status = True
-    if int(section["clearfield_cab_tmp"]) >= 148:
+    if cabinet_temp.value >= 148:
         yield Result(state=State.CRIT, summary="Clearfield Cabinet Temp is High >148f")
         error_status = True
     if not error_status:
         yield Result(state=State.OK, summary="Clearfield Cabinet Temp is OK")
 
-snmp_section_clearfield_cab_tmp_config = SimpleSNMPSection(
-    name = "clearfield_cab_tmp_config",
-    parse_function = parse_eltek,
-    detect = startswith(".1.3.6.1.4.1.12148.10.11.2.1.3.1.7", "Cabinet Temp"),
-    fetch = SNMPTree(
-        base='.1.3.6.1.4.1.12148.10',
-        oids=[
-            '11.2.1.6.1.7',     # Temp Relay - Clearfield Cabs
-        ]
-    ),
-)
-
 check_plugin_clearfield_cab_tmp = CheckPlugin(
     name = "clearfield_cab_tmp",
-    sections = ["clearfield_cab_tmp_config"],
+    sections = ["eltek_base_config", "eltek_base_config_slow"],
     service_name = "ClearField Cabinet Temp",
-    discovery_function = discover_eltek,
-    check_function = check_eltek,
+    discovery_function = profiled(discover_eltek),
+    check_function = profiled(check_eltek),
 )
@@ -1,38 +1,40 @@
 #!/usr/bin/env python3
-from cmk.agent_based.v2 import SimpleSNMPSection, CheckPlugin, Service, Result, State, startswith, SNMPTree
+from cmk.agent_based.v2 import CheckPlugin, Service, Result, State
 
-def parse_eltek(string_table):
-    result = {}
-    result["eltek_comp"] = string_table[0][0]
-    return result
+from cmk_addons.plugins.eltek_checks.agent_based.eltek_check import find_alarm, merge_eltek
+from cmk_addons.plugins.plugin_profiling.lib.profiling import profiled
 
-def discover_eltek(section):
-    yield Service()
+# Data comes from the alarm input whose description starts with "Commercial Power"
+# in the shared "eltek_base_config" sections (both tiers, see eltek_check.py)
 
-def check_eltek(section):
+def discover_eltek(section_eltek_base_config, section_eltek_base_config_slow):
+    section = merge_eltek(section_eltek_base_config, section_eltek_base_config_slow)
+    if section is None:
+        return
+    if find_alarm(section, "commercial_power") is not None:
+        yield Service()
+
+def check_eltek(section_eltek_base_config, section_eltek_base_config_slow):
+    section = merge_eltek(section_eltek_base_config, section_eltek_base_config_slow)
+    if section is None:
+        return
+    power = find_alarm(section, "commercial_power")
+    if power is None:
+        return
+    if power.status is None:
+        yield Result(state=State.UNKNOWN, summary="Commerical Power alarm status not available")
+        return
     error_status = False
-    if section["eltek_comp"] != "1":
+    if power.status != 1:
         yield Result(state=State.WARN, summary="Commerical Power Alarm!")
         error_status = True
     if not error_status:
         yield Result(state=State.OK, summary="Commerical Power is good.")
 
-snmp_section_eltek_comp_config = SimpleSNMPSection(
-    name = "eltek_comp_config",
-    parse_function = parse_eltek,
-    detect = startswith(".1.3.6.1.4.1.12148.10.11.2.1.3.1.8", "Commercial Power"),
-    fetch = SNMPTree(
-        base='.1.3.6.1.4.1.12148.10',
-        oids=[
-            '11.2.1.2.1.8',     #Commerical Power Monitor
-        ]
-    ),
-)
-
 check_plugin_eltek_comp = CheckPlugin(
     name = "eltek_comp",
-    sections = ["eltek_comp_config"],
+    sections = ["eltek_base_config", "eltek_base_config_slow"],
     service_name = "Commerical Power",
-    discovery_function = discover_eltek,
-    check_function = check_eltek,
+    discovery_function = profiled(discover_eltek),
+    check_function = profiled(check_eltek),
 )
@@ -1,5 +1,8 @@
 #!/usr/bin/env python3
-from cmk.agent_based.v2 import SimpleSNMPSection, CheckPlugin, Service, Result, State, startswith, SNMPTree
+from cmk.agent_based.v2 import CheckPlugin, Service, Result, State
+
+from cmk_addons.plugins.eltek_checks.agent_based.eltek_check import find_alarm, merge_eltek
+from cmk_addons.plugins.plugin_profiling.lib.profiling import profiled
 
 import datetime
 
@@ -14,45 +17,44 @@ def is_business_hours(now: datetime.datetime) -> bool:
     return BUSINESS_START <= now.hour < BUSINESS_END
 
 
-def parse_eltek(string_table):
-    result = {}
-    result["eltek_door"] = string_table[0][0]
-    return result
-
-def discover_eltek(section):
-    yield Service()
-
-def check_eltek(section):
+# Data comes from the alarm input described as a door in the shared
+# "eltek_base_config" sections (both tiers, see eltek_check.py)
+
+def discover_eltek(section_eltek_base_config, section_eltek_base_config_slow):
+    section = merge_eltek(section_eltek_base_config, section_eltek_base_config_slow)
+    if section is None:
+        return
+    if find_alarm(section, "door") is not None:
+        yield Service()
+
+def check_eltek(section_eltek_base_config, section_eltek_base_config_slow):
+    section = merge_eltek(section_eltek_base_config, section_eltek_base_config_slow)
+    if section is None:
+        return
+    door = find_alarm(section, "door")
+    if door is None:
+        return
+    if door.status is None:
+        yield Result(state=State.UNKNOWN, summary="Cabinet Door alarm status not available")
+        return
     now = datetime.datetime.now()
     error_status = False
     #Check If and During Biz Hours
-    if section["eltek_door"] != "1" and is_business_hours(now):
+    if door.status != 1 and is_business_hours(now):
         yield Result(state=State.WARN, summary="Cabinet Door is Open")
         error_status = True
     #Check If and Not During Biz Hours
-    elif section["eltek_door"] != "1" and not is_business_hours(now):
+    elif door.status != 1 and not is_business_hours(now):
         yield Result(state=State.CRIT, summary="Cabinet Door is Open")
         error_status = True
     if not error_status:
         yield Result(state=State.OK, summary="Cabinet Door is Closed")
 
 
-snmp_section_eltek_door_config = SimpleSNMPSection(
-    name = "eltek_door_config",
-    parse_function = parse_eltek,
-    detect = startswith(".1.3.6.1.4.1.12148.10.13.8.2.1.2.1", "SmartPack S"),
-    fetch = SNMPTree(
-        base='.1.3.6.1.4.1.12148.10',
-        oids=[
-            '11.2.1.2.1.6',     # Cabinet Door Status
-        ]
-    ),
-)
-
 check_plugin_eltek_door = CheckPlugin(
     name = "eltek_door",
-    sections = ["eltek_door_config"],
+    sections = ["eltek_base_config", "eltek_base_config_slow"],
     service_name = "Cabinet Door",
-    discovery_function = discover_eltek,
-    check_function = check_eltek,
+    discovery_function = profiled(discover_eltek),
+    check_function = profiled(check_eltek),
 )
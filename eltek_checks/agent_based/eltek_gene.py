@@ -1,38 +1,40 @@
 #!/usr/bin/env python3
-from cmk.agent_based.v2 import SimpleSNMPSection, CheckPlugin, Service, Result, State, startswith, SNMPTree
+from cmk.agent_based.v2 import CheckPlugin, Service, Result, State
 
-def parse_eltek(string_table):
-    result = {}
-    result["eltek_gene"] = string_table[0][0]
-    return result
+from cmk_addons.plugins.eltek_checks.agent_based.eltek_check import find_alarm, merge_eltek
+from cmk_addons.plugins.plugin_profiling.lib.profiling import profiled
 
-def discover_eltek(section):
-    yield Service()
+# Data comes from the alarm input whose description starts with "Generator"
+# in the shared "eltek_base_config" sections (both tiers, see eltek_check.py)
 
-def check_eltek(section):
+def discover_eltek(section_eltek_base_config, section_eltek_base_config_slow):
+    section = merge_eltek(section_eltek_base_config, section_eltek_base_config_slow)
+    if section is None:
+        return
+    if find_alarm(section, "generator") is not None:
+        yield Service()
+
+def check_eltek(section_eltek_base_config, section_eltek_base_config_slow):
+    section = merge_eltek(section_eltek_base_config, section_eltek_base_config_slow)
+    if section is None:
+        return
+    generator = find_alarm(section, "generator")
+    if generator is None:
+        return
+    if generator.status is None:
+        yield Result(state=State.UNKNOWN, summary="Generator alarm status not available")
+        return
     error_status = False
-    if section["eltek_gene"] != "1":
+    if generator.status != 1:
         yield Result(state=State.WARN, summary="Generator is running!")
         error_status = True
     if not error_status:
         yield Result(state=State.OK, summary="Generator is not running.")
 
-snmp_section_eltek_gene_config = SimpleSNMPSection(
-    name = "eltek_gene_config",
-    parse_function = parse_eltek,
-    detect = startswith(".1.3.6.1.4.1.12148.10.11.2.1.3.1.10", "Generator"),
-    fetch = SNMPTree(
-        base='.1.3.6.1.4.1.12148.10',
-        oids=[
-            '11.2.1.2.1.10',     # Generator Status
-        ]
-    ),
-)
-
 check_plugin_eltek_gene = CheckPlugin(
     name = "eltek_gene",
-    sections = ["eltek_gene_config"],
+    sections = ["eltek_base_config", "eltek_base_config_slow"],
     service_name = "Eltek Generator",
-    discovery_function = discover_eltek,
-    check_function = check_eltek,
+    discovery_function = profiled(discover_eltek),
+    check_function = profiled(check_eltek),
 )
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+from typing import NamedTuple
+
+from cmk.agent_based.v2 import SNMPSection, InventoryPlugin, Attributes, HostLabel, SNMPTree, OIDEnd, OIDBytes
+
+from cmk_addons.plugins.eltek_checks.agent_based.eltek_check import (
+    DETECT_ELTEK, ELTEK_BASE, decode_byte_string_to_datetime, merge_eltek, site_has_generator
+)
+from cmk_addons.plugins.eltek_checks.agent_based.eltek_rectifier import RECTIFIER_NOT_PRESENT
+from cmk_addons.plugins.plugin_profiling.lib.profiling import profiled
+
+# Controller data that does not change between checks. The section is only
+# used by the HW/SW inventory and for host labels, so Checkmk fetches it on
+# the inventory schedule and during discovery, not every check interval.
+
+# Control unit table, one row per controller (indexed by OIDEnd)
+CONTROL_UNIT_TABLE = f"{ELTEK_BASE}.13.8.2.1"
+
+class EltekControlUnit(NamedTuple):
+    index: str
+    description: str | None
+    serial: str | None
+    software: str | None
+
+class EltekController(NamedTuple):
+    site_info: str | None           # Free text in the system serial number field
+    last_battery_test: str | None   # "%Y-%m-%d %H:%M:%S", None if never run
+    control_units: list
+
+def _battery_test_time(raw):
+    """The 8-byte little-endian timestamp of the last battery test as text"""
+    try:
+        decoded = decode_byte_string_to_datetime(bytes(raw))
+    except (TypeError, ValueError):
+        return None
+    return None if decoded == "Invalid Date" else decoded
+
+def _text(value):
+    return (value.strip() or None) if isinstance(value, str) else None
+
+def parse_eltek_controller(string_table):
+    scalar_table, control_unit_table = string_table
+    if not scalar_table and not control_unit_table:
+        return None
+    site_info, battery_test = (scalar_table[0] + [None, None])[:2] if scalar_table else (None, None)
+    return EltekController(
+        site_info=_text(site_info),
+        last_battery_test=_battery_test_time(battery_test),
+        control_units=[
+            EltekControlUnit(row[0], *(_text(value) for value in (row[1:] + [None] * 3)[:3]))
+            for row in control_unit_table
+            if row
+        ],
+    )
+
+# Core sites with an external generator, for rule conditions and views;
+# eltek_runtime tells them apart by the same field of eltek_base_config_slow.
+def host_label_eltek_controller(section):
+    yield HostLabel("eltek/generator", "yes" if site_has_generator(section.site_info) else "no")
+
+snmp_section_eltek_controller = SNMPSection(
+    name = "eltek_controller",
+    parse_function = profiled(parse_eltek_controller),
+    host_label_function = profiled(host_label_eltek_controller),
+    detect = DETECT_ELTEK,
+    fetch = [
+        SNMPTree(
+            base=ELTEK_BASE,
+            oids=[
+                "2.7.0",                        # System Serial Number, used for site notes
+                OIDBytes("10.16.4.1.2.1"),      # Last Battery Test Time
+            ],
+        ),
+        SNMPTree(
+            base=CONTROL_UNIT_TABLE,
+            oids=[
+                OIDEnd(),
+                "2",    # Control Unit Description (SmartPack S)
+                "4",    # Control Unit Serial Number
+                "7",    # Control Unit Software Version
+            ],
+        ),
+    ],
+)
+
+def inventory_eltek(section_eltek_controller, section_eltek_base_config, section_eltek_base_config_slow):
+    controller = section_eltek_controller
+    base_config = merge_eltek(section_eltek_base_config, section_eltek_base_config_slow)
+    if controller is not None:
+        main_unit = controller.control_units[0] if controller.control_units else None
+        if main_unit is not None:
+            yield Attributes(
+                path=["hardware", "system"],
+                inventory_attributes={
+                    "manufacturer": "Eltek",
+                    "model": main_unit.description,
+                    "serial": main_unit.serial,
+                },
+            )
+            yield Attributes(
+                path=["software", "firmware"],
+                inventory_attributes={"vendor": "Eltek", "version": main_unit.software},
+            )
+
+    power_system = {}
+    if controller is not None:
+        power_system["last_battery_test"] = controller.last_battery_test
+        power_system["control_units"] = len(controller.control_units)
+    if base_config is not None:
+        rectifiers = base_config.rectifiers.values()
+        power_system["rectifier_slots"] = len(rectifiers)
+        power_system["rectifiers"] = sum(
+            r.status is not None and r.status != RECTIFIER_NOT_PRESENT for r in rectifiers
+        )
+        power_system["mains_phases"] = len(base_config.mains_phases)
+        power_system["alarm_inputs"] = len(base_config.alarms)
+    if power_system:
+        yield Attributes(path=["hardware", "power_system"], inventory_attributes=power_system)
+
+inventory_plugin_eltek = InventoryPlugin(
+    name = "eltek",
+    sections = ["eltek_controller", "eltek_base_config", "eltek_base_config_slow"],
+    inventory_function = profiled(inventory_eltek),
+)
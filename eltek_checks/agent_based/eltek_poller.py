@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+import math
+from typing import NamedTuple
+
+from cmk.agent_based.v2 import AgentSection, CheckPlugin, Service, Result, State, Metric, check_levels, render
+
+from cmk_addons.plugins.plugin_profiling.lib.profiling import profiled
+
+# Run summary of the eltek_poller special agent (libexec/agent_eltek_poller),
+# on the host the agent runs for. The polled devices get their sections as
+# piggyback data.
+
+class PolledDevice(NamedTuple):
+    name: str
+    status: str  # ok, timeout or error
+    seconds: float
+    pdus: int
+    error: str
+
+class PollerSummary(NamedTuple):
+    wall: float
+    concurrency: int
+    latency: dict  # "p50", "p90", "p99", "max" -> seconds, empty if no device answered
+    devices: list
+
+LATENCY_KEYS = ("p50", "p90", "p99", "max")
+
+def _seconds(raw):
+    seconds = float(raw)
+    if not math.isfinite(seconds):
+        raise ValueError(raw)
+    return seconds
+
+def parse_eltek_poller(string_table):
+    wall, concurrency, latency, devices = None, None, {}, []
+    for line in string_table:
+        try:
+            if line[0] == "run":
+                wall, concurrency = _seconds(line[1]), int(line[2])
+            elif line[0] == "latency" and len(line) > len(LATENCY_KEYS):
+                latency = dict(zip(LATENCY_KEYS, (_seconds(v) for v in line[1:])))
+            elif line[0] == "device":
+                name, status, seconds, pdus = line[1:5]
+                devices.append(PolledDevice(name, status, _seconds(seconds), int(pdus), " ".join(line[5:])))
+        except (IndexError, ValueError):
+            # Line cut off (agent killed by the timeout)
+            continue
+    if wall is None:
+        return None
+    return PollerSummary(wall, concurrency, latency, devices)
+
+def discover_eltek_poller(section):
+    yield Service()
+
+def check_eltek_poller(params, section):
+    failed = [device for device in section.devices if device.status != "ok"]
+    yield Result(
+        state=State.OK,
+        summary=f"{len(section.devices)} devices, {len(section.devices) - len(failed)} answered",
+    )
+    yield from check_levels(
+        value=len(failed),
+        levels_upper=params["failed_devices"],
+        metric_name="eltek_poller_failed",
+        render_func=lambda v: f"{v:.0f}",
+        label="Not answered",
+    )
+    for device in failed:
+        yield Result(state=State.OK, notice=f"{device.name}: {device.status} after {device.seconds:.1f} s ({device.error})")
+
+    yield from check_levels(
+        value=section.wall,
+        levels_upper=params["run_time"],
+        metric_name="eltek_poller_run_time",
+        render_func=render.timespan,
+        label=f"Run time (max. {section.concurrency} devices at once)",
+    )
+    if section.latency:
+        yield Result(
+            state=State.OK,
+            summary="Poll time " + ", ".join(
+                f"{key} {render.timespan(section.latency[key])}" for key in LATENCY_KEYS
+            ),
+        )
+        for key, seconds in section.latency.items():
+            yield Metric(f"eltek_poller_latency_{key}", seconds)
+
+agent_section_eltek_poller = AgentSection(
+    name = "eltek_poller",
+    parse_function = profiled(parse_eltek_poller),
+)
+
+check_plugin_eltek_poller = CheckPlugin(
+    name = "eltek_poller",
+    service_name = "Eltek Poller",
+    discovery_function = profiled(discover_eltek_poller),
+    check_function = profiled(check_eltek_poller),
+    check_default_parameters = {
+        "failed_devices": ("fixed", (1, 10)),
+        # The agent is started once per check interval
+        "run_time": ("fixed", (45.0, 55.0)),
+    },
+    check_ruleset_name = "eltek_poller",
+)
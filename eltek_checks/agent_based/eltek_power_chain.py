@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+from cmk.agent_based.v2 import CheckPlugin, Service, Result, State, Metric, check_levels
+
+from cmk_addons.plugins.eltek_checks.agent_based.eltek_check import MAINS_DOWN_VOLTAGE, merge_eltek
+from cmk_addons.plugins.plugin_metrics.lib.metrics import select_metrics
+from cmk_addons.plugins.plugin_profiling.lib.profiling import profiled
+
+# The power chain of a site in one service: mains -> Eltek rectifiers ->
+# Narada battery modules. Data comes from the shared "eltek_base_config"
+# sections (see eltek_check.py) and from "narada_battery_table" (see
+# narada_checks/agent_based/narada_check.py: {module: {label: value}}).
+# The individual states stay with Eltek Health and the Narada services;
+# this one reports the chain together and flags where the two vendors
+# disagree.
+
+# ------------------------
+# Narada aggregate
+# ------------------------
+
+def _narada_totals(section):
+    """(modules, mean SOC, min SOC, total remaining capacity in Ah) of complete modules"""
+    socs, capacity = [], 0.0
+    for metrics in section.values():
+        soc, remcap = metrics.get("BattSOC"), metrics.get("BattRemCap")
+        if soc is None or remcap is None:
+            continue
+        socs.append(soc)
+        capacity += remcap
+    if not socs:
+        return 0, None, None, None
+    return len(socs), sum(socs) / len(socs), min(socs), capacity
+
+def _render_minutes(minutes):
+    hours, minutes = divmod(int(round(minutes)), 60)
+    return f"{hours}h {minutes}m"
+
+# ------------------------
+# Check
+# ------------------------
+
+def discover_power_chain(section_eltek_base_config, section_eltek_base_config_slow, section_narada_battery_table):
+    if section_eltek_base_config is not None and section_narada_battery_table:
+        yield Service()
+
+def check_power_chain(params, section_eltek_base_config, section_eltek_base_config_slow, section_narada_battery_table):
+    eltek = merge_eltek(section_eltek_base_config, section_eltek_base_config_slow)
+    if eltek is None:
+        yield Result(state=State.UNKNOWN, summary="Eltek controller data not available")
+        return
+    modules, soc_mean, soc_min, capacity = _narada_totals(section_narada_battery_table or {})
+    if not modules:
+        yield Result(state=State.UNKNOWN, summary="No Narada module reports SOC and remaining capacity")
+        return
+
+    # MAINS
+    phases = [phase for phase in eltek.mains_phases.values() if phase.voltage is not None]
+    phases_up = sum(phase.voltage > MAINS_DOWN_VOLTAGE for phase in phases)
+    if phases and not phases_up:
+        yield Result(state=State.OK, summary="Mains down, on battery")
+    elif phases:
+        yield Result(state=State.OK, summary=f"Mains {phases_up} of {len(phases)} phases up")
+
+    # RECTIFIERS
+    # The site load is the rectifier output minus what goes into the
+    # batteries; on battery the rectifiers deliver nothing and the battery
+    # current is the (negative) load.
+    currents = [rectifier.current for rectifier in eltek.rectifiers.values() if rectifier.current is not None]
+    if currents and eltek.battery_current is not None:
+        yield Metric("power_chain_load", sum(currents) - eltek.battery_current)
+    if eltek.rectifier_capacity is not None:
+        yield Result(state=State.OK, summary=f"Rectifier load {eltek.rectifier_capacity}%")
+
+    # BATTERIES
+    yield Result(
+        state=State.OK,
+        summary=f"Narada {modules} modules, SOC {soc_mean:.1f} % (min {soc_min:.1f} %), {capacity:.0f} Ahr left",
+    )
+    yield Metric("power_chain_soc_mean", soc_mean, boundaries=(0, 100))
+
+    # RUNTIME
+    # The Eltek estimates the runtime from the battery capacity configured
+    # in the controller and the discharge current; the Narada modules know
+    # what is actually left. Both are compared at the same discharge
+    # current, so only while the batteries discharge: on float charge the
+    # Eltek estimate does not follow the site load. Widely different
+    # values mean a wrong controller configuration or modules the Eltek
+    # does not see.
+    if eltek.battery_runtime is None:
+        yield Result(state=State.OK, notice="Eltek runtime estimate not available")
+        return
+    yield Result(state=State.OK, summary=f"Eltek runtime {_render_minutes(eltek.battery_runtime)}")
+    if eltek.battery_current is None or eltek.battery_current >= 0:
+        yield Result(state=State.OK, notice="Batteries not discharging, runtimes not compared")
+        return
+    discharge = -eltek.battery_current
+    narada_runtime = 60 * capacity / discharge
+    yield Result(
+        state=State.OK,
+        notice=f"Runtime from Narada capacity: {_render_minutes(narada_runtime)} at {discharge:.0f} A discharge",
+    )
+    yield Metric("power_chain_narada_runtime", narada_runtime)
+    if eltek.battery_runtime <= 0 or narada_runtime <= 0:
+        yield Result(state=State.WARN, summary="Runtimes disagree: one of them is zero")
+        return
+    yield from check_levels(
+        value=max(narada_runtime / eltek.battery_runtime, eltek.battery_runtime / narada_runtime),
+        levels_upper=params["runtime_disagreement"],
+        metric_name="power_chain_runtime_ratio",
+        render_func=lambda v: f"{v:.1f}x",
+        label="Eltek and Narada runtimes differ by",
+    )
+
+ESSENTIAL_METRICS = ("power_chain_soc_mean", "power_chain_runtime_ratio")
+
+check_plugin_eltek_power_chain = CheckPlugin(
+    name = "eltek_power_chain",
+    sections = ["eltek_base_config", "eltek_base_config_slow", "narada_battery_table"],
+    service_name = "Site Power Chain",
+    discovery_function = profiled(discover_power_chain),
+    check_function = profiled(select_metrics(check_power_chain, ESSENTIAL_METRICS)),
+    check_default_parameters = {
+        "metrics": "full",
+        # Factor between the larger and the smaller runtime
+        "runtime_disagreement": ("fixed", (2.0, 4.0)),
+    },
+    check_ruleset_name = "eltek_power_chain",
+)
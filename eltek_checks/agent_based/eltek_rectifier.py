@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+from cmk.agent_based.v2 import CheckPlugin, Service, Result, State, check_levels
+
+from cmk_addons.plugins.eltek_checks.agent_based.eltek_check import merge_eltek
+from cmk_addons.plugins.plugin_metrics.lib.metrics import select_metrics
+from cmk_addons.plugins.plugin_profiling.lib.profiling import profiled
+
+# Data comes from the rectifier table in the shared "eltek_base_config"
+# sections (both tiers, see eltek_check.py), one item per rectifier in the
+# shelf. The temperature is in the slow tier.
+
+# Values of the rectifier status column
+RECTIFIER_STATUS = {
+    0: (State.CRIT, "error"),
+    1: (State.OK, "normal"),
+    2: (State.WARN, "minor alarm"),
+    3: (State.CRIT, "major alarm"),
+    4: (State.OK, "disabled"),
+    5: (State.WARN, "disconnected"),
+}
+# Empty slots are listed in the table as well
+RECTIFIER_NOT_PRESENT = 6
+
+def discover_eltek_rectifier(section_eltek_base_config, section_eltek_base_config_slow):
+    section = merge_eltek(section_eltek_base_config, section_eltek_base_config_slow)
+    if section is None:
+        return
+    for index, rectifier in section.rectifiers.items():
+        if rectifier.status is not None and rectifier.status != RECTIFIER_NOT_PRESENT:
+            yield Service(item=index)
+
+def check_eltek_rectifier(item, params, section_eltek_base_config, section_eltek_base_config_slow):
+    section = merge_eltek(section_eltek_base_config, section_eltek_base_config_slow)
+    if section is None:
+        return
+    rectifier = section.rectifiers.get(item)
+    if rectifier is None:
+        return
+    if rectifier.status is None:
+        yield Result(state=State.UNKNOWN, summary="Rectifier status not available")
+        return
+
+    state, text = RECTIFIER_STATUS.get(
+        rectifier.status,
+        (State.UNKNOWN, "not present" if rectifier.status == RECTIFIER_NOT_PRESENT else f"unknown status {rectifier.status}"),
+    )
+    yield Result(state=state, summary=f"Status: {text}")
+    if rectifier.current is not None:
+        yield from check_levels(
+            value=rectifier.current,
+            metric_name="rectifier_current",
+            render_func=lambda v: f"{v:.0f} A",
+            label="Output current",
+        )
+    if rectifier.temperature is not None:
+        yield from check_levels(
+            value=rectifier.temperature,
+            levels_upper=("fixed", (170, 185)),
+            metric_name="rectifier_temp",
+            render_func=lambda v: f"{v:.0f} °F",
+            label="Temperature",
+        )
+
+ESSENTIAL_METRICS = ("rectifier_current",)
+
+check_plugin_eltek_rectifier = CheckPlugin(
+    name = "eltek_rectifier",
+    sections = ["eltek_base_config", "eltek_base_config_slow"],
+    service_name = "Rectifier %s",
+    discovery_function = profiled(discover_eltek_rectifier),
+    check_function = profiled(select_metrics(check_eltek_rectifier, ESSENTIAL_METRICS)),
+    check_default_parameters = {"metrics": "full"},
+    check_ruleset_name = "eltek_rectifier",
+)
@@ -1,61 +1,146 @@
 #!/usr/bin/env python3
-from cmk.agent_based.v2 import SimpleSNMPSection, CheckPlugin, Service, Result, State, Metric, startswith, SNMPTree
+import math
+import time
 
-def parse_eltek(string_table):
-    result = {}
-    result["battery_runtime"] = string_table[0][0]
-    result["generator_field"] = string_table[0][1]
-    return result
+from cmk.agent_based.v2 import CheckPlugin, Service, Result, State, Metric, check_levels, get_value_store
 
-def discover_eltek(section):
+from cmk_addons.plugins.eltek_checks.agent_based.eltek_check import merge_eltek, site_has_generator
+from cmk_addons.plugins.plugin_metrics.lib.metrics import select_metrics
+from cmk_addons.plugins.plugin_profiling.lib.profiling import profiled
+
+# Data comes from the shared "eltek_base_config" sections (see eltek_check.py);
+# only the site notes (generator) come from the slow tier
+
+# ------------------------
+# Discharge trend
+# ------------------------
+
+# The controller's runtime estimate follows the load and jumps around
+# during an outage. It is smoothed with Holt's linear trend method: an EWMA
+# of the runtime (level) and an EWMA of its change per minute (slope),
+# with weights derived from the time since the last check so irregular
+# check intervals do not matter. Only the last (time, level, slope) is
+# kept in the value store.
+LEVEL_TIME_CONSTANT = 10 * 60   # seconds
+SLOPE_TIME_CONSTANT = 20 * 60   # seconds
+# After a longer gap the old trend says nothing about the current outage
+MAX_GAP = 60 * 60               # seconds
+
+
+def update_trend(value_store, now, runtime):
+    """Feed one runtime reading (minutes) into the trend, return (level, slope)
+
+    level is the smoothed runtime in minutes, slope the change of the
+    runtime in minutes per minute (-1.0 when it drains in real time).
+    """
+    last = value_store.get("runtime_trend")
+    if last is None or not 0 <= now - last[0] <= MAX_GAP:
+        value_store["runtime_trend"] = (now, float(runtime), 0.0)
+        return float(runtime), 0.0
+
+    last_time, level, slope = last
+    elapsed = now - last_time
+    if elapsed == 0:
+        return level, slope
+
+    level_weight = 1 - math.exp(-elapsed / LEVEL_TIME_CONSTANT)
+    slope_weight = 1 - math.exp(-elapsed / SLOPE_TIME_CONSTANT)
+    minutes = elapsed / 60
+    new_level = level_weight * runtime + (1 - level_weight) * (level + slope * minutes)
+    slope = slope_weight * (new_level - level) / minutes + (1 - slope_weight) * slope
+    value_store["runtime_trend"] = (now, new_level, slope)
+    return new_level, slope
+
+
+def time_to_empty(level, slope):
+    """Predicted minutes until the battery is empty
+
+    The smoothed runtime, or less if the trend drains it faster than in
+    real time (the load keeps rising).
+    """
+    if slope < -1.0:
+        return level / -slope
+    return level
+
+
+def _render_minutes(minutes):
+    hours, minutes = divmod(int(round(minutes)), 60)
+    return f"{hours}h {minutes}m"
+
+
+def discover_eltek(section_eltek_base_config, section_eltek_base_config_slow):
+    section = merge_eltek(section_eltek_base_config, section_eltek_base_config_slow)
+    if section is None:
+        return
     yield Service()
 
-def check_eltek(section):
-    battery_runtime = int(section["battery_runtime"])
-    runtime_hours = battery_runtime // 60
-    runtime_minutes = battery_runtime % 60
-    field = section["generator_field"]
-
-    error_status = False
-    #if generator_field not null -> this is a core site that has a external generator, not controlled by eltek.
-    if "generator" in section["generator_field"].lower():
-        if int(section["battery_runtime"]) <= 60:
-            yield Result(state=State.CRIT, summary=f"Core Site Battery Runtime < 1Hrs - {runtime_hours}h {runtime_minutes}m left - CHECK GENERATOR")
-            error_status = True
+def check_eltek(params, section_eltek_base_config, section_eltek_base_config_slow):
+    section = merge_eltek(section_eltek_base_config, section_eltek_base_config_slow)
+    if section is None:
+        return
+    battery_runtime = section.battery_runtime
+    if battery_runtime is None:
+        yield Result(state=State.UNKNOWN, summary="Battery runtime not available")
+        return
+
+    level, slope = update_trend(get_value_store(), time.time(), battery_runtime)
+    predicted = time_to_empty(level, slope)
+
+    # Core sites have an external generator, not controlled by the Eltek,
+    # noted in the serial number field. The rule setting "generator"
+    # overrides the note.
+    generator = params.get("generator")
+    if generator is None:
+        if section.site_info is None:
+            yield Result(state=State.OK, notice="Site notes not available, assuming no generator")
+        generator = site_has_generator(section.site_info)
+    if generator:
+        levels = params["time_to_empty_generator"]
+        action = "CHECK GENERATOR"
     else:
-    #if generator_Field is null -> this is a site that does not have a generator
-        if int(section["battery_runtime"]) <= 240:
-            yield Result(state=State.CRIT, summary=f"Battery Runtime < 4Hrs - {runtime_hours}h {runtime_minutes}m left - DEPLOY GENERATOR")
-            error_status = True
+        levels = params["time_to_empty"]
+        action = "DEPLOY GENERATOR"
 
-    if not error_status:
-        yield Result(state=State.OK,summary=f"Battery Runtime OK - {runtime_hours}h {runtime_minutes}m left")
+    yield Result(state=State.OK, summary=f"Battery Runtime {_render_minutes(battery_runtime)} left")
+    results = list(
+        check_levels(
+            value=predicted,
+            levels_lower=levels,
+            metric_name="battery_time_to_empty",
+            render_func=_render_minutes,
+            label="Predicted time to empty",
+            boundaries=(0, 3000),
+        )
+    )
+    yield from results
+    if any(isinstance(r, Result) and r.state != State.OK for r in results):
+        yield Result(state=State.OK, summary=action)
+    yield Result(state=State.OK, notice=f"Runtime trend: {60 * slope:+.0f} min/h")
 
-    # Yield the metric for graphing
+    # Yield the metrics for graphing
     yield Metric(
         name = "battery_runtime",
         value = battery_runtime,
         boundaries = (0, 3000),
-        levels = (240,60),
+    )
+    yield Metric(
+        name = "battery_runtime_slope",
+        value = 60 * slope,
     )
 
-snmp_section_eltek_runtime_config = SimpleSNMPSection(
-    name = "eltek_runtime_config",
-    parse_function = parse_eltek,
-    detect = startswith(".1.3.6.1.4.1.12148.10.13.8.2.1.2.1", "SmartPack S"),
-    fetch = SNMPTree(
-        base='.1.3.6.1.4.1.12148.10',
-        oids=[
-            '10.8.5.0',     # Battery Runtime
-            '2.7.0',       # Eltek Serial Number field used as Generator Field
-        ]
-    ),
-)
+ESSENTIAL_METRICS = ("battery_time_to_empty",)
 
 check_plugin_eltek_runtime = CheckPlugin(
     name = "eltek_runtime",
-    sections = ["eltek_runtime_config"],
+    sections = ["eltek_base_config", "eltek_base_config_slow"],
     service_name = "Battery Runtime",
-    discovery_function = discover_eltek,
-    check_function = check_eltek,
+    discovery_function = profiled(discover_eltek),
+    check_function = profiled(select_metrics(check_eltek, ESSENTIAL_METRICS)),
+    check_default_parameters = {
+        "metrics": "full",
+        # Predicted minutes left; the CRIT levels are the former fixed limits
+        "time_to_empty_generator": ("fixed", (90.0, 60.0)),
+        "time_to_empty": ("fixed", (300.0, 240.0)),
+    },
+    check_ruleset_name = "eltek_runtime",
 )
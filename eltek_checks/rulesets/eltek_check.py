@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+from cmk.rulesets.v1 import Help, Title
+from cmk.rulesets.v1.form_specs import DefaultValue, DictElement, Dictionary, Float, TimeMagnitude, TimeSpan
+from cmk.rulesets.v1.form_specs.validators import NumberInRange
+from cmk.rulesets.v1.rule_specs import CheckParameters, HostCondition, Topic
+
+from cmk_addons.plugins.plugin_metrics.lib.form import metrics_element
+
+
+def _damping(title, unit, hysteresis, delay):
+    return DictElement(
+        parameter_form=Dictionary(
+            title=Title(title),
+            elements={
+                "hysteresis": DictElement(
+                    parameter_form=Float(
+                        title=Title("Hysteresis"),
+                        help_text=Help("How far the value must be back across the threshold to clear the condition"),
+                        unit_symbol=unit,
+                        prefill=DefaultValue(hysteresis),
+                        custom_validate=(NumberInRange(min_value=0.0),),
+                    ),
+                    required=True,
+                ),
+                "delay": DictElement(
+                    parameter_form=TimeSpan(
+                        title=Title("Minimum duration"),
+                        help_text=Help("The condition changes state only after it has been stable for this long"),
+                        displayed_magnitudes=[TimeMagnitude.MINUTE, TimeMagnitude.SECOND],
+                        prefill=DefaultValue(delay),
+                    ),
+                    required=True,
+                ),
+            },
+        ),
+        required=True,
+    )
+
+
+def _parameter_form():
+    return Dictionary(
+        elements={
+            "mains": _damping("Mains phase down (at or below 100 V)", "V", 10.0, 120.0),
+            "battery_charging": _damping("Battery charging (20 A or more)", "A", 5.0, 300.0),
+            "rectifier_capacity": _damping("Rectifier capacity over 50%", "%", 5.0, 300.0),
+            "temperature": _damping("Battery, rectifier and cabinet temperature", "°", 3.0, 300.0),
+            "metrics": metrics_element("battery and cabinet temperature"),
+        },
+    )
+
+
+rule_spec_eltek_check = CheckParameters(
+    name="eltek_check",
+    title=Title("Eltek health"),
+    topic=Topic.ENVIRONMENTAL,
+    parameter_form=_parameter_form,
+    condition=HostCondition(),
+)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+from cmk.rulesets.v1 import Help, Title
+from cmk.rulesets.v1.form_specs import (
+    DefaultValue,
+    DictElement,
+    Dictionary,
+    Float,
+    Integer,
+    LevelDirection,
+    List,
+    Password,
+    SimpleLevels,
+    String,
+)
+from cmk.rulesets.v1.form_specs.validators import LengthInRange, NumberInRange
+from cmk.rulesets.v1.rule_specs import CheckParameters, HostCondition, SpecialAgent, Topic
+
+
+def _device():
+    return Dictionary(
+        elements={
+            "name": DictElement(
+                parameter_form=String(
+                    title=Title("Host name"),
+                    help_text=Help("The piggyback data of the device is sent to the host of this name"),
+                    custom_validate=(LengthInRange(min_value=1),),
+                ),
+                required=True,
+            ),
+            "address": DictElement(
+                parameter_form=String(
+                    title=Title("Address"),
+                    help_text=Help("IP address or DNS name, optionally with :<port>. Defaults to the host name."),
+                ),
+            ),
+        },
+    )
+
+
+def _parameter_form_special_agent():
+    return Dictionary(
+        elements={
+            "devices": DictElement(
+                parameter_form=List(
+                    title=Title("Controllers to poll"),
+                    element_template=_device(),
+                    custom_validate=(LengthInRange(min_value=1),),
+                ),
+                required=True,
+            ),
+            "community": DictElement(
+                parameter_form=Password(title=Title("SNMP community")),
+                required=True,
+            ),
+            "max_concurrency": DictElement(
+                parameter_form=Integer(
+                    title=Title("Devices polled at the same time"),
+                    prefill=DefaultValue(50),
+                    custom_validate=(NumberInRange(min_value=1),),
+                ),
+            ),
+            "timeout": DictElement(
+                parameter_form=Float(
+                    title=Title("Timeout before a request is resent"),
+                    unit_symbol="s",
+                    prefill=DefaultValue(1.0),
+                    custom_validate=(NumberInRange(min_value=0.1),),
+                ),
+            ),
+            "retries": DictElement(
+                parameter_form=Integer(
+                    title=Title("Retries per request"),
+                    prefill=DefaultValue(2),
+                    custom_validate=(NumberInRange(min_value=0),),
+                ),
+            ),
+            "device_timeout": DictElement(
+                parameter_form=Float(
+                    title=Title("Time limit per device"),
+                    unit_symbol="s",
+                    prefill=DefaultValue(30.0),
+                    custom_validate=(NumberInRange(min_value=1.0),),
+                ),
+            ),
+            "bulk_size": DictElement(
+                parameter_form=Integer(
+                    title=Title("GETBULK max-repetitions"),
+                    prefill=DefaultValue(10),
+                    custom_validate=(NumberInRange(min_value=1),),
+                ),
+            ),
+        },
+    )
+
+
+rule_spec_special_agent_eltek_poller = SpecialAgent(
+    name="eltek_poller",
+    title=Title("Eltek and Narada controllers (concurrent SNMP poller)"),
+    topic=Topic.ENVIRONMENTAL,
+    parameter_form=_parameter_form_special_agent,
+)
+
+
+def _parameter_form():
+    return Dictionary(
+        elements={
+            "failed_devices": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Upper levels for devices that did not answer"),
+                    level_direction=LevelDirection.UPPER,
+                    form_spec_template=Integer(),
+                    prefill_fixed_levels=DefaultValue((1, 10)),
+                ),
+                required=True,
+            ),
+            "run_time": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Upper levels for the run time of the poller"),
+                    level_direction=LevelDirection.UPPER,
+                    form_spec_template=Float(unit_symbol="s"),
+                    prefill_fixed_levels=DefaultValue((45.0, 55.0)),
+                ),
+                required=True,
+            ),
+        },
+    )
+
+
+rule_spec_eltek_poller = CheckParameters(
+    name="eltek_poller",
+    title=Title("Eltek poller run"),
+    topic=Topic.ENVIRONMENTAL,
+    parameter_form=_parameter_form,
+    condition=HostCondition(),
+)
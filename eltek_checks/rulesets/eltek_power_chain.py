@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+from cmk.rulesets.v1 import Help, Title
+from cmk.rulesets.v1.form_specs import DefaultValue, DictElement, Dictionary, Float, LevelDirection, SimpleLevels
+from cmk.rulesets.v1.rule_specs import CheckParameters, HostCondition, Topic
+
+from cmk_addons.plugins.plugin_metrics.lib.form import metrics_element
+
+
+def _parameter_form():
+    return Dictionary(
+        elements={
+            "runtime_disagreement": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Upper levels for the disagreement of the Eltek and Narada runtimes"),
+                    help_text=Help(
+                        "Factor between the larger and the smaller of the runtime estimated by the Eltek "
+                        "controller and the runtime the remaining capacity of the Narada modules gives at the "
+                        "current battery discharge. Only compared while the batteries discharge."
+                    ),
+                    level_direction=LevelDirection.UPPER,
+                    form_spec_template=Float(unit_symbol="x"),
+                    prefill_fixed_levels=DefaultValue((2.0, 4.0)),
+                ),
+                required=True,
+            ),
+            "metrics": metrics_element("mean Narada SOC and runtime disagreement"),
+        },
+    )
+
+
+rule_spec_eltek_power_chain = CheckParameters(
+    name="eltek_power_chain",
+    title=Title("Eltek and Narada site power chain"),
+    topic=Topic.ENVIRONMENTAL,
+    parameter_form=_parameter_form,
+    condition=HostCondition(),
+)
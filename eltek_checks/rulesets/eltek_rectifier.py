@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+
+from cmk.rulesets.v1 import Title
+from cmk.rulesets.v1.form_specs import Dictionary
+from cmk.rulesets.v1.rule_specs import CheckParameters, HostAndItemCondition, Topic
+
+from cmk_addons.plugins.plugin_metrics.lib.form import metrics_element
+
+
+def _parameter_form():
+    return Dictionary(
+        elements={
+            "metrics": metrics_element("output current"),
+        },
+    )
+
+
+rule_spec_eltek_rectifier = CheckParameters(
+    name="eltek_rectifier",
+    title=Title("Eltek rectifiers"),
+    topic=Topic.ENVIRONMENTAL,
+    parameter_form=_parameter_form,
+    condition=HostAndItemCondition(item_title=Title("Rectifier")),
+)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+from cmk.rulesets.v1 import Help, Label, Title
+from cmk.rulesets.v1.form_specs import (
+    BooleanChoice, DefaultValue, DictElement, Dictionary, Float, LevelDirection, SimpleLevels
+)
+from cmk.rulesets.v1.rule_specs import CheckParameters, HostCondition, Topic
+
+from cmk_addons.plugins.plugin_metrics.lib.form import metrics_element
+
+
+def _time_to_empty_levels(title, levels):
+    return DictElement(
+        parameter_form=SimpleLevels(
+            title=Title(title),
+            level_direction=LevelDirection.LOWER,
+            form_spec_template=Float(unit_symbol="min"),
+            prefill_fixed_levels=DefaultValue(levels),
+        ),
+        required=True,
+    )
+
+
+def _parameter_form():
+    return Dictionary(
+        elements={
+            "generator": DictElement(
+                parameter_form=BooleanChoice(
+                    title=Title("Generator"),
+                    label=Label("Site has an external generator"),
+                    help_text=Help(
+                        "Core sites have a generator that is not controlled by the Eltek. Without this "
+                        "setting, a site has one if its Eltek serial number field mentions \"generator\"."
+                    ),
+                    prefill=DefaultValue(False),
+                ),
+            ),
+            "time_to_empty_generator": _time_to_empty_levels(
+                "Lower levels for the predicted time to empty (core sites with generator)", (90.0, 60.0)
+            ),
+            "time_to_empty": _time_to_empty_levels(
+                "Lower levels for the predicted time to empty (sites without generator)", (300.0, 240.0)
+            ),
+            "metrics": metrics_element("predicted time to empty"),
+        },
+    )
+
+
+rule_spec_eltek_runtime = CheckParameters(
+    name="eltek_runtime",
+    title=Title("Eltek battery runtime"),
+    topic=Topic.ENVIRONMENTAL,
+    parameter_form=_parameter_form,
+    condition=HostCondition(),
+)
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+
+from cmk.server_side_calls.v1 import noop_parser, SpecialAgentCommand, SpecialAgentConfig
+
+# Command line of libexec/agent_eltek_poller from the rule in
+# rulesets/eltek_poller.py
+
+
+def _agent_arguments(params, host_config):
+    args = ["--community", params["community"]]
+    for option in ("max_concurrency", "timeout", "retries", "device_timeout", "bulk_size"):
+        if option in params:
+            args += ["--" + option.replace("_", "-"), str(params[option])]
+    for device in params["devices"]:
+        address = device.get("address")
+        args.append(f"{device['name']}={address}" if address else device["name"])
+    yield SpecialAgentCommand(command_arguments=args)
+
+
+special_agent_eltek_poller = SpecialAgentConfig(
+    name="eltek_poller",
+    parameter_parser=noop_parser,
+    commands_function=_agent_arguments,
+)
@@ -1,25 +1,366 @@
 #!/usr/bin/env python3
 
-from cmk.agent_based.v2 import AgentSection, CheckPlugin, Service, Result, State
+import math
+import time
+
+from cmk.agent_based.v2 import (
+    AgentSection, CheckPlugin, Service, Result, State, check_levels, get_rate, get_value_store, GetRateError, render
+)
+
+from cmk_addons.plugins.plugin_profiling.lib.profiling import profiled
+
+# Sections are written by the mk_kea and mk_kea_leases agent plugins
+# (kea_checks/agents/plugins)
+
+def _to_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+def _to_float(value):
+    try:
+        value = float(value)
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
 
 def parse_kea(string_table):
-    parsed = {}
+    """Parse the <<<kea_check>>> or <<<kea_leases>>> section in one pass
+
+    Returns {"snapshot": {"time": ..., "stale": [service, ...]} or None,
+             "global": {service: {counter: value}},
+             "subnets": {item: {"service": ..., "id": ..., "stats": {...}}}}
+    where item is the subnet prefix (or "<service> id <n>" if unknown).
+    "stale" lists the services whose control socket failed; an agent that
+    only sends the stale flag marks all services of the section stale.
+    Cut off or malformed lines are skipped; None if nothing is left.
+    """
+    parsed = {"snapshot": None, "global": {}, "subnets": {}}
+    stale_flag = False
+    service = None
+    headers = {}
+    for line in string_table:
+        if not line:
+            continue
+        kind = line[0]
+        if kind.startswith("[") and kind.endswith("]"):
+            service = kind[1:-1]
+            headers = {}
+        elif kind == "snapshot":
+            snapshot_time = _to_float(line[1]) if len(line) > 1 else None
+            if snapshot_time is not None:
+                parsed["snapshot"] = {"time": snapshot_time, "stale": line[3:]}
+                stale_flag = line[2:3] == ["1"]
+        elif kind.startswith("@"):
+            headers[kind[1:]] = line[1:]
+        elif kind == "global" and service:
+            parsed["global"][service] = {
+                name: _to_int(value) for name, value in zip(headers.get("global", []), line[1:])
+            }
+        elif kind == "subnet" and service and len(line) > 2:
+            columns = headers.get("subnet", [])[2:]
+            subnet_id, prefix = line[1], line[2]
+            item = prefix or f"{service} id {subnet_id}"
+            parsed["subnets"][item] = {
+                "service": service,
+                "id": subnet_id,
+                "stats": {name: _to_int(value) for name, value in zip(columns, line[3:])},
+            }
+    if parsed["snapshot"] is None and not parsed["global"] and not parsed["subnets"]:
+        return None
+    if stale_flag and not parsed["snapshot"]["stale"]:
+        parsed["snapshot"]["stale"] = sorted(
+            set(parsed["global"]) | {subnet["service"] for subnet in parsed["subnets"].values()}
+        )
     return parsed
 
+# ------------------------
+# Rates from cumulative counters
+# ------------------------
+
+# Cumulative Kea counters we turn into per-second rates
+GLOBAL_RATE_COUNTERS = {
+    "dhcp4": (
+        "pkt4-received", "pkt4-discover-received", "pkt4-offer-sent",
+        "pkt4-ack-sent", "pkt4-nak-sent", "pkt4-decline-received",
+    ),
+    "dhcp6": (
+        "pkt6-received", "pkt6-solicit-received", "pkt6-advertise-sent",
+        "pkt6-decline-received",
+    ),
+}
+SUBNET_RATE_COUNTERS = ("cumulative-assigned-addresses", "reclaimed-leases")
+
+def _render_rate(value):
+    return f"{value:.2f}/s"
+
+def _render_ratio(value):
+    return f"{value:.1f}%"
+
+def _snapshot_time(section):
+    """Time the counters were read by the agent plugin"""
+    if section["snapshot"] is None:
+        return time.time()
+    return section["snapshot"]["time"]
+
+def _rates(value_store, prefix, counters, names, now):
+    """Per-second rates of the given counters since the last snapshot
+
+    Counters seen for the first time or reset since the last check (Kea
+    restart, statistic-reset) raise GetRateError. They are left out of the
+    result; the value store is re-initialised, so the next check has a rate.
+    While the agent serves the same cached snapshot, the rates computed
+    from it are reported again.
+    """
+    rates = {}
+    for name in names:
+        value = counters.get(name)
+        if value is None:
+            continue
+        key = f"{prefix}.{name}"
+        last = value_store.get(key)
+        if last is not None and last[0] == now:
+            if value_store.get(f"{key}.rate") is not None:
+                rates[name] = value_store[f"{key}.rate"]
+            continue
+        try:
+            rates[name] = get_rate(value_store, key, now, value, raise_overflow=True)
+        except GetRateError:
+            value_store[f"{key}.rate"] = None
+        else:
+            value_store[f"{key}.rate"] = rates[name]
+    return rates
+
+def check_snapshot(params, snapshot, services):
+    if snapshot is None:
+        return
+    for service in snapshot["stale"]:
+        yield Result(
+            state=State.WARN,
+            summary=f"{service}: Kea control socket unavailable"
+            + (", showing last good data" if service in services else ""),
+        )
+    yield from check_levels(
+        value=max(time.time() - snapshot["time"], 0.0),
+        levels_upper=params["snapshot_age"],
+        metric_name="kea_snapshot_age",
+        render_func=render.timespan,
+        label="Data age",
+    )
+
+# ------------------------
+# Global packet counters per Kea service
+# ------------------------
+
 def discover_kea(section):
-    yield Service()
+    if section["global"]:
+        yield Service()
+
+def _check_dhcp4_rates(params, rates):
+    acks = rates.get("pkt4-ack-sent")
+    naks = rates.get("pkt4-nak-sent")
+    if acks is not None and naks is not None and acks + naks > 0:
+        yield from check_levels(
+            value=100.0 * naks / (acks + naks),
+            levels_upper=params["nak_ratio"],
+            metric_name="kea_dhcp4_nak_ratio",
+            render_func=_render_ratio,
+            label="dhcp4 NAK ratio",
+            boundaries=(0, 100),
+        )
+    discovers = rates.get("pkt4-discover-received")
+    offers = rates.get("pkt4-offer-sent")
+    if discovers and offers is not None:
+        yield from check_levels(
+            value=100.0 * offers / discovers,
+            levels_lower=params["offer_ratio"],
+            metric_name="kea_dhcp4_offer_ratio",
+            render_func=_render_ratio,
+            label="dhcp4 DISCOVER to OFFER",
+        )
+
+def _check_dhcp6_rates(params, rates):
+    solicits = rates.get("pkt6-solicit-received")
+    advertises = rates.get("pkt6-advertise-sent")
+    if solicits and advertises is not None:
+        yield from check_levels(
+            value=100.0 * advertises / solicits,
+            levels_lower=params["offer_ratio"],
+            metric_name="kea_dhcp6_advertise_ratio",
+            render_func=_render_ratio,
+            label="dhcp6 SOLICIT to ADVERTISE",
+        )
+
+def check_kea(params, section):
+    yield from check_snapshot(params, section["snapshot"], section["global"])
 
-def check_kea(section):
-    yield Result(state=State.OK, summary="Everything is fine")
+    now = _snapshot_time(section)
+    value_store = get_value_store()
+    for service, counters in sorted(section["global"].items()):
+        if all(value is None for value in counters.values()):
+            yield Result(state=State.UNKNOWN, summary=f"{service}: counters not available")
+            continue
+        family = "4" if service == "dhcp4" else "6"
+        received = counters.get(f"pkt{family}-received")
+        sent = counters.get(f"pkt{family}-sent")
+        yield Result(
+            state=State.OK,
+            summary=f"{service}: {received} packets received, {sent} sent",
+        )
+
+        rates = _rates(value_store, service, counters, GLOBAL_RATE_COUNTERS.get(service, ()), now)
+        if not rates:
+            yield Result(state=State.OK, notice=f"{service}: counters initialised, rates follow with the next check")
+            continue
+
+        if f"pkt{family}-received" in rates:
+            yield from check_levels(
+                value=rates[f"pkt{family}-received"],
+                levels_upper=params["packet_rate"],
+                metric_name=f"kea_{service}_packet_rate",
+                render_func=_render_rate,
+                label=f"{service} packets received",
+            )
+        if f"pkt{family}-decline-received" in rates:
+            yield from check_levels(
+                value=rates[f"pkt{family}-decline-received"],
+                levels_upper=params["decline_rate"],
+                metric_name=f"kea_{service}_decline_rate",
+                render_func=_render_rate,
+                label=f"{service} declines",
+            )
+        if service == "dhcp4":
+            yield from _check_dhcp4_rates(params, rates)
+        else:
+            yield from _check_dhcp6_rates(params, rates)
+
+    yield Result(state=State.OK, summary=f"{len(section['subnets'])} subnets")
+
+# ------------------------
+# Pool utilisation per subnet
+# ------------------------
+
+def _first_of(stats, *names):
+    for name in names:
+        if stats.get(name) is not None:
+            return stats[name]
+    return None
+
+# Counters shown per subnet: counter, metric, label
+SUBNET_COUNTERS = (
+    ("assigned-addresses", "kea_assigned", "Assigned"),
+    ("declined-addresses", "kea_declined", "Declined"),
+    ("reclaimed-leases", "kea_reclaimed", "Reclaimed"),
+    ("active-leases", "kea_active_leases", "Active leases"),
+    ("expired-leases", "kea_expired_leases", "Expired leases"),
+    ("declined-leases", "kea_declined_leases", "Declined leases"),
+)
+
+# Subnets come from the control socket (kea_check, mk_kea) and/or from the
+# memfile lease file (kea_leases, mk_kea_leases). Both use the same format.
+
+def discover_kea_subnet(section_kea_check, section_kea_leases):
+    items = {}
+    for section in (section_kea_check, section_kea_leases):
+        if section is not None:
+            items.update(section["subnets"])
+    for item in items:
+        yield Service(item=item)
+
+def check_kea_subnet(item, params, section_kea_check, section_kea_leases):
+    stats = None
+    for section in (section_kea_leases, section_kea_check):
+        if section is not None and item in section["subnets"]:
+            stats = {**(stats or {}), **section["subnets"][item]["stats"]}
+    if stats is None:
+        return
+
+    total = _first_of(stats, "total-addresses", "total-nas")
+    assigned = _first_of(stats, "assigned-addresses", "assigned-nas", "active-leases")
+    counters = [(stats.get(name), metric, label) for name, metric, label in SUBNET_COUNTERS]
+    counters = [counter for counter in counters if counter[0] is not None]
+    if not counters and (total is None or (total and assigned is None)):
+        yield Result(state=State.UNKNOWN, summary="Subnet statistics not available")
+        return
+
+    if total and assigned is not None:
+        yield from check_levels(
+            value=100.0 * assigned / total,
+            levels_upper=params["usage"],
+            metric_name="kea_pool_usage",
+            render_func=lambda v: f"{v:.1f}%",
+            label=f"Pool usage ({assigned} of {total})",
+            boundaries=(0, 100),
+        )
+    elif total == 0:
+        yield Result(state=State.OK, summary="No addresses in pool")
+
+    for value, metric, label in counters:
+        yield from check_levels(
+            value=value,
+            metric_name=metric,
+            render_func=str,
+            label=label,
+        )
+
+    if section_kea_check is None:
+        return
+    service = section_kea_check["subnets"].get(item, {}).get("service")
+    if section_kea_check["snapshot"] is not None and service in section_kea_check["snapshot"]["stale"]:
+        yield Result(state=State.OK, summary="Stale data (see Kea service)")
+
+    rates = _rates(get_value_store(), item, stats, SUBNET_RATE_COUNTERS, _snapshot_time(section_kea_check))
+    if "cumulative-assigned-addresses" in rates:
+        yield from check_levels(
+            value=rates["cumulative-assigned-addresses"],
+            levels_upper=params["lease_churn"],
+            metric_name="kea_lease_churn",
+            render_func=_render_rate,
+            label="Lease churn",
+        )
+    if "reclaimed-leases" in rates:
+        yield from check_levels(
+            value=rates["reclaimed-leases"],
+            metric_name="kea_reclaim_rate",
+            render_func=_render_rate,
+            label="Reclaimed leases",
+        )
 
 agent_section_kea = AgentSection(
     name = "kea_check",
-    parse_function = parse_kea,
+    parse_function = profiled(parse_kea),
+)
+
+agent_section_kea_leases = AgentSection(
+    name = "kea_leases",
+    parse_function = profiled(parse_kea),
 )
 
 check_plugin_kea = CheckPlugin(
     name = "kea_check",
     service_name = "ISC KEA CheckMK Common",
-    discovery_function = discover_kea,
-    check_function = check_kea,
+    discovery_function = profiled(discover_kea),
+    check_function = profiled(check_kea),
+    check_default_parameters = {
+        "packet_rate": ("no_levels", None),
+        "decline_rate": ("fixed", (1.0, 5.0)),
+        "nak_ratio": ("fixed", (5.0, 10.0)),
+        "offer_ratio": ("fixed", (80.0, 50.0)),
+        "snapshot_age": ("fixed", (900.0, 1800.0)),
+    },
+    check_ruleset_name = "kea",
+)
+
+check_plugin_kea_subnet = CheckPlugin(
+    name = "kea_subnet",
+    sections = ["kea_check", "kea_leases"],
+    service_name = "Kea Subnet %s",
+    discovery_function = profiled(discover_kea_subnet),
+    check_function = profiled(check_kea_subnet),
+    check_default_parameters = {
+        "usage": ("fixed", (80.0, 90.0)),
+        "lease_churn": ("no_levels", None),
+    },
+    check_ruleset_name = "kea_subnet",
 )
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""Checkmk agent plugin for ISC Kea DHCP statistics
+
+Sends one "statistic-get-all" and one "config-get" command to each
+configured Kea control socket and prints the <<<kea_check>>> section.
+
+The answer is cached for cache_age seconds. When the cache has expired the
+plugin prints the cached snapshot right away and refreshes it in a
+detached background process, so a slow socket never blocks the agent. A
+lock file ensures a single refresh at a time, and a refresh is only
+attempted once per cache_age, so Kea sees at most one stats query per
+interval. All socket calls of a refresh share one hard timeout. The
+services that answered are refreshed; for a service whose socket failed
+the last good block is kept and the service is listed as stale. If no
+service answered the whole last good snapshot is kept and marked stale.
+
+Optional configuration in $MK_CONFDIR/kea.cfg:
+
+    [kea]
+    dhcp4_socket = /run/kea/kea4-ctrl-socket
+    dhcp6_socket = /run/kea/kea6-ctrl-socket
+    timeout = 5
+    cache_age = 60
+
+Section format (tab separated, one block per Kea service):
+
+    snapshot<TAB><collected at><TAB><stale: 0/1>[<TAB><stale service>...]
+    [dhcp4]
+    @global<TAB><counter>...        column names of the global line
+    global<TAB><value>...
+    @subnet<TAB>id<TAB>subnet<TAB><statistic>...
+    subnet<TAB><id><TAB><prefix><TAB><value>...
+
+Column names are only printed once per block, which keeps the section
+small on servers with thousands of subnets.
+"""
+
+import argparse
+import configparser
+import fcntl
+import json
+import os
+import re
+import socket
+import sys
+import time
+
+DEFAULT_CONFIG = {
+    "dhcp4_socket": "/run/kea/kea4-ctrl-socket",
+    "dhcp6_socket": "/run/kea/kea6-ctrl-socket",
+    "timeout": "5",
+    "cache_age": "60",
+}
+
+CACHE_FILE = os.path.join(os.environ.get("MK_VARDIR", "/var/lib/check_mk_agent"), "cache", "kea_check.cache")
+
+SUBNET_STAT = re.compile(r"^subnet\[(\d+)\]\.([^\[\]]+)$")
+
+
+def read_config():
+    config = configparser.ConfigParser()
+    config.read_dict({"kea": DEFAULT_CONFIG})
+    config.read(os.path.join(os.environ.get("MK_CONFDIR", "/etc/check_mk"), "kea.cfg"))
+    return config["kea"]
+
+
+def send_command(path, command, deadline):
+    """Send one command to a Kea control socket and return its arguments
+
+    Raises socket.timeout once the monotonic deadline has passed.
+    """
+    request = json.dumps({"command": command, "arguments": {}}).encode()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(max(deadline - time.monotonic(), 0.001))
+        sock.connect(path)
+        sock.sendall(request)
+        # Kea closes the connection once the whole response is sent
+        chunks = []
+        while True:
+            sock.settimeout(max(deadline - time.monotonic(), 0.001))
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+
+    response = json.loads(b"".join(chunks))
+    # Kea answers a list when the command went through the control agent
+    if isinstance(response, list):
+        response = response[0]
+    if response.get("result") != 0:
+        raise RuntimeError(response.get("text", "command %s failed" % command))
+    return response.get("arguments", {})
+
+
+def subnet_prefixes(config_arguments):
+    """Map subnet id -> prefix from the config-get answer"""
+    prefixes = {}
+    for daemon_config in config_arguments.values():
+        if not isinstance(daemon_config, dict):
+            continue
+        networks = [daemon_config] + daemon_config.get("shared-networks", [])
+        for network in networks:
+            for key in ("subnet4", "subnet6"):
+                for subnet in network.get(key, []):
+                    prefixes[subnet["id"]] = subnet["subnet"]
+    return prefixes
+
+
+def format_service(service, statistics, prefixes):
+    """Return the section lines of one Kea service"""
+    global_stats = {}
+    subnets = {}
+    for name, samples in statistics.items():
+        if not samples:
+            continue
+        value = samples[0][0]
+        match = SUBNET_STAT.match(name)
+        if match:
+            subnets.setdefault(int(match.group(1)), {})[match.group(2)] = value
+        elif not name.startswith("subnet["):
+            global_stats[name] = value
+
+    lines = ["[%s]" % service]
+    global_names = sorted(global_stats)
+    lines.append("\t".join(["@global"] + global_names))
+    lines.append("\t".join(["global"] + [str(global_stats[n]) for n in global_names]))
+
+    subnet_names = sorted({name for stats in subnets.values() for name in stats})
+    lines.append("\t".join(["@subnet", "id", "subnet"] + subnet_names))
+    for subnet_id in sorted(subnets):
+        stats = subnets[subnet_id]
+        lines.append(
+            "\t".join(
+                ["subnet", str(subnet_id), prefixes.get(subnet_id, "")]
+                + [str(stats.get(n, "")) for n in subnet_names]
+            )
+        )
+    return lines
+
+
+def collect(config):
+    """Query all configured Kea services
+
+    Returns ({service: section lines} of the services that answered,
+    [services whose socket failed or timed out]). Services without a
+    control socket are in neither.
+    """
+    deadline = time.monotonic() + float(config["timeout"])
+    blocks = {}
+    failed = []
+    for service in ("dhcp4", "dhcp6"):
+        path = config["%s_socket" % service]
+        if not os.path.exists(path):
+            continue
+        try:
+            statistics = send_command(path, "statistic-get-all", deadline)
+            prefixes = subnet_prefixes(send_command(path, "config-get", deadline))
+        except (OSError, ValueError, RuntimeError) as exc:
+            sys.stderr.write("mk_kea: %s: %s\n" % (path, exc))
+            failed.append(service)
+            continue
+        blocks[service] = format_service(service, statistics, prefixes)
+    return blocks, failed
+
+
+def split_blocks(lines):
+    """Map service -> section lines of its block"""
+    blocks = {}
+    block = None
+    for line in lines:
+        if line.startswith("[") and line.endswith("]"):
+            block = blocks.setdefault(line[1:-1], [])
+        if block is not None:
+            block.append(line)
+    return blocks
+
+
+def read_cache():
+    """Return (collected at, last attempt, stale services, body lines) of the cached snapshot"""
+    try:
+        with open(CACHE_FILE) as cache:
+            fields = cache.readline().split()
+            collected, attempted = float(fields[0]), float(fields[1])
+            return collected, attempted, fields[2:], cache.read().splitlines()
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def write_cache(collected, attempted, stale, lines):
+    tmp_file = "%s.%d" % (CACHE_FILE, os.getpid())
+    with open(tmp_file, "w") as cache:
+        cache.write(" ".join(["%f %f" % (collected, attempted)] + stale) + "\n")
+        cache.write("\n".join(lines) + "\n")
+    os.rename(tmp_file, CACHE_FILE)
+
+
+def refresh(config):
+    """Query Kea and update the cache, unless another refresh is running"""
+    with open(CACHE_FILE + ".lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return
+        now = time.time()
+        blocks, failed = collect(config)
+        cached = read_cache()
+        if not blocks:
+            # Keep the last good snapshot, but remember the failed attempt
+            if cached is not None:
+                write_cache(cached[0], now, sorted(split_blocks(cached[3])), cached[3])
+            return
+        # Keep the last good block of a failed service
+        cached_blocks = split_blocks(cached[3]) if cached is not None else {}
+        lines = []
+        for service in ("dhcp4", "dhcp6"):
+            if service in blocks:
+                lines.extend(blocks[service])
+            elif service in failed:
+                lines.extend(cached_blocks.get(service, []))
+        write_cache(now, now, failed, lines)
+
+
+def refresh_in_background(config):
+    """Run refresh() in a detached grandchild, return immediately"""
+    if os.fork() > 0:
+        os.wait()
+        return
+    try:
+        os.setsid()
+        if os.fork() == 0:
+            devnull = os.open(os.devnull, os.O_RDWR)
+            for fd in (0, 1, 2):
+                os.dup2(devnull, fd)
+            refresh(config)
+    finally:
+        os._exit(0)
+
+
+def print_section(collected, attempted, stale, lines, cache_age):
+    sys.stdout.write("<<<kea_check:sep(9):cached(%d,%d)>>>\n" % (collected, cache_age))
+    sys.stdout.write("\t".join(["snapshot", "%d" % collected, "%d" % bool(stale)] + stale) + "\n")
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Checkmk agent plugin for ISC Kea")
+    parser.add_argument("--dhcp4-socket", help="override the DHCPv4 control socket")
+    parser.add_argument("--dhcp6-socket", help="override the DHCPv6 control socket")
+    parser.add_argument("--cache-age", type=int, help="override the cache age in seconds")
+    args = parser.parse_args(argv)
+
+    config = dict(read_config())
+    if args.dhcp4_socket:
+        config["dhcp4_socket"] = args.dhcp4_socket
+    if args.dhcp6_socket:
+        config["dhcp6_socket"] = args.dhcp6_socket
+    if args.cache_age is not None:
+        config["cache_age"] = str(args.cache_age)
+    cache_age = int(config["cache_age"])
+
+    os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+    cached = read_cache()
+    if cached is None:
+        # Nothing to show yet: the first run queries Kea in the foreground
+        refresh(config)
+        cached = read_cache()
+    elif time.time() - cached[1] >= cache_age:
+        refresh_in_background(config)
+
+    if cached is not None:
+        print_section(*cached, cache_age=cache_age)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""Checkmk agent plugin for ISC Kea memfile lease files
+
+For Kea servers without a control socket. Reads kea-leases4.csv and
+kea-leases6.csv in fixed-size chunks, keeps only the latest entry per
+address and prints active/expired/declined leases per subnet as the
+<<<kea_leases>>> section (same format as <<<kea_check>>>).
+
+The file inode, the byte offset reached and the current lease per address
+are kept in $MK_VARDIR, so each run only reads the rows Kea appended since
+the last run; the state file is only rewritten when rows were read. When
+the lease file cleanup (LFC) has rotated the file, the state is rebuilt
+the way Kea loads its leases: from <file>.completed if the LFC left one,
+else from <file>.2 (older) and <file>.1 (newer), then the new file.
+
+Optional configuration in $MK_CONFDIR/kea.cfg:
+
+    [kea_leases]
+    leases4 = /var/lib/kea/kea-leases4.csv
+    leases6 = /var/lib/kea/kea-leases6.csv
+    config4 = /etc/kea/kea-dhcp4.conf
+    config6 = /etc/kea/kea-dhcp6.conf
+
+The Kea configuration files are only used to name the subnets and to
+count the DHCPv4 pool sizes; the section is still written without them.
+"""
+
+import configparser
+import ipaddress
+import json
+import os
+import pickle
+import re
+import sys
+import time
+
+DEFAULT_CONFIG = {
+    "leases4": "/var/lib/kea/kea-leases4.csv",
+    "leases6": "/var/lib/kea/kea-leases6.csv",
+    "config4": "/etc/kea/kea-dhcp4.conf",
+    "config6": "/etc/kea/kea-dhcp6.conf",
+}
+
+STATE_DIR = os.environ.get("MK_VARDIR", "/var/lib/check_mk_agent")
+
+CHUNK_SIZE = 1 << 20
+
+# Layout of the state file, a pickled (version, inode, offset, leases)
+STATE_VERSION = 2
+
+# Lease states of the memfile backend
+STATE_DEFAULT = 0
+STATE_DECLINED = 1
+STATE_EXPIRED_RECLAIMED = 2
+
+COMMENT = re.compile(r"^\s*(#|//).*$", re.MULTILINE)
+BLOCK_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+
+
+def read_config():
+    config = configparser.ConfigParser()
+    config.read_dict({"kea_leases": DEFAULT_CONFIG})
+    config.read(os.path.join(os.environ.get("MK_CONFDIR", "/etc/check_mk"), "kea.cfg"))
+    return config["kea_leases"]
+
+
+class LeaseState:
+    """Latest lease per address and how far the lease file was read"""
+
+    def __init__(self, inode=None, offset=0, leases=None):
+        self.inode = inode
+        self.offset = offset
+        self.columns = None
+        self.leases = {} if leases is None else leases  # address -> (subnet id, expire, state)
+        self.changed = False
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, "rb") as state_file:
+                version, inode, offset, leases = pickle.load(state_file)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, TypeError, ValueError):
+            return cls()
+        if version != STATE_VERSION:
+            return cls()
+        return cls(inode, offset, leases)
+
+    def save(self, path):
+        if not self.changed:
+            return
+        tmp_path = "%s.%d" % (path, os.getpid())
+        with open(tmp_path, "wb") as state_file:
+            pickle.dump(
+                (STATE_VERSION, self.inode, self.offset, self.leases), state_file, protocol=pickle.HIGHEST_PROTOCOL
+            )
+        os.rename(tmp_path, path)
+
+    def apply_line(self, line):
+        fields = line.split(",")
+        if self.columns is None or fields[0] == "address":
+            self.columns = {name: pos for pos, name in enumerate(fields)}
+            return
+        columns = self.columns
+        try:
+            address = fields[columns["address"]]
+            valid_lifetime = int(fields[columns["valid_lifetime"]])
+            expire = int(fields[columns["expire"]])
+            subnet_id = int(fields[columns["subnet_id"]])
+            state = int(fields[columns["state"]]) if "state" in columns else STATE_DEFAULT
+        except (KeyError, IndexError, ValueError):
+            return
+        # Kea records a deleted (released) lease with a valid lifetime of 0
+        if valid_lifetime == 0:
+            self.leases.pop(address, None)
+        else:
+            self.leases[address] = (subnet_id, expire, state)
+
+    def read_file(self, path, offset=0):
+        """Apply all complete lines from offset on, return the new offset"""
+        with open(path, "rb") as lease_file:
+            lease_file.seek(offset)
+            rest = b""
+            while True:
+                chunk = lease_file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                lines = (rest + chunk).split(b"\n")
+                rest = lines.pop()
+                for line in lines:
+                    if line:
+                        self.apply_line(line.decode("utf-8", "replace").rstrip("\r"))
+                offset += len(chunk)
+        # An unfinished last line is read again next time
+        return offset - len(rest)
+
+    def read_header(self, path):
+        """Column positions from the first line of the lease file"""
+        with open(path, "rb") as lease_file:
+            self.apply_line(lease_file.readline().decode("utf-8", "replace").rstrip("\r\n"))
+
+    def update(self, path):
+        stat = os.stat(path)
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            # New or rotated file: rebuild from the LFC output and the new
+            # file, oldest first, so newer rows win
+            self.leases = {}
+            if os.path.exists(path + ".completed"):
+                older = [path + ".completed"]
+            else:
+                older = [name for name in (path + ".2", path + ".1") if os.path.exists(name)]
+            for name in older:
+                self.columns = None
+                self.read_file(name)
+            self.columns = None
+            self.inode = stat.st_ino
+            self.offset = 0
+            self.changed = True
+        elif stat.st_size == self.offset:
+            return
+        elif self.columns is None and self.offset:
+            self.read_header(path)
+        offset = self.read_file(path, self.offset)
+        self.changed = self.changed or offset != self.offset
+        self.offset = offset
+
+    def per_subnet(self, now):
+        counts = {}
+        for subnet_id, expire, state in self.leases.values():
+            subnet = counts.setdefault(subnet_id, [0, 0, 0])
+            if state == STATE_DECLINED:
+                subnet[2] += 1
+            elif state == STATE_EXPIRED_RECLAIMED or expire <= now:
+                subnet[1] += 1
+            else:
+                subnet[0] += 1
+        return counts
+
+
+def _pool_size(pool):
+    if "/" in pool:
+        return ipaddress.ip_network(pool.strip(), strict=False).num_addresses
+    first, last = (ipaddress.ip_address(a.strip()) for a in pool.split("-"))
+    return int(last) - int(first) + 1
+
+
+def read_kea_subnets(path):
+    """Map subnet id -> (prefix, DHCPv4 pool size) from a Kea config file"""
+    try:
+        with open(path) as config_file:
+            text = BLOCK_COMMENT.sub("", COMMENT.sub("", config_file.read()))
+        config = json.loads(text)
+    except (OSError, ValueError):
+        return {}
+    subnets = {}
+    for daemon_config in config.values():
+        if not isinstance(daemon_config, dict):
+            continue
+        for network in [daemon_config] + daemon_config.get("shared-networks", []):
+            for subnet in network.get("subnet4", []):
+                try:
+                    size = sum(_pool_size(p["pool"]) for p in subnet.get("pools", []))
+                except ValueError:
+                    size = None
+                subnets[subnet["id"]] = (subnet["subnet"], size)
+            for subnet in network.get("subnet6", []):
+                subnets[subnet["id"]] = (subnet["subnet"], None)
+    return subnets
+
+
+def format_service(service, counts, subnets):
+    lines = [
+        "[%s]" % service,
+        "\t".join(["@subnet", "id", "subnet", "total-addresses", "active-leases", "expired-leases", "declined-leases"]),
+    ]
+    for subnet_id in sorted(counts):
+        prefix, size = subnets.get(subnet_id, ("", None))
+        lines.append(
+            "\t".join(
+                ["subnet", str(subnet_id), prefix, "" if size is None else str(size)]
+                + [str(c) for c in counts[subnet_id]]
+            )
+        )
+    return lines
+
+
+def main():
+    config = read_config()
+    now = time.time()
+    lines = []
+    for family in ("4", "6"):
+        lease_path = config["leases" + family]
+        if not os.path.exists(lease_path):
+            continue
+        state_path = os.path.join(STATE_DIR, "kea_leases%s.state" % family)
+        state = LeaseState.load(state_path)
+        try:
+            state.update(lease_path)
+        except OSError as exc:
+            sys.stderr.write("mk_kea_leases: %s: %s\n" % (lease_path, exc))
+            continue
+        state.save(state_path)
+        lines.extend(
+            format_service(
+                "dhcp" + family,
+                state.per_subnet(now),
+                read_kea_subnets(config["config" + family]),
+            )
+        )
+
+    if lines:
+        sys.stdout.write("<<<kea_leases:sep(9)>>>\n")
+        sys.stdout.write("snapshot\t%d\t0\n" % now)
+        sys.stdout.write("\n".join(lines) + "\n")
+
+
+if __name__ == "__main__":
+    main()
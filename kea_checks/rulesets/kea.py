@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+from cmk.rulesets.v1 import Title
+from cmk.rulesets.v1.form_specs import (
+    DefaultValue, DictElement, Dictionary, Float, InputHint, LevelDirection, LevelsType, SimpleLevels,
+    TimeMagnitude, TimeSpan
+)
+from cmk.rulesets.v1.rule_specs import CheckParameters, HostAndItemCondition, HostCondition, Topic
+
+
+def _levels(title, direction, unit, levels=None):
+    """Levels prefilled with levels; without, no levels until the user enters some"""
+    if levels is None:
+        prefill = {
+            "prefill_levels_type": DefaultValue(LevelsType.NONE),
+            "prefill_fixed_levels": InputHint((0.0, 0.0)),
+        }
+    else:
+        prefill = {"prefill_fixed_levels": DefaultValue(levels)}
+    return DictElement(
+        parameter_form=SimpleLevels(
+            title=Title(title),
+            level_direction=direction,
+            form_spec_template=Float(unit_symbol=unit),
+            **prefill,
+        ),
+        required=True,
+    )
+
+
+def _parameter_form_kea():
+    return Dictionary(
+        elements={
+            "packet_rate": _levels("Upper levels for received packets", LevelDirection.UPPER, "1/s"),
+            "decline_rate": _levels("Upper levels for DECLINE rate", LevelDirection.UPPER, "1/s", (1.0, 5.0)),
+            "nak_ratio": _levels("Upper levels for NAK ratio", LevelDirection.UPPER, "%", (5.0, 10.0)),
+            "offer_ratio": _levels(
+                "Lower levels for DISCOVER to OFFER (SOLICIT to ADVERTISE) ratio",
+                LevelDirection.LOWER,
+                "%",
+                (80.0, 50.0),
+            ),
+            "snapshot_age": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Upper levels for the age of the Kea statistics"),
+                    level_direction=LevelDirection.UPPER,
+                    form_spec_template=TimeSpan(
+                        displayed_magnitudes=[TimeMagnitude.MINUTE, TimeMagnitude.SECOND],
+                    ),
+                    prefill_fixed_levels=DefaultValue((900.0, 1800.0)),
+                ),
+                required=True,
+            ),
+        },
+    )
+
+
+rule_spec_kea = CheckParameters(
+    name="kea",
+    title=Title("ISC Kea DHCP packet rates"),
+    topic=Topic.NETWORKING,
+    parameter_form=_parameter_form_kea,
+    condition=HostCondition(),
+)
+
+
+def _parameter_form_kea_subnet():
+    return Dictionary(
+        elements={
+            "usage": _levels("Upper levels for pool usage", LevelDirection.UPPER, "%", (80.0, 90.0)),
+            "lease_churn": _levels("Upper levels for lease churn", LevelDirection.UPPER, "1/s"),
+        },
+    )
+
+
+rule_spec_kea_subnet = CheckParameters(
+    name="kea_subnet",
+    title=Title("ISC Kea DHCP subnets"),
+    topic=Topic.NETWORKING,
+    parameter_form=_parameter_form_kea_subnet,
+    condition=HostAndItemCondition(item_title=Title("Subnet")),
+)
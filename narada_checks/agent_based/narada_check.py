@@ -1,7 +1,28 @@
 #!/usr/bin/env python3
 
 from cmk.agent_based.v2 import (
-    SimpleSNMPSection, CheckPlugin, Service, Result, State, Metric, check_levels, startswith, SNMPTree
+    SimpleSNMPSection, AgentSection, CheckPlugin, Service, Result, State, Metric, check_levels, startswith, all_of, SNMPTree, OIDEnd
+)
+
+from cmk_addons.plugins.plugin_metrics.lib.metrics import select_metrics
+from cmk_addons.plugins.plugin_profiling.lib.profiling import profiled
+
+# ------------------------
+# Detection
+# ------------------------
+
+# Narada modules hang off an Eltek controller. The prefetched sysObjectID
+# rules out every non-Eltek host without a GET; only Eltek controllers get
+# probed for the battery table.
+DETECT_NARADA = all_of(
+    startswith(".1.3.6.1.2.1.1.2.0", ".1.3.6.1.4.1.12148"),
+    startswith(".1.3.6.1.4.1.12148.10.13.24.1.2.1", "1:BattSOC"),
+)
+
+# DETECT_NARADA for the eltek_poller special agent, in the form of
+# POLLER_DETECT_ELTEK (see eltek_checks/agent_based/eltek_check.py)
+POLLER_DETECT_NARADA = (
+    ((".1.3.6.1.2.1.1.2.0", r"\.1\.3\.6\.1\.4\.1\.12148.*"), (".1.3.6.1.4.1.12148.10.13.24.1.2.1", r"1:BattSOC.*")),
 )
 
 # ------------------------
@@ -31,68 +52,74 @@ def _render_ahr(val):
 # Parser: SNMP table for Narada metrics
 # ------------------------
 
-def parse_narada_battery_struct(string_table):
-    flat_values = string_table[0]
-    if len(flat_values) != 24:
-        raise ValueError(f"Expected 24 SNMP values, got {len(flat_values)}")
-
-    labels = flat_values[0:8]
-    value_strs = flat_values[8:16]
-    units = flat_values[16:24]
+# Raw SNMP values are fixed-point; divide by these to get the real value.
+METRIC_SCALES = {
+    "BattSOC": 100,
+    "BattTempInt": 10,
+    "BattTempAmb": 10,
+    "BattRemCap": 10,
+}
 
-    result = []
-    for i in range(8):
-        label = labels[i]
-        value_str = value_strs[i]
-        unit = units[i]
+def parse_narada_battery_struct(string_table):
+    """Index the walked label/value/unit table by battery number
 
-        if ':' not in label:
-            raise ValueError(f"Invalid label format: {label}")
-        battery_id, metric = label.split(":", 1)
+    Each row is one metric of one battery, labelled "<battery>:<metric>".
+    The result maps battery number -> {metric: scaled value}, so checking
+    an item is a single lookup regardless of the number of batteries.
+    Only the labels in METRIC_SCALES are measurements; values of other
+    labels are kept as the stripped text, so digit strings keep their
+    leading zeros. Malformed measurements are None. No section if no row
+    is usable.
+    """
+    result = {}
+    for row in string_table:
+        if len(row) < 3:
+            continue
+        label, value_str = row[1], row[2]
+        battery_id, sep, metric = label.partition(":")
+        if not sep or not battery_id.isdigit():
+            continue
 
-        try:
-            value = int(value_str.decode() if isinstance(value_str, bytes) else value_str)
-        except ValueError:
-            value = None
+        if metric in METRIC_SCALES:
+            try:
+                value = int(value_str) / METRIC_SCALES[metric]
+            except ValueError:
+                value = None
+        else:
+            value = value_str.strip() or None
 
-        result.append({
-            "battery": int(battery_id),
-            "metric": metric,
-            "raw_value": value,
-            "unit": unit.decode() if isinstance(unit, bytes) else unit,
-        })
+        result.setdefault(int(battery_id), {})[metric] = value
 
-    return result
+    return result or None
 
 # ------------------------
 # Discovery
 # ------------------------
 
 def discover_narada_struct(section):
-    seen = set()
-    for entry in section:
-        seen.add(entry["battery"])
-    for b in seen:
+    for b in sorted(section):
         yield Service(item=f"{b}")
 
 # ------------------------
 # Main check logic with labels
 # ------------------------
 
-def check_narada_struct(item, section):
+def check_narada_struct(item, params, section):
     battery_index = int(item)
-    metrics = {e["metric"]: e for e in section if e["battery"] == battery_index}
+    metrics = section.get(battery_index)
+    if metrics is None:
+        return
 
     required = ["BattSOC", "BattTempInt", "BattTempAmb", "BattRemCap"]
-    missing = [k for k in required if k not in metrics]
+    missing = [k for k in required if metrics.get(k) is None]
     if missing:
         yield Result(state=State.UNKNOWN, summary=f"[Battery {battery_index}] Missing metrics: {', '.join(missing)}")
         return
 
-    soc = metrics["BattSOC"]["raw_value"] / 100
-    temp_int_c = metrics["BattTempInt"]["raw_value"] / 10
-    temp_amb_c = metrics["BattTempAmb"]["raw_value"] / 10
-    remcap = metrics["BattRemCap"]["raw_value"] / 10
+    soc = metrics["BattSOC"]
+    temp_int_c = metrics["BattTempInt"]
+    temp_amb_c = metrics["BattTempAmb"]
+    remcap = metrics["BattRemCap"]
 
     temp_int_f = temp_int_c * 9 / 5 + 32
 
@@ -117,32 +144,144 @@ def check_narada_struct(item, section):
     yield Metric("ambient_temp", temp_amb_c, boundaries=(0, 80))
     yield Metric("remaining_capacity", remcap)
 
+# ------------------------
+# Battery string aggregate
+# ------------------------
+
+STRING_SOC_LEVELS_LOWER = ("fixed", (40.0, 20.0))
+STRING_TEMP_SPREAD_LEVELS_UPPER = ("fixed", (5.0, 10.0))
+
+def discover_narada_string(section):
+    if section:
+        yield Service()
+
+def check_narada_string(params, section):
+    modules = 0
+    soc_sum = 0.0
+    soc_min = soc_max = None
+    temp_min = temp_max = None
+    remcap_total = 0.0
+    worst_module = None
+
+    # One pass over all modules, skipping modules with incomplete data
+    for battery_index, metrics in section.items():
+        soc = metrics.get("BattSOC")
+        temp_int_c = metrics.get("BattTempInt")
+        remcap = metrics.get("BattRemCap")
+        if soc is None or temp_int_c is None or remcap is None:
+            continue
+
+        modules += 1
+        soc_sum += soc
+        remcap_total += remcap
+        if soc_min is None or soc < soc_min:
+            soc_min = soc
+            worst_module = battery_index
+        if soc_max is None or soc > soc_max:
+            soc_max = soc
+        if temp_min is None or temp_int_c < temp_min:
+            temp_min = temp_int_c
+        if temp_max is None or temp_int_c > temp_max:
+            temp_max = temp_int_c
+
+    if not modules:
+        yield Result(state=State.UNKNOWN, summary="No battery module reports complete data")
+        return
+
+    yield Result(state=State.OK, summary=f"{modules} modules, weakest: Battery {worst_module}")
+    yield from check_levels(
+        value=soc_min,
+        levels_lower=STRING_SOC_LEVELS_LOWER,
+        metric_name="string_soc_min",
+        render_func=_render_percent,
+        label="Min SOC",
+        boundaries=(0, 100),
+    )
+    yield from check_levels(
+        value=soc_sum / modules,
+        metric_name="string_soc_mean",
+        render_func=_render_percent,
+        label="Mean SOC",
+        boundaries=(0, 100),
+    )
+    yield from check_levels(
+        value=soc_max,
+        metric_name="string_soc_max",
+        render_func=_render_percent,
+        label="Max SOC",
+        boundaries=(0, 100),
+    )
+    yield from check_levels(
+        value=temp_max - temp_min,
+        levels_upper=STRING_TEMP_SPREAD_LEVELS_UPPER,
+        metric_name="string_temp_spread",
+        render_func=lambda v: f"{v:.1f} °C",
+        label="Internal temp spread",
+    )
+    yield from check_levels(
+        value=remcap_total,
+        metric_name="string_remaining_capacity",
+        render_func=_render_ahr,
+        label="Total remaining capacity",
+    )
+    yield Metric("string_worst_module", worst_module)
+
 # ------------------------
 # SNMP Section
 # ------------------------
 
+# Battery table, indexed by OIDEnd; also walked by the eltek_poller special agent
+NARADA_TABLE = ".1.3.6.1.4.1.12148.10.13.24.1"
+NARADA_COLUMNS = (
+    "2",  # Labels ("<battery>:<metric>")
+    "3",  # Values
+    "4",  # Units
+)
+
 snmp_section_narada_battery_table = SimpleSNMPSection(
     name="narada_battery_table",
-    parse_function=parse_narada_battery_struct,
-    detect=startswith(".1.3.6.1.4.1.12148.10.13.24.1.2.1", "1:BattSOC"),
+    parse_function=profiled(parse_narada_battery_struct),
+    detect=DETECT_NARADA,
     fetch=SNMPTree(
-        base=".1.3.6.1.4.1.12148.10.13.24.1",
-        oids=[
-            "2.1", "2.2", "2.3", "2.4", "2.5", "2.6", "2.7", "2.8",  # Labels
-            "3.1", "3.2", "3.3", "3.4", "3.5", "3.6", "3.7", "3.8",  # Values
-            "4.1", "4.2", "4.3", "4.4", "4.5", "4.6", "4.7", "4.8",  # Units
-        ]
+        base=NARADA_TABLE,
+        oids=[OIDEnd(), *NARADA_COLUMNS],
     )
 )
 
+# Same table as piggyback data of the eltek_poller special agent (see
+# eltek_checks/libexec/agent_eltek_poller), lines prefixed with the tree number
+def parse_narada_poller(string_table):
+    return parse_narada_battery_struct([line[1:] for line in string_table if line[:1] == ["0"]])
+
+agent_section_narada_battery_table_poller = AgentSection(
+    name="narada_battery_table_poller",
+    parsed_section_name="narada_battery_table",
+    parse_function=profiled(parse_narada_poller),
+)
+
 # ------------------------
 # Plugin Registration
 # ------------------------
 
+ESSENTIAL_METRICS_MODULE = ("state_of_charge",)
+ESSENTIAL_METRICS_STRING = ("string_soc_min", "string_soc_mean")
+
 check_plugin_narada_battery_table = CheckPlugin(
     name="narada_battery_table",
     service_name="Narada Battery %s",
-    discovery_function=discover_narada_struct,
-    check_function=check_narada_struct,
+    discovery_function=profiled(discover_narada_struct),
+    check_function=profiled(select_metrics(check_narada_struct, ESSENTIAL_METRICS_MODULE)),
+    check_default_parameters={"metrics": "full"},
+    check_ruleset_name="narada_battery_table",
+    sections=["narada_battery_table"],
+)
+
+check_plugin_narada_battery_string = CheckPlugin(
+    name="narada_battery_string",
+    service_name="Narada Battery String",
+    discovery_function=profiled(discover_narada_string),
+    check_function=profiled(select_metrics(check_narada_string, ESSENTIAL_METRICS_STRING)),
+    check_default_parameters={"metrics": "full"},
+    check_ruleset_name="narada_battery_string",
     sections=["narada_battery_table"],
 )
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+from cmk.agent_based.v2 import InventoryPlugin, Attributes, TableRow
+
+from cmk_addons.plugins.plugin_profiling.lib.profiling import profiled
+
+# Data comes from the "narada_battery_table" section (see narada_check.py).
+# The table labels known from real controllers are measurements only, so
+# the inventory lists the modules and their count. Model, serial or
+# firmware labels can be added once a walk of a real battery monitor
+# shows their names.
+
+# ------------------------
+# Inventory
+# ------------------------
+
+def inventory_narada(section):
+    for battery in sorted(section):
+        yield TableRow(
+            path=["hardware", "components", "batteries"],
+            key_columns={"index": str(battery)},
+            inventory_columns={"manufacturer": "Narada"},
+        )
+    yield Attributes(
+        path=["hardware", "power_system"],
+        inventory_attributes={"battery_modules": len(section)},
+    )
+
+inventory_plugin_narada = InventoryPlugin(
+    name="narada",
+    sections=["narada_battery_table"],
+    inventory_function=profiled(inventory_narada),
+)
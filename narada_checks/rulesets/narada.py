@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+from cmk.rulesets.v1 import Title
+from cmk.rulesets.v1.form_specs import Dictionary
+from cmk.rulesets.v1.rule_specs import CheckParameters, HostAndItemCondition, HostCondition, Topic
+
+from cmk_addons.plugins.plugin_metrics.lib.form import metrics_element
+
+
+def _parameter_form_battery():
+    return Dictionary(
+        elements={
+            "metrics": metrics_element("state of charge"),
+        },
+    )
+
+
+rule_spec_narada_battery_table = CheckParameters(
+    name="narada_battery_table",
+    title=Title("Narada battery modules"),
+    topic=Topic.ENVIRONMENTAL,
+    parameter_form=_parameter_form_battery,
+    condition=HostAndItemCondition(item_title=Title("Battery module")),
+)
+
+
+def _parameter_form_string():
+    return Dictionary(
+        elements={
+            "metrics": metrics_element("minimum and mean SOC"),
+        },
+    )
+
+
+rule_spec_narada_battery_string = CheckParameters(
+    name="narada_battery_string",
+    title=Title("Narada battery string"),
+    topic=Topic.ENVIRONMENTAL,
+    parameter_form=_parameter_form_string,
+    condition=HostCondition(),
+)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Hysteresis and a minimum duration for alarm conditions
+
+A value hovering around a threshold (mains voltage during a brown-out, a
+battery current around the charging limit) makes a check flip its state
+on every check, and every flip is a notification and a history entry.
+damped_level() keeps the reported level of such a condition in the value
+store and changes it only when
+
+  - the value has left the current level by the hysteresis band (entering
+    a level needs the threshold itself), and
+  - the new level has been seen on every check for `delay` seconds.
+
+The level is the number of thresholds the value has reached: 0 (OK),
+1 (WARN), 2 (CRIT) for (warn, crit) levels, 0 or 1 for a single
+threshold. Both directions compare inclusively: upper thresholds are
+reached at value >= threshold, lower ones at value <= threshold.
+
+Without history (new service, value store lost) the current level is
+reported at once, so a restart of the core does not delay an alarm.
+"""
+
+from typing import NamedTuple
+
+from cmk.agent_based.v2 import Result, State, Metric, render
+
+
+class Damping(NamedTuple):
+    hysteresis: float   # how far the value must be back across a threshold to leave a level
+    delay: float        # seconds a new level must persist before it is reported
+
+    @classmethod
+    def from_params(cls, params):
+        """From a {"hysteresis": float, "delay": seconds} check parameter"""
+        return cls(params["hysteresis"], params["delay"])
+
+
+class DampedLevel(NamedTuple):
+    level: int              # reported level
+    pending: int | None     # level the value is at, while it is not reported yet
+    pending_for: float      # seconds the pending level has been seen
+
+    @property
+    def state(self):
+        return (State.OK, State.WARN, State.CRIT)[min(self.level, 2)]
+
+
+def _level(value, thresholds, current, hysteresis, lower):
+    """Number of thresholds reached, leaving those up to current only by the band"""
+    level = 0
+    for index, threshold in enumerate(thresholds):
+        margin = hysteresis if index < current else 0.0
+        reached = value <= threshold + margin if lower else value >= threshold - margin
+        if not reached:
+            break
+        level = index + 1
+    return level
+
+
+def damped_level(value_store, key, value, thresholds, damping, now, lower=False):
+    """Reported level of value against thresholds (ascending severity), as a DampedLevel
+
+    The value store entry under key is (reported level, pending level, seen
+    since). A pending level moving further in the same direction keeps its
+    timer, so a value rising past warn and crit is not delayed twice.
+    """
+    last = value_store.get(key)
+    if last is None or now < last[2]:
+        level = _level(value, thresholds, 0, 0.0, lower)
+        value_store[key] = (level, level, now)
+        return DampedLevel(level, None, 0.0)
+
+    reported, pending, since = last
+    level = _level(value, thresholds, reported, damping.hysteresis, lower)
+    if level == reported:
+        value_store[key] = (reported, reported, now)
+        return DampedLevel(reported, None, 0.0)
+    if pending == reported or (pending > reported) != (level > reported):
+        since = now
+    if now - since >= damping.delay:
+        value_store[key] = (level, level, now)
+        return DampedLevel(level, None, 0.0)
+    value_store[key] = (reported, level, since)
+    return DampedLevel(reported, level, now - since)
+
+
+def pending_result(damped, damping, raised, cleared):
+    """Notice about a level change that is not reported yet, or None
+
+    raised and cleared describe the change up or down, e.g. "Mains L1 down"
+    and "Mains L1 back".
+    """
+    if damped.pending is None:
+        return None
+    change = raised if damped.pending > damped.level else cleared
+    return Result(
+        state=State.OK,
+        notice=f"{change} for {render.timespan(damped.pending_for)}, "
+        f"reported after {render.timespan(damping.delay)}",
+    )
+
+
+def check_damped_levels(damped, value, levels_upper, *, metric_name, render_func, label, boundaries=None):
+    """Like check_levels with fixed upper levels, but in the state of damped"""
+    warn_crit = levels_upper[1] if levels_upper[0] == "fixed" else None
+    text = f"{label}: {render_func(value)}"
+    if damped.level and warn_crit is not None:
+        text += f" (warn/crit at {render_func(warn_crit[0])}/{render_func(warn_crit[1])})"
+    yield Result(state=damped.state, summary=text)
+    yield Metric(metric_name, value, levels=warn_crit, boundaries=boundaries)
+
+
+def upper_thresholds(levels_upper):
+    """(warn, crit) of SimpleLevels parameters, () for no levels"""
+    return tuple(levels_upper[1]) if levels_upper[0] == "fixed" else ()
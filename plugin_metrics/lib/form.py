@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""Ruleset element for the "metrics" check parameter (see metrics.py)"""
+
+from cmk.rulesets.v1 import Help, Title
+from cmk.rulesets.v1.form_specs import DefaultValue, DictElement, SingleChoice, SingleChoiceElement
+
+
+def metrics_element(essential):
+    """Optional "metrics" DictElement; essential names the essential metrics for the help text"""
+    return DictElement(
+        parameter_form=SingleChoice(
+            title=Title("Metrics"),
+            help_text=Help(
+                "Which metrics the service emits. States and levels are evaluated the same way in every "
+                "case; fewer metrics only mean fewer RRD updates. Essential: %s."
+            ) % essential,
+            elements=[
+                SingleChoiceElement(name="full", title=Title("All metrics")),
+                SingleChoiceElement(name="essential", title=Title("Essential metrics only")),
+                SingleChoiceElement(name="none", title=Title("No metrics")),
+            ],
+            prefill=DefaultValue("full"),
+        ),
+    )
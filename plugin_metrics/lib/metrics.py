@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Metric selection by check parameter, to cut the RRD update load
+
+Every check plugin of this repo that emits metrics has the check parameter
+"metrics", set in its ruleset:
+
+    full        all metrics (default)
+    essential   only the metrics the plugin lists as essential, those the
+                dashboards graph
+    none        no metrics
+
+Only Metric objects are dropped; states, summaries and the levels of
+check_levels are evaluated as before. Register the check function through
+select_metrics():
+
+    check_function = profiled(select_metrics(check_eltek, ESSENTIAL_METRICS)),
+
+The metrics a host emits are counted by the profiling
+(plugin_profiling/lib/profiling.py, report with --by metrics).
+"""
+
+import functools
+
+from cmk.agent_based.v2 import Metric
+
+METRIC_MODES = ("full", "essential", "none")
+DEFAULT_MODE = "full"
+
+
+def select_metrics(check_function, essential=()):
+    """check_function, emitting only the metrics its params["metrics"] selects
+
+    The wrapper keeps the signature, so check_function must take params.
+    """
+    essential = frozenset(essential)
+
+    @functools.wraps(check_function)
+    def wrapper(*args, **kwargs):
+        mode = kwargs["params"].get("metrics", DEFAULT_MODE)
+        if mode == "full":
+            yield from check_function(*args, **kwargs)
+            return
+        for result in check_function(*args, **kwargs):
+            if isinstance(result, Metric) and (mode == "none" or result.name not in essential):
+                continue
+            yield result
+
+    return wrapper
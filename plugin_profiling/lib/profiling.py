@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""Opt-in cost accounting of parse, discovery, check and inventory functions
+
+Every plugin of this repo registers its functions through profiled():
+
+    check_function = profiled(check_eltek),
+
+Disabled (the default), profiled() returns the function itself, so there is
+no cost at all after import. Enabled, each call is counted with its wall
+and CPU time and whether it raised, per function and per host, and the
+totals are appended to a file every FLUSH_INTERVAL seconds and at exit.
+
+Enable it with the environment variable CMK_ADDONS_PROFILE (the output file,
+or "1" for the default file), or by putting the output file into
+~/etc/check_mk/plugin_profile.cfg (lines starting with # are ignored). The
+switch is read when the plugins are loaded, so restart the core (cmk -R)
+after changing it. Report the top functions with
+
+    python3 ~/local/lib/python3/cmk_addons/plugins/plugin_profiling/lib/profiling.py [--by host|metrics] [file]
+
+The file has one line per function, host and flush:
+<unix time> <function> <host> <calls> <wall ns> <cpu ns> <exceptions>
+<metrics> <metric series>, tab separated. metrics is the number of Metric
+objects the function yielded, metric series the number of distinct
+(item, metric name) pairs it has yielded for the host since the start
+(the RRD files it feeds). --by metrics reports them per host, to size the
+RRD storage.
+"""
+
+import argparse
+import atexit
+import functools
+import inspect
+import os
+import sys
+import time
+
+try:
+    from cmk.agent_based.v2 import Metric
+except ImportError:
+    # Report only, outside of a site
+    Metric = ()
+
+try:
+    # Host the plugin is currently run for (not part of the plugin API)
+    from cmk.base.plugin_contexts import host_name as _current_host
+except ImportError:
+    _current_host = None
+
+ENV_VARIABLE = "CMK_ADDONS_PROFILE"
+SITE_DIR = os.environ.get("OMD_ROOT", os.path.expanduser("~"))
+CONFIG_FILE = os.path.join(SITE_DIR, "etc", "check_mk", "plugin_profile.cfg")
+DEFAULT_OUTPUT = os.path.join(SITE_DIR, "var", "check_mk", "plugin_profile.tsv")
+FLUSH_INTERVAL = 60  # seconds
+
+
+def _configured_output():
+    """Output file if profiling is switched on, else None"""
+    value = os.environ.get(ENV_VARIABLE, "").strip()
+    if value in ("0", "no", "off"):
+        return None
+    if value:
+        return DEFAULT_OUTPUT if value in ("1", "yes", "on") else value
+    try:
+        with open(CONFIG_FILE, encoding="utf-8") as config:
+            lines = [line.strip() for line in config if line.strip() and not line.startswith("#")]
+    except OSError:
+        return None
+    return lines[0] if lines else DEFAULT_OUTPUT
+
+
+# ------------------------
+# Recording
+# ------------------------
+
+
+class Recorder:
+    """Totals per (function, host), flushed to an append-only file"""
+
+    def __init__(self, output):
+        self.output = output
+        self.host = _current_host
+        self.totals = {}  # (function, host) -> [calls, wall ns, cpu ns, exceptions, metrics]
+        self.series = {}  # (function, host) -> {(item, metric name)}, kept across flushes
+        self._next_flush = time.monotonic() + FLUSH_INTERVAL
+
+    def host_name(self):
+        if self.host is None:
+            return "-"
+        try:
+            return str(self.host())
+        except Exception:  # pylint: disable=broad-except
+            return "-"
+
+    def record(self, function, wall, cpu, failed, item=None, metrics=()):
+        key = (function, self.host_name())
+        totals = self.totals.get(key)
+        if totals is None:
+            totals = self.totals[key] = [0, 0, 0, 0, 0]
+        totals[0] += 1
+        totals[1] += wall
+        totals[2] += cpu
+        totals[3] += failed
+        if metrics:
+            totals[4] += len(metrics)
+            self.series.setdefault(key, set()).update((item, name) for name in metrics)
+        if time.monotonic() >= self._next_flush:
+            self.flush()
+
+    def flush(self):
+        self._next_flush = time.monotonic() + FLUSH_INTERVAL
+        if not self.totals:
+            return
+        now = int(time.time())
+        lines = "".join(
+            f"{now}\t{function}\t{host}\t" + "\t".join(str(v) for v in totals)
+            + f"\t{len(self.series.get((function, host), ()))}\n"
+            for (function, host), totals in self.totals.items()
+        )
+        self.totals = {}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.output)), exist_ok=True)
+            # One write per flush, so lines of concurrent helpers do not mix
+            with open(self.output, "a", encoding="utf-8") as output:
+                output.write(lines)
+        except OSError:
+            pass
+
+
+def _make_recorder():
+    output = _configured_output()
+    if output is None:
+        return None
+    recorder = Recorder(output)
+    atexit.register(recorder.flush)
+    return recorder
+
+
+_recorder = _make_recorder()
+
+
+def set_host_function(function):
+    """Where host names come from outside of a Checkmk check (tools, benchmarks)"""
+    if _recorder is not None:
+        _recorder.host = function
+
+
+def profiled(function):
+    """function, wrapped to record its cost if profiling is enabled
+
+    The wrapper keeps the signature (Checkmk validates the argument names)
+    and stays a generator for generator functions, so the time to exhaust
+    a check function is measured, not just the call. The Metric objects
+    a generator yields are counted.
+    """
+    recorder = _recorder
+    if recorder is None:
+        return function
+    name = f"{function.__module__.rsplit('.', 1)[-1]}.{function.__name__}"
+    wall_ns = time.perf_counter_ns
+    cpu_ns = time.thread_time_ns
+
+    if inspect.isgeneratorfunction(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            wall, cpu, failed = wall_ns(), cpu_ns(), True
+            metrics = []
+            results = function(*args, **kwargs)
+            try:
+                for result in results:
+                    if isinstance(result, Metric):
+                        metrics.append(result.name)
+                    yield result
+                failed = False
+            except GeneratorExit:
+                results.close()
+                failed = False
+                raise
+            finally:
+                recorder.record(name, wall_ns() - wall, cpu_ns() - cpu, failed, kwargs.get("item"), metrics)
+    else:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            wall, cpu, failed = wall_ns(), cpu_ns(), True
+            try:
+                result = function(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                recorder.record(name, wall_ns() - wall, cpu_ns() - cpu, failed)
+    return wrapper
+
+
+# ------------------------
+# Report
+# ------------------------
+
+
+def read_totals(path, by_host=False):
+    """{function or (function, host): [calls, wall ns, cpu ns, exceptions, metrics, metric series]}
+
+    Files written before metrics were counted (7 fields per line) read as
+    zero metrics.
+    """
+    totals = {}
+    series = {}  # (function, host) -> latest count, a running total
+    with open(path, encoding="utf-8") as data:
+        for line in data:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) == 7:
+                fields += ["0", "0"]
+            elif len(fields) != 9:
+                continue
+            _time, function, host, *values, metric_series = fields
+            key = (function, host) if by_host else function
+            current = totals.setdefault(key, [0, 0, 0, 0, 0, 0])
+            for pos, value in enumerate(values):
+                current[pos] += int(value)
+            series[(function, host)] = int(metric_series)
+    for (function, host), count in series.items():
+        totals[(function, host) if by_host else function][5] += count
+    return totals
+
+
+def report(path, by_host=False, top=20, out=sys.stdout):
+    totals = read_totals(path, by_host)
+    grand_total = sum(values[1] for values in totals.values()) or 1
+    out.write(
+        f"{'function' + (' / host' if by_host else ''):48} {'calls':>9} {'wall s':>9} {'share':>6} "
+        f"{'cpu s':>9} {'us/call':>9} {'errors':>7}\n"
+    )
+    ranked = sorted(totals.items(), key=lambda item: -item[1][1])
+    for key, (calls, wall, cpu, errors, _metrics, _series) in ranked[:top]:
+        label = " / ".join(key) if by_host else key
+        out.write(
+            f"{label[:48]:48} {calls:9} {wall / 1e9:9.3f} {100 * wall / grand_total:5.1f}% "
+            f"{cpu / 1e9:9.3f} {wall / 1e3 / max(calls, 1):9.1f} {errors:7}\n"
+        )
+
+
+def report_metrics(path, top=20, out=sys.stdout):
+    """Metric series (RRD files) and metrics emitted per host"""
+    hosts = {}
+    for (_function, host), values in read_totals(path, by_host=True).items():
+        current = hosts.setdefault(host, [0, 0])
+        current[0] += values[5]
+        current[1] += values[4]
+    out.write(f"{'host':48} {'series':>9} {'metrics':>12}\n")
+    ranked = sorted(hosts.items(), key=lambda item: -item[1][0])
+    for host, (series, metrics) in ranked[:top]:
+        out.write(f"{host[:48]:48} {series:9} {metrics:12}\n")
+    total_series = sum(series for series, _metrics in hosts.values())
+    out.write(f"{f'total ({len(hosts)} hosts)':48} {total_series:9} {sum(m for _s, m in hosts.values()):12}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Top plugin functions by total wall time")
+    parser.add_argument("file", nargs="?", default=_configured_output() or DEFAULT_OUTPUT)
+    parser.add_argument("--by", choices=("function", "host", "metrics"), default="function")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+    try:
+        if args.by == "metrics":
+            report_metrics(args.file, top=args.top)
+        else:
+            report(args.file, by_host=args.by == "host", top=args.top)
+    except OSError as exc:
+        parser.exit(1, f"{exc}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
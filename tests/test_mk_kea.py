@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""mk_kea.py against a fake Kea control socket
+
+    python3 -m pytest tests
+
+The fake serves canned "statistic-get-all" and "config-get" answers over a
+temporary AF_UNIX socket, like Kea: read one command, answer, close.
+"""
+
+import contextlib
+import fcntl
+import importlib.util
+import io
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLUGIN = os.path.join(REPO, "kea_checks", "agents", "plugins", "mk_kea.py")
+
+STATISTICS = {
+    "pkt4-received": [[1000, "2026-01-01 00:00:00.000000"]],
+    "pkt4-sent": [[900, "2026-01-01 00:00:00.000000"]],
+    "subnet[1].total-addresses": [[254, "2026-01-01 00:00:00.000000"]],
+    "subnet[1].assigned-addresses": [[100, "2026-01-01 00:00:00.000000"]],
+}
+CONFIG = {"Dhcp4": {"subnet4": [{"id": 1, "subnet": "10.0.0.0/24"}]}}
+ANSWERS = {
+    "statistic-get-all": {"result": 0, "arguments": STATISTICS},
+    "config-get": {"result": 0, "arguments": CONFIG},
+}
+
+
+def load_plugin():
+    spec = importlib.util.spec_from_file_location("mk_kea", PLUGIN)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeKea:
+    """Kea control socket in a thread; hang=True accepts but never answers"""
+
+    def __init__(self, path, hang=False):
+        self.path = path
+        self.hang = hang
+        self.commands = []
+        self._stop = threading.Event()
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(path)
+        self._server.listen(5)
+        self._server.settimeout(0.05)
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                connection, _address = self._server.accept()
+            except socket.timeout:
+                continue
+            with connection:
+                request = self._read_request(connection)
+                self.commands.append(request["command"])
+                if self.hang:
+                    self._stop.wait()
+                    continue
+                connection.sendall(json.dumps(ANSWERS[request["command"]]).encode())
+
+    @staticmethod
+    def _read_request(connection):
+        data = b""
+        while True:
+            data += connection.recv(4096)
+            try:
+                return json.loads(data)
+            except ValueError:
+                continue
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self._server.close()
+        os.unlink(self.path)
+
+
+class MkKeaTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.plugin = load_plugin()
+        self.plugin.CACHE_FILE = os.path.join(self.tmp.name, "kea_check.cache")
+        self.socket = os.path.join(self.tmp.name, "kea4-ctrl-socket")
+        self.config = {
+            "dhcp4_socket": self.socket,
+            "dhcp6_socket": os.path.join(self.tmp.name, "no-such-socket"),
+            "timeout": "0.5",
+            "cache_age": "60",
+        }
+
+    def fake_kea(self, hang=False):
+        kea = FakeKea(self.socket, hang)
+        self.addCleanup(lambda: os.path.exists(self.socket) and kea.close())
+        return kea
+
+    def run_plugin(self, cache_age=60):
+        output = io.StringIO()
+        argv = [
+            "--dhcp4-socket", self.config["dhcp4_socket"],
+            "--dhcp6-socket", self.config["dhcp6_socket"],
+            "--cache-age", str(cache_age),
+        ]
+        with contextlib.redirect_stdout(output):
+            self.plugin.main(argv)
+        return output.getvalue().splitlines()
+
+    def test_snapshot(self):
+        kea = self.fake_kea()
+        lines = self.run_plugin()
+        self.assertEqual(kea.commands, ["statistic-get-all", "config-get"])
+        self.assertTrue(lines[0].startswith("<<<kea_check:sep(9):cached("))
+        self.assertRegex(lines[1], r"^snapshot\t\d+\t0$")
+        self.assertIn("[dhcp4]", lines)
+        self.assertIn("@global\tpkt4-received\tpkt4-sent", lines)
+        self.assertIn("global\t1000\t900", lines)
+        self.assertIn("subnet\t1\t10.0.0.0/24\t100\t254", lines)
+        # Within cache_age the cached snapshot is printed, Kea is not asked
+        self.assertEqual(self.run_plugin()[2:], lines[2:])
+        self.assertEqual(len(kea.commands), 2)
+
+    def test_socket_down_keeps_snapshot_marked_stale(self):
+        self.fake_kea().close()
+        self.plugin.write_cache(time.time() - 300, time.time() - 300, [], ["[dhcp4]", "global\t1"])
+        self.plugin.refresh(self.config)
+        lines = self.run_plugin()
+        self.assertRegex(lines[1], r"^snapshot\t\d+\t1\tdhcp4$")
+        self.assertEqual(lines[2:], ["[dhcp4]", "global\t1"])
+
+    def test_one_socket_down_keeps_the_other_service(self):
+        kea = self.fake_kea()
+        # A socket file nobody listens on: connect() is refused
+        self.config["dhcp6_socket"] = os.path.join(self.tmp.name, "kea6-ctrl-socket")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as dead:
+            dead.bind(self.config["dhcp6_socket"])
+        self.plugin.write_cache(
+            time.time() - 300, time.time() - 300, [],
+            ["[dhcp4]", "global\t1", "[dhcp6]", "global\t2"],
+        )
+        self.plugin.refresh(self.config)
+        self.assertEqual(kea.commands, ["statistic-get-all", "config-get"])
+        lines = self.run_plugin()
+        self.assertRegex(lines[1], r"^snapshot\t\d+\t1\tdhcp6$")
+        self.assertIn("global\t1000\t900", lines)
+        self.assertNotIn("global\t1", lines)
+        self.assertEqual(lines[-2:], ["[dhcp6]", "global\t2"])
+
+    def test_no_snapshot_without_kea(self):
+        self.assertEqual(self.run_plugin(), [])
+
+    def test_refresh_skipped_while_locked(self):
+        kea = self.fake_kea()
+        with open(self.plugin.CACHE_FILE + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.plugin.refresh(self.config)
+        self.assertEqual(kea.commands, [])
+        self.assertIsNone(self.plugin.read_cache())
+
+    def test_hanging_socket_times_out(self):
+        kea = self.fake_kea(hang=True)
+        self.plugin.write_cache(time.time() - 300, time.time() - 300, [], ["[dhcp4]", "global\t1"])
+        start = time.monotonic()
+        self.plugin.refresh(self.config)
+        self.assertLess(time.monotonic() - start, 2.0)
+        self.assertEqual(kea.commands, ["statistic-get-all"])
+        collected, attempted, stale, lines = self.plugin.read_cache()
+        self.assertGreater(attempted, collected)
+        self.assertEqual(stale, ["dhcp4"])
+        self.assertEqual(lines, ["[dhcp4]", "global\t1"])
+        kea.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
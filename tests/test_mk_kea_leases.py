@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""mk_kea_leases.py against temporary memfile lease files
+
+    python3 -m pytest tests
+
+Each run_plugin() is one agent run: the state is loaded from and saved to a
+temporary $MK_VARDIR, like on a Kea server.
+"""
+
+import contextlib
+import importlib.util
+import io
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLUGIN = os.path.join(REPO, "kea_checks", "agents", "plugins", "mk_kea_leases.py")
+
+HEADER = "address,hwaddr,client_id,valid_lifetime,expire,subnet_id,fqdn_fwd,fqdn_rev,hostname,state,user_context,pool_id\n"
+
+
+def load_plugin():
+    spec = importlib.util.spec_from_file_location("mk_kea_leases", PLUGIN)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def lease(address, subnet_id, valid_lifetime=3600, state=0):
+    expire = int(time.time()) + 3600
+    return "%s,00:00:00:00:00:01,,%d,%d,%d,0,0,,%d,,0\n" % (address, valid_lifetime, expire, subnet_id, state)
+
+
+class MkKeaLeasesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.plugin = load_plugin()
+        self.plugin.STATE_DIR = self.tmp.name
+        self.leases = os.path.join(self.tmp.name, "kea-leases4.csv")
+        self.state = os.path.join(self.tmp.name, "kea_leases4.state")
+        with open(os.path.join(self.tmp.name, "kea.cfg"), "w") as config:
+            config.write("[kea_leases]\n")
+            config.write("leases4 = %s\n" % self.leases)
+            config.write("leases6 = %s\n" % os.path.join(self.tmp.name, "no-such-file"))
+            config.write("config4 = %s\n" % os.path.join(self.tmp.name, "no-such-file"))
+        environ = mock.patch.dict(os.environ, {"MK_CONFDIR": self.tmp.name})
+        environ.start()
+        self.addCleanup(environ.stop)
+
+    def write(self, path, text, mode="w"):
+        with open(path, mode) as lease_file:
+            lease_file.write(text)
+
+    def rotate(self, text):
+        """Replace the lease file by a new one (new inode), as the LFC does"""
+        self.write(self.leases + ".new", text)
+        os.replace(self.leases + ".new", self.leases)
+
+    def run_plugin(self):
+        """{subnet id: [active, expired, declined]} of one agent run"""
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.plugin.main()
+        return {
+            int(fields[1]): [int(c) for c in fields[4:]]
+            for fields in (line.split("\t") for line in output.getvalue().splitlines())
+            if fields[0] == "subnet"
+        }
+
+    def test_resume_at_offset_and_partial_line(self):
+        self.write(self.leases, HEADER + lease("10.0.0.1", 1) + lease("10.0.0.2", 1) + "10.0.0.3,00:00")
+        self.assertEqual(self.run_plugin(), {1: [2, 0, 0]})
+        # The unfinished last line is not read yet
+        complete = len(HEADER + lease("10.0.0.1", 1) + lease("10.0.0.2", 1))
+        self.assertEqual(self.plugin.LeaseState.load(self.state).offset, complete)
+
+        # Kea finishes the line and appends another one, the next run
+        # reads from the offset on with the columns of the header
+        self.write(self.leases, lease("10.0.0.3", 1)[len("10.0.0.3,00:00"):] + lease("10.0.0.4", 2), mode="a")
+        self.assertEqual(self.run_plugin(), {1: [3, 0, 0], 2: [1, 0, 0]})
+        self.assertEqual(self.plugin.LeaseState.load(self.state).offset, os.path.getsize(self.leases))
+
+        # Nothing appended: the state file is not rewritten
+        mtime = os.stat(self.state).st_mtime_ns
+        self.assertEqual(self.run_plugin(), {1: [3, 0, 0], 2: [1, 0, 0]})
+        self.assertEqual(os.stat(self.state).st_mtime_ns, mtime)
+
+    def test_valid_lifetime_0_deletes(self):
+        self.write(self.leases, HEADER + lease("10.0.0.1", 1) + lease("10.0.0.2", 1))
+        self.assertEqual(self.run_plugin(), {1: [2, 0, 0]})
+        self.write(self.leases, lease("10.0.0.1", 1, valid_lifetime=0), mode="a")
+        self.assertEqual(self.run_plugin(), {1: [1, 0, 0]})
+        self.write(self.leases, lease("10.0.0.2", 1, valid_lifetime=0), mode="a")
+        self.assertEqual(self.run_plugin(), {})
+
+    def test_rotation_reads_2_then_1_then_the_new_file(self):
+        self.write(self.leases, HEADER + lease("10.0.0.1", 1))
+        self.run_plugin()
+        self.write(self.leases + ".2", HEADER + lease("10.0.0.1", 1) + lease("10.0.0.2", 1))
+        self.write(self.leases + ".1", HEADER + lease("10.0.0.1", 2) + lease("10.0.0.2", 2, valid_lifetime=0))
+        self.rotate(HEADER + lease("10.0.0.3", 3))
+        # .1 is newer than .2: 10.0.0.1 moved to subnet 2, 10.0.0.2 was released
+        self.assertEqual(self.run_plugin(), {2: [1, 0, 0], 3: [1, 0, 0]})
+
+    def test_rotation_prefers_completed(self):
+        self.write(self.leases, HEADER + lease("10.0.0.1", 1))
+        self.run_plugin()
+        self.write(self.leases + ".2", HEADER + lease("10.0.0.2", 2))
+        self.write(self.leases + ".1", HEADER + lease("10.0.0.3", 3))
+        self.write(self.leases + ".completed", HEADER + lease("10.0.0.4", 4))
+        self.rotate(HEADER + lease("10.0.0.4", 5))
+        # The new file is read after .completed, so its row wins
+        self.assertEqual(self.run_plugin(), {5: [1, 0, 0]})
+
+    def test_new_inode_rebuilds_state(self):
+        self.write(self.leases, HEADER + lease("10.0.0.1", 1) + lease("10.0.0.2", 1))
+        self.assertEqual(self.run_plugin(), {1: [2, 0, 0]})
+        inode = self.plugin.LeaseState.load(self.state).inode
+
+        # Leases of the old file are dropped, even if the new one is larger
+        self.rotate(HEADER + lease("10.0.0.3", 2) + lease("10.0.0.4", 2) + lease("10.0.0.5", 2))
+        self.assertEqual(self.run_plugin(), {2: [3, 0, 0]})
+        state = self.plugin.LeaseState.load(self.state)
+        self.assertNotEqual(state.inode, inode)
+        self.assertEqual(state.offset, os.path.getsize(self.leases))
+
+        # Same inode, but shorter than the offset: truncated, rebuilt too
+        self.write(self.leases, HEADER + lease("10.0.0.6", 3))
+        self.assertEqual(self.run_plugin(), {3: [1, 0, 0]})
+
+
+if __name__ == "__main__":
+    unittest.main()
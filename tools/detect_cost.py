@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""Count the SNMP GETs the detect specs of this repo issue during a scan.
+
+Checkmk prefetches sysDescr and sysObjectID for every SNMP host. Every other
+OID referenced by a detect spec costs one GET per host (results are cached
+for the rest of the scan). This tool evaluates the detect specs of all
+sections in a tree the same way Checkmk does and counts those extra GETs
+for a few host profiles, or for a stored snmpwalk.
+
+Run it on a Checkmk site (or with the offline harness on PYTHONPATH):
+
+    python3 tools/detect_cost.py
+    python3 tools/detect_cost.py --baseline 153556e
+    python3 tools/detect_cost.py --walk ~/var/check_mk/snmpwalks/eltek-palm
+"""
+
+import argparse
+import glob
+import importlib
+import os
+import re
+import subprocess
+import sys
+import tarfile
+import tempfile
+import types
+from io import BytesIO
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SYS_DESCR = ".1.3.6.1.2.1.1.1.0"
+SYS_OBJECT_ID = ".1.3.6.1.2.1.1.2.0"
+PREFETCHED = {SYS_DESCR, SYS_OBJECT_ID}
+
+# Typical answers of the devices in our fleet, plus a host that is none of
+# them (the vast majority of hosts seen during a site-wide rediscovery).
+PROFILES = {
+    "other vendor": {
+        SYS_DESCR: "Linux switch 5.10",
+        SYS_OBJECT_ID: ".1.3.6.1.4.1.8072.3.2.10",
+    },
+    "eltek (sysDescr names model)": {
+        SYS_DESCR: "Eltek SmartPack S controller",
+        SYS_OBJECT_ID: ".1.3.6.1.4.1.12148.10",
+        ".1.3.6.1.4.1.12148.10.13.8.2.1.2.1": "SmartPack S",
+        ".1.3.6.1.4.1.12148.10.13.24.1.2.1": "1:BattSOC",
+        ".1.3.6.1.4.1.12148.10.11.2.1.3.1.7": "Cabinet Temp",
+        ".1.3.6.1.4.1.12148.10.11.2.1.3.1.8": "Commercial Power",
+        ".1.3.6.1.4.1.12148.10.11.2.1.3.1.10": "Generator",
+    },
+    "eltek (generic sysDescr)": {
+        SYS_DESCR: "Eltek",
+        SYS_OBJECT_ID: ".1.3.6.1.4.1.12148.10",
+        ".1.3.6.1.4.1.12148.10.13.8.2.1.2.1": "SmartPack S",
+    },
+    "edfa mux": {
+        SYS_DESCR: "EDFA MUX",
+        SYS_OBJECT_ID: ".1.3.6.1.4.1.55872.1",
+    },
+}
+
+
+def _mount_tree(root):
+    """Make ``cmk_addons.plugins`` resolve to the plugin families under root"""
+    for name in list(sys.modules):
+        if name == "cmk_addons" or name.startswith("cmk_addons."):
+            del sys.modules[name]
+    package = types.ModuleType("cmk_addons")
+    package.__path__ = []
+    plugins = types.ModuleType("cmk_addons.plugins")
+    plugins.__path__ = [root]
+    package.plugins = plugins
+    sys.modules["cmk_addons"] = package
+    sys.modules["cmk_addons.plugins"] = plugins
+
+
+def load_detect_specs(root):
+    """Return {section name: detect spec} for all SNMP sections under root"""
+    _mount_tree(root)
+    specs = {}
+    for path in sorted(glob.glob(os.path.join(root, "*_checks", "agent_based", "*.py"))):
+        family = os.path.basename(os.path.dirname(os.path.dirname(path)))
+        module_name = os.path.splitext(os.path.basename(path))[0]
+        module = importlib.import_module(f"cmk_addons.plugins.{family}.agent_based.{module_name}")
+        for name, value in vars(module).items():
+            if name.startswith("snmp_section_"):
+                specs[value.name] = value.detect
+    return specs
+
+
+def count_gets(specs, oid_values):
+    """Evaluate all detect specs for one host, return (GETs, detected sections)
+
+    A detect spec is a disjunction of conjunctions of (oid, regex, flag)
+    atoms. Checkmk evaluates them lazily in order and caches every fetched
+    OID for the rest of the scan.
+    """
+    fetched = set()
+    detected = []
+    for section_name, spec in specs.items():
+        for conjunction in spec:
+            for oid, pattern, flag in conjunction:
+                if oid not in PREFETCHED:
+                    fetched.add(oid)
+                value = oid_values.get(oid)
+                if value is None:
+                    matched = False
+                else:
+                    matched = re.fullmatch(pattern, value, re.IGNORECASE | re.DOTALL) is not None
+                if matched is not flag:
+                    break
+            else:
+                detected.append(section_name)
+                break
+    return len(fetched), detected
+
+
+def read_walk(path):
+    """Read a Checkmk stored snmpwalk into {oid: value}"""
+    values = {}
+    with open(path, encoding="utf-8", errors="replace") as walk:
+        for line in walk:
+            oid, _, value = line.rstrip("\n").partition(" ")
+            if len(value) >= 2 and value[0] == value[-1] == '"':
+                value = value[1:-1]
+            values[oid] = value
+    return values
+
+
+def _export_revision(revision, target):
+    archive = subprocess.run(
+        ["git", "-C", REPO, "archive", revision],
+        check=True,
+        capture_output=True,
+    ).stdout
+    with tarfile.open(fileobj=BytesIO(archive)) as tar:
+        tar.extractall(target)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--baseline", metavar="REV", help="compare against this git revision")
+    parser.add_argument("--walk", action="append", default=[], help="stored snmpwalk to use as host")
+    args = parser.parse_args(argv)
+
+    hosts = {os.path.basename(path): read_walk(path) for path in args.walk} or PROFILES
+
+    trees = {"current": REPO}
+    tmpdir = None
+    if args.baseline:
+        tmpdir = tempfile.TemporaryDirectory()
+        _export_revision(args.baseline, tmpdir.name)
+        trees = {args.baseline: tmpdir.name, "current": REPO}
+
+    results = {}
+    for label, root in trees.items():
+        specs = load_detect_specs(root)
+        results[label] = {host: count_gets(specs, values) for host, values in hosts.items()}
+
+    labels = list(trees)
+    print(f"{'host':32} " + " ".join(f"{label:>10}" for label in labels) + ("      saved" if args.baseline else ""))
+    for host in hosts:
+        counts = [results[label][host][0] for label in labels]
+        line = f"{host:32} " + " ".join(f"{count:>10}" for count in counts)
+        if args.baseline:
+            line += f" {counts[0] - counts[-1]:>10}"
+        print(line)
+    for host in hosts:
+        print(f"\n{host}: detected {', '.join(results['current'][host][1]) or '-'}")
+
+    if tmpdir is not None:
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
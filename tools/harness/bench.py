@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""Offline smoke test and micro-benchmark of all plugins in this repo
+
+Loads every *_checks/agent_based/*.py module against the cmk stand-in in
+tools/harness/cmk and runs parse -> discover -> check on the recorded
+string tables in tools/harness/fixtures, for many synthetic hosts (the
+numeric values of each fixture are jittered per host).
+
+    python3 tools/harness/bench.py --show          # results of one host
+    python3 tools/harness/bench.py --hosts 5000    # benchmark
+    python3 tools/harness/bench.py --degrade 500   # damaged string tables
+
+Reported per section parse function and per check plugin:
+
+    ns/op       wall time per host (check plugins: discovery + all checks)
+    alloc B/op  memory allocated while one host is processed (tracemalloc peak)
+    kept B/op   memory still referenced afterwards (e.g. the parsed section)
+
+plus the peak traced memory of holding the parsed sections of all hosts,
+as a checker helper does. Exits with 1 if any function raises.
+
+--degrade feeds damaged copies of the fixtures (emptied tables, missing
+rows, cut off rows, blank and garbage values, as seen during firmware
+updates and on partial SNMP responses) to all plugins, one section at a
+time; none of them may raise.
+"""
+
+import argparse
+import copy
+import random
+import re
+import sys
+import time
+import traceback
+import tracemalloc
+
+import plugins
+
+NUMBER = re.compile(r"^-?\d+$")
+
+
+def synthetic_hosts(fixture, count, seed=0):
+    """count copies of a raw string table with numeric values jittered by +-10%"""
+    rng = random.Random(seed)
+
+    def jitter(value):
+        if isinstance(value, list):
+            return [jitter(v) for v in value]
+        if isinstance(value, str) and NUMBER.match(value) and abs(int(value)) < 1 << 24:
+            return str(int(int(value) * rng.uniform(0.9, 1.1)))
+        return value
+
+    return [jitter(copy.deepcopy(fixture)) for _ in range(count)]
+
+
+DAMAGE = ("empty", "drop rows", "cut rows", "blank values", "garbage values")
+# Checkmk always returns full rows and fills in OIDEnd for SNMP sections
+SNMP_DAMAGE = ("empty", "drop rows", "blank values", "garbage values")
+GARBAGE = ("", " ", "-", "n/a", "nan", "inf", "1e999", "99999999999999999999", "-2147483648", "0x1F")
+
+
+def damaged_hosts(fixture, fetch, count, seed=0):
+    """count damaged copies of a raw string table, [(damage, string table)]
+
+    fetch is the list of SNMPTrees of an SNMP section, else None.
+    """
+    rng = random.Random(seed)
+    nested = isinstance(fetch, list)
+    if nested:
+        keep = [{pos for pos, oid in enumerate(tree.oids) if isinstance(oid, plugins.v2.OIDEnd)} for tree in fetch]
+
+    def damage_table(table, kind, keep=()):
+        if kind == "empty":
+            return []
+        if kind == "drop rows":
+            return [row for row in table if rng.random() < 0.5]
+        if kind == "cut rows":
+            return [row[:rng.randrange(len(row) + 1)] for row in table]
+        bad = [""] if kind == "blank values" else GARBAGE
+        return [
+            [rng.choice(bad) if pos not in keep and rng.random() < 0.3 else cell for pos, cell in enumerate(row)]
+            for row in table
+        ]
+
+    hosts = []
+    for _ in range(count):
+        kind = rng.choice(SNMP_DAMAGE if nested else DAMAGE)
+        table = copy.deepcopy(fixture)
+        if nested:
+            table = [damage_table(t, kind, k) if rng.random() < 0.5 else t for t, k in zip(table, keep)]
+        else:
+            table = damage_table(table, kind)
+        hosts.append((kind, table))
+    return hosts
+
+
+def degrade(registry, fixtures, count):
+    """Run all plugins on damaged copies of each fixture, print exceptions"""
+    failed = 0
+    for name, fixture in fixtures.items():
+        fetch = getattr(registry.sections[name], "fetch", None)
+        unknown = 0
+        for kind, table in damaged_hosts(fixture, fetch, count):
+            raw = dict(fixtures, **{name: table})
+            try:
+                results = plugins.run_host(registry, raw)
+                inventory = plugins.run_inventory(registry, raw)
+                plugins.host_labels(registry, raw)
+            except Exception as exc:  # pylint: disable=broad-except
+                failed += 1
+                print(f"{name} ({kind}): parse EXCEPTION", file=sys.stderr)
+                traceback.print_exception(exc)
+                continue
+            for result in results:
+                if result.exception is not None:
+                    failed += 1
+                    print(f"{name} ({kind}): {result.plugin} {result.item}: EXCEPTION", file=sys.stderr)
+                    traceback.print_exception(result.exception)
+                elif plugins.service_state(result.results) is plugins.v2.State.UNKNOWN:
+                    unknown += 1
+            for plugin, _rows, exception in inventory:
+                if exception is not None:
+                    failed += 1
+                    print(f"{name} ({kind}): inventory {plugin}: EXCEPTION", file=sys.stderr)
+                    traceback.print_exception(exception)
+        print(f"{name:28} {count} damaged hosts, {unknown} UNKNOWN services")
+    print(f"\n{failed} exceptions")
+    return failed > 0
+
+
+def measure(func, inputs):
+    """Return (ns per call, results) over all inputs"""
+    results = []
+    start = time.perf_counter_ns()
+    for args in inputs:
+        results.append(func(*args))
+    return (time.perf_counter_ns() - start) / max(len(inputs), 1), results
+
+
+def measure_memory(func, inputs):
+    """Return (allocated bytes per call, retained bytes per call)"""
+    allocated = retained = 0
+    kept = []
+    tracemalloc.start()
+    for args in inputs:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        kept.append(func(*args))
+        current, peak = tracemalloc.get_traced_memory()
+        allocated += peak - before
+        retained += current - before
+    tracemalloc.stop()
+    return allocated / max(len(inputs), 1), retained / max(len(inputs), 1)
+
+
+def run_plugin(plugin, kwargs, value_stores):
+    results = []
+    for service in plugins.discover(plugin, kwargs):
+        store = value_stores.setdefault(service.item, {})
+        results.append(plugins.check(plugin, service, kwargs, store))
+    return results
+
+
+def show(registry, fixtures, verbose=True):
+    """Run all plugins for one host, print exceptions (and results if verbose)
+
+    Covers check plugins, inventory plugins and host label functions.
+    """
+    failed = False
+    for result in plugins.run_host(registry, fixtures):
+        title = registry.check_plugins[result.plugin].service_name
+        title = title % result.item if result.item is not None else title
+        if result.exception is not None:
+            failed = True
+            print(f"{title}: EXCEPTION", file=sys.stderr)
+            traceback.print_exception(result.exception)
+            continue
+        if not verbose:
+            continue
+        state = plugins.service_state(result.results)
+        texts = [r.summary for r in result.results if isinstance(r, plugins.v2.Result) and r.summary]
+        metrics = sum(isinstance(r, plugins.v2.Metric) for r in result.results)
+        print(f"{state.name:7} {title}: {', '.join(texts)} [{metrics} metrics]")
+
+    for name, rows, exception in plugins.run_inventory(registry, fixtures):
+        if exception is not None:
+            failed = True
+            print(f"Inventory {name}: EXCEPTION", file=sys.stderr)
+            traceback.print_exception(exception)
+            continue
+        if not verbose:
+            continue
+        for row in rows:
+            path = ".".join(row.path)
+            if isinstance(row, plugins.v2.TableRow):
+                keys = ", ".join(f"{k}={v}" for k, v in row.key_columns.items())
+                print(f"INV     {path}[{keys}]: {row.inventory_columns}")
+            else:
+                print(f"INV     {path}: {row.inventory_attributes}")
+    if verbose:
+        for label in plugins.host_labels(registry, fixtures):
+            print(f"LABEL   {label.name}:{label.value}")
+    return failed
+
+
+def bench(registry, fixtures, hosts, memory_sample):
+    rows = []
+    parsed_all = {}
+    for name, fixture in fixtures.items():
+        section = registry.sections[name]
+        tables = synthetic_hosts(fixture, hosts)
+        ns, parsed = measure(section.parse_function, [(t,) for t in tables])
+        alloc, kept = measure_memory(section.parse_function, [(t,) for t in tables[:memory_sample]])
+        rows.append((f"parse {name}", ns, alloc, kept))
+        parsed_all[plugins.parsed_section_name(section)] = parsed
+
+    for name, plugin in registry.check_plugins.items():
+        names = plugins.subscribed_sections(plugin)
+        if not any(n in parsed_all for n in names):
+            continue
+        host_kwargs = []
+        for host in range(hosts):
+            kwargs = plugins.section_kwargs(plugin, {n: parsed_all[n][host] for n in names if n in parsed_all})
+            if kwargs is not None:
+                host_kwargs.append((plugin, kwargs, {}))
+        ns, _ = measure(run_plugin, host_kwargs)
+        alloc, kept = measure_memory(run_plugin, host_kwargs[:memory_sample])
+        rows.append((f"check {name}", ns, alloc, kept))
+
+    tracemalloc.start()
+    everything = {name: synthetic_hosts(fixture, hosts) for name, fixture in fixtures.items()}
+    sections = [
+        plugins.parse_sections(registry, {name: tables[host] for name, tables in everything.items()})
+        for host in range(hosts)
+    ]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del sections
+
+    print(f"{hosts} synthetic hosts\n")
+    print(f"{'function':40} {'ns/op':>12} {'alloc B/op':>12} {'kept B/op':>12}")
+    for label, ns, alloc, kept in sorted(rows, key=lambda r: r[1], reverse=True):
+        print(f"{label:40} {ns:12.0f} {alloc:12.0f} {kept:12.0f}")
+    total = sum(r[1] for r in rows)
+    print(f"{'total per host':40} {total:12.0f}")
+    print(f"\npeak traced memory, raw + parsed sections of all hosts: {peak / 2**20:.1f} MiB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--hosts", type=int, default=2000, help="number of synthetic hosts")
+    parser.add_argument("--memory-sample", type=int, default=200, help="hosts traced for memory")
+    parser.add_argument("--section", action="append", help="only use these fixtures")
+    parser.add_argument("--show", action="store_true", help="print the check results of one host")
+    parser.add_argument("--degrade", type=int, metavar="N", help="run N damaged copies of each fixture")
+    args = parser.parse_args(argv)
+
+    registry = plugins.load_registry()
+    fixtures = plugins.load_fixtures()
+    if args.section:
+        fixtures = {name: fixtures[name] for name in args.section}
+
+    if show(registry, fixtures, verbose=args.show):
+        return 1
+    if args.degrade:
+        return 1 if degrade(registry, fixtures, args.degrade) else 0
+    if not args.show:
+        bench(registry, fixtures, args.hosts, args.memory_sample)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+"""Offline stand-in for the parts of Checkmk used by the plugins in this repo
+
+Only put this directory on sys.path when the real Checkmk is not
+importable (see tools/harness/plugins.py).
+"""
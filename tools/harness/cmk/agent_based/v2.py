@@ -0,0 +1,334 @@
+"""Offline stand-in for cmk.agent_based.v2
+
+Mirrors the behaviour of the real API objects closely enough to run the
+parse, discovery and check functions of this repo outside a Checkmk site:
+the same constructor signatures and validation for Service, Result and
+Metric, the same levels tuples for check_levels, the same DNF layout for
+SNMP detect specifications, and a per-service value store that the harness
+switches before every call.
+"""
+
+import enum
+import re
+import time as _time
+from typing import Any, Iterable, NamedTuple, Sequence
+
+StringTable = list[list[str]]
+StringByteTable = list[list[str | list[int]]]
+CheckResult = Iterable[Any]
+DiscoveryResult = Iterable[Any]
+InventoryResult = Iterable[Any]
+HostLabelGenerator = Iterable[Any]
+
+
+class State(enum.IntEnum):
+    OK = 0
+    WARN = 1
+    CRIT = 2
+    UNKNOWN = 3
+
+    @classmethod
+    def best(cls, *states):
+        return min(states, key=lambda s: (0, 1, 3, 2)[int(s)])
+
+    @classmethod
+    def worst(cls, *states):
+        return max(states, key=lambda s: (0, 1, 3, 2)[int(s)])
+
+
+class Service(NamedTuple("_Service", [("item", Any), ("parameters", Any), ("labels", Any)])):
+    def __new__(cls, *, item=None, parameters=None, labels=None):
+        if item is not None and (not isinstance(item, str) or not item):
+            raise TypeError(f"item must be a non-empty string: {item!r}")
+        return super().__new__(cls, item, parameters or {}, labels or [])
+
+
+class Result(NamedTuple("_Result", [("state", State), ("summary", str), ("details", str)])):
+    def __new__(cls, *, state, summary=None, notice=None, details=None):
+        if not isinstance(state, State):
+            raise TypeError(f"state must be a State: {state!r}")
+        if (summary is None) == (notice is None):
+            raise TypeError("exactly one of summary and notice must be given")
+        text = summary if summary is not None else notice
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError("summary/notice must be a non-empty string")
+        if summary is not None and "\n" in summary:
+            raise ValueError(f"summary must not contain newlines: {summary!r}")
+        return super().__new__(cls, state, summary or "", details or text)
+
+
+class Metric(NamedTuple("_Metric", [("name", str), ("value", float), ("levels", Any), ("boundaries", Any)])):
+    def __new__(cls, name, value, *, levels=None, boundaries=None):
+        if not re.fullmatch(r"[a-zA-Z0-9_]+", name):
+            raise TypeError(f"invalid metric name: {name!r}")
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise TypeError(f"metric value must be int or float: {name}={value!r}")
+        return super().__new__(cls, name, value, levels, boundaries)
+
+
+class HostLabel(NamedTuple):
+    name: str
+    value: str
+
+
+class Attributes(NamedTuple):
+    path: list
+    inventory_attributes: dict = {}
+    status_attributes: dict = {}
+
+
+class TableRow(NamedTuple):
+    path: list
+    key_columns: dict
+    inventory_columns: dict = {}
+    status_columns: dict = {}
+
+
+class IgnoreResults:
+    def __init__(self, value=""):
+        self.value = value
+
+
+class IgnoreResultsError(RuntimeError):
+    pass
+
+
+class GetRateError(ValueError):
+    pass
+
+
+# The harness replaces this mapping before each plugin call
+_value_store: dict = {}
+
+
+def get_value_store():
+    return _value_store
+
+
+def get_rate(value_store, key, time, value, *, raise_overflow=False):
+    last_state = value_store.get(key)
+    value_store[key] = (time, value)
+    if not last_state or len(last_state) != 2:
+        raise GetRateError(f"Initialized: {key!r}")
+    last_time, last_value = last_state
+    if time <= last_time:
+        raise GetRateError(f"No time difference: {key!r}")
+    rate = (value - last_value) / (time - last_time)
+    if raise_overflow and rate < 0:
+        raise GetRateError(f"Value overflow: {key!r}")
+    return rate
+
+
+def get_average(value_store, key, time, value, backlog_minutes):
+    last = value_store.get(key)
+    value_store[key] = (time, value) if last is None else (time, last[1] + (value - last[1]) / max(backlog_minutes, 1))
+    return value_store[key][1]
+
+
+class OIDEnd:
+    def __repr__(self):
+        return "OIDEnd()"
+
+
+class OIDBytes(str):
+    pass
+
+
+class OIDCached(str):
+    pass
+
+
+class SNMPTree(NamedTuple):
+    base: str
+    oids: Sequence[Any]
+
+
+class SNMPDetectSpecification(list):
+    """Disjunction of conjunctions of (oid, regex, expected match) atoms"""
+
+
+def _atom(oid, regex, flag):
+    return SNMPDetectSpecification([[(oid, regex, flag)]])
+
+
+def startswith(oid, value):
+    return _atom(oid, f"{re.escape(value)}.*", True)
+
+
+def endswith(oid, value):
+    return _atom(oid, f".*{re.escape(value)}", True)
+
+
+def contains(oid, value):
+    return _atom(oid, f".*{re.escape(value)}.*", True)
+
+
+def equals(oid, value):
+    return _atom(oid, re.escape(value), True)
+
+
+def matches(oid, regex):
+    return _atom(oid, regex, True)
+
+
+def exists(oid):
+    return _atom(oid, ".*", True)
+
+
+def not_startswith(oid, value):
+    return _atom(oid, f"{re.escape(value)}.*", False)
+
+
+def not_endswith(oid, value):
+    return _atom(oid, f".*{re.escape(value)}", False)
+
+
+def not_contains(oid, value):
+    return _atom(oid, f".*{re.escape(value)}.*", False)
+
+
+def not_equals(oid, value):
+    return _atom(oid, re.escape(value), False)
+
+
+def not_matches(oid, regex):
+    return _atom(oid, regex, False)
+
+
+def not_exists(oid):
+    return _atom(oid, ".*", False)
+
+
+def all_of(*specs):
+    result = [[]]
+    for spec in specs:
+        result = [left + right for left in result for right in spec]
+    return SNMPDetectSpecification(result)
+
+
+def any_of(*specs):
+    return SNMPDetectSpecification([conjunction for spec in specs for conjunction in spec])
+
+
+class _Registration:
+    _required: tuple = ()
+
+    def __init__(self, **kwargs):
+        missing = [k for k in self._required if k not in kwargs]
+        if missing:
+            raise TypeError(f"{type(self).__name__} missing {missing}")
+        self.__dict__.update(kwargs)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r})"
+
+
+class AgentSection(_Registration):
+    _required = ("name", "parse_function")
+
+
+class SimpleSNMPSection(_Registration):
+    _required = ("name", "parse_function", "detect", "fetch")
+
+
+class SNMPSection(_Registration):
+    _required = ("name", "parse_function", "detect", "fetch")
+
+
+class CheckPlugin(_Registration):
+    _required = ("name", "service_name", "discovery_function", "check_function")
+
+
+class InventoryPlugin(_Registration):
+    _required = ("name", "inventory_function")
+
+
+def _default_render(value):
+    return f"{value:.2f}"
+
+
+def _levels_text(render_func, levels, word):
+    warn, crit = levels
+    return f" (warn/crit {word} {render_func(warn)}/{render_func(crit)})"
+
+
+def check_levels(
+    value,
+    *,
+    levels_upper=None,
+    levels_lower=None,
+    metric_name=None,
+    render_func=None,
+    label=None,
+    boundaries=None,
+    notice_only=False,
+):
+    render_func = render_func or _default_render
+    text = f"{label}: {render_func(value)}" if label else render_func(value)
+    state = State.OK
+    upper = levels_upper[1] if levels_upper and levels_upper[0] == "fixed" else None
+    lower = levels_lower[1] if levels_lower and levels_lower[0] == "fixed" else None
+    if upper is not None and value >= upper[0]:
+        state = State.CRIT if value >= upper[1] else State.WARN
+        text += _levels_text(render_func, upper, "at")
+    elif lower is not None and value < lower[0]:
+        state = State.CRIT if value < lower[1] else State.WARN
+        text += _levels_text(render_func, lower, "below")
+
+    if notice_only:
+        yield Result(state=state, notice=text)
+    else:
+        yield Result(state=state, summary=text)
+    if metric_name:
+        yield Metric(metric_name, value, levels=upper, boundaries=boundaries)
+
+
+class render:
+    @staticmethod
+    def date(epoch):
+        return _time.strftime("%Y-%m-%d", _time.localtime(epoch))
+
+    @staticmethod
+    def datetime(epoch):
+        return _time.strftime("%Y-%m-%d %H:%M:%S", _time.localtime(epoch))
+
+    @staticmethod
+    def timespan(seconds):
+        seconds = abs(seconds)
+        if seconds < 60:
+            return f"{seconds:.0f} seconds"
+        minutes, seconds = divmod(int(seconds), 60)
+        if minutes < 60:
+            return f"{minutes} minutes {seconds} seconds"
+        hours, minutes = divmod(minutes, 60)
+        if hours < 24:
+            return f"{hours} hours {minutes} minutes"
+        days, hours = divmod(hours, 24)
+        return f"{days} days {hours} hours"
+
+    @staticmethod
+    def percent(value):
+        return f"{value:.2f}%"
+
+    @staticmethod
+    def bytes(value):
+        return f"{value:.0f} B"
+
+    filesize = bytes
+    disksize = bytes
+
+    @staticmethod
+    def frequency(value):
+        return f"{value:.2f} Hz"
+
+    @staticmethod
+    def iobandwidth(value):
+        return f"{value:.2f} B/s"
+
+    @staticmethod
+    def networkbandwidth(value):
+        return f"{value * 8:.2f} Bit/s"
+
+    @staticmethod
+    def nicspeed(value):
+        return f"{value * 8:.0f} Bit/s"
@@ -0,0 +1,196 @@
+"""Load the plugin families of this repo against the offline cmk stand-in
+
+    from plugins import load_registry, run_host
+
+    registry = load_registry()
+    results = run_host(registry, {"eltek_base_config": string_table})
+
+The stand-in in tools/harness/cmk is always used, also on a Checkmk site:
+it provides a value store per simulated host and service, which the real
+API only has inside a running check.
+"""
+
+import glob
+import importlib
+import json
+import os
+import sys
+import types
+from typing import Any, NamedTuple
+
+HARNESS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(os.path.dirname(HARNESS_DIR))
+FIXTURES_DIR = os.path.join(HARNESS_DIR, "fixtures")
+
+if HARNESS_DIR not in sys.path:
+    sys.path.insert(0, HARNESS_DIR)
+
+from cmk.agent_based import v2  # noqa: E402
+
+
+class Registry(NamedTuple):
+    modules: dict
+    sections: dict
+    check_plugins: dict
+    inventory_plugins: dict
+
+
+class ServiceResult(NamedTuple):
+    plugin: str
+    item: Any
+    results: list
+    exception: BaseException | None
+
+
+def mount_tree(root=REPO):
+    """Make ``cmk_addons.plugins`` resolve to the plugin families under root"""
+    for name in list(sys.modules):
+        if name == "cmk_addons" or name.startswith("cmk_addons."):
+            del sys.modules[name]
+    package = types.ModuleType("cmk_addons")
+    package.__path__ = []
+    plugins = types.ModuleType("cmk_addons.plugins")
+    plugins.__path__ = [root]
+    package.plugins = plugins
+    sys.modules["cmk_addons"] = package
+    sys.modules["cmk_addons.plugins"] = plugins
+
+
+def load_registry(root=REPO):
+    """Import every *_checks/agent_based/*.py module and collect its plugins"""
+    mount_tree(root)
+    registry = Registry({}, {}, {}, {})
+    for path in sorted(glob.glob(os.path.join(root, "*_checks", "agent_based", "*.py"))):
+        family = os.path.basename(os.path.dirname(os.path.dirname(path)))
+        module_name = os.path.splitext(os.path.basename(path))[0]
+        module = importlib.import_module(f"cmk_addons.plugins.{family}.agent_based.{module_name}")
+        registry.modules[f"{family}.{module_name}"] = module
+        for name, value in vars(module).items():
+            if name.startswith(("snmp_section_", "agent_section_")):
+                registry.sections[value.name] = value
+            elif name.startswith("check_plugin_"):
+                registry.check_plugins[value.name] = value
+            elif name.startswith("inventory_plugin_"):
+                registry.inventory_plugins[value.name] = value
+    return registry
+
+
+def load_fixtures(directory=FIXTURES_DIR):
+    """Return {section name: raw string table} of the recorded fixtures"""
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(path) as fixture:
+            data = json.load(fixture)
+        fixtures[data["section"]] = data["string_table"]
+    return fixtures
+
+
+def parsed_section_name(section):
+    return getattr(section, "parsed_section_name", None) or section.name
+
+
+def subscribed_sections(plugin):
+    return list(getattr(plugin, "sections", None) or [plugin.name])
+
+
+def parse_sections(registry, raw_sections):
+    """Run the parse functions, return {parsed section name: section}"""
+    parsed = {}
+    for name, string_table in raw_sections.items():
+        section = registry.sections[name]
+        result = section.parse_function(string_table)
+        if result is not None:
+            parsed[parsed_section_name(section)] = result
+    return parsed
+
+
+def section_kwargs(plugin, parsed):
+    """Keyword arguments for the discovery/check function of a plugin
+
+    None if none of the subscribed sections is present, like in Checkmk.
+    """
+    names = subscribed_sections(plugin)
+    if not any(parsed.get(name) is not None for name in names):
+        return None
+    if len(names) == 1:
+        return {"section": parsed[names[0]]}
+    return {f"section_{name}": parsed.get(name) for name in names}
+
+
+def discover(plugin, kwargs):
+    params = getattr(plugin, "discovery_default_parameters", None)
+    if params is not None:
+        kwargs = dict(kwargs, params=params)
+    return list(plugin.discovery_function(**kwargs))
+
+
+def check(plugin, service, kwargs, value_store):
+    v2._value_store = value_store
+    call = dict(kwargs)
+    if "%s" in plugin.service_name:
+        call["item"] = service.item
+    params = getattr(plugin, "check_default_parameters", None)
+    if params is not None:
+        call["params"] = {**params, **(service.parameters or {})}
+    return list(plugin.check_function(**call))
+
+
+def run_host(registry, raw_sections, value_stores=None, plugins=None):
+    """Run parse, discovery and check of all (or the given) plugins for a host
+
+    value_stores maps (plugin, item) to the value store of that service; it
+    is kept by the caller to simulate consecutive check cycles.
+    """
+    value_stores = {} if value_stores is None else value_stores
+    parsed = parse_sections(registry, raw_sections)
+    results = []
+    for name, plugin in registry.check_plugins.items():
+        if plugins is not None and name not in plugins:
+            continue
+        kwargs = section_kwargs(plugin, parsed)
+        if kwargs is None:
+            continue
+        try:
+            services = discover(plugin, kwargs)
+        except Exception as exc:  # pylint: disable=broad-except
+            results.append(ServiceResult(name, None, [], exc))
+            continue
+        for service in services:
+            store = value_stores.setdefault((name, service.item), {})
+            try:
+                results.append(ServiceResult(name, service.item, check(plugin, service, kwargs, store), None))
+            except Exception as exc:  # pylint: disable=broad-except
+                results.append(ServiceResult(name, service.item, [], exc))
+    return results
+
+
+def host_labels(registry, raw_sections):
+    """HostLabels of the sections that have a host label function"""
+    labels = []
+    for name, string_table in raw_sections.items():
+        section = registry.sections[name]
+        function = getattr(section, "host_label_function", None)
+        parsed = section.parse_function(string_table)
+        if function is not None and parsed is not None:
+            labels.extend(function(parsed))
+    return labels
+
+
+def run_inventory(registry, raw_sections):
+    """Run all inventory plugins for a host, return [(plugin, rows, exception)]"""
+    parsed = parse_sections(registry, raw_sections)
+    results = []
+    for name, plugin in registry.inventory_plugins.items():
+        kwargs = section_kwargs(plugin, parsed)
+        if kwargs is None:
+            continue
+        try:
+            results.append((name, list(plugin.inventory_function(**kwargs)), None))
+        except Exception as exc:  # pylint: disable=broad-except
+            results.append((name, [], exc))
+    return results
+
+
+def service_state(results):
+    states = [r.state for r in results if isinstance(r, v2.Result)]
+    return v2.State.worst(*states) if states else v2.State.UNKNOWN
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Run the eltek_poller special agent against local SNMP agents
+
+Starts --devices responders on loopback, each serving one of the stored
+walks in tools/harness/walks (round robin) with the given latency profile,
+runs eltek_checks/libexec/agent_eltek_poller against all of them and checks
+its output:
+
+  - every piggyback section must parse to the same result as the tables
+    fetched the way Checkmk does (snmp_bench.fetch_tree), and
+  - every device must be reported in the run summary.
+
+    python3 tools/harness/poller_bench.py --devices 200 --latency cellular
+    python3 tools/harness/poller_bench.py --devices 200 --latency cellular --max-concurrency 1
+
+--latency takes the same values as snmp_bench.py.
+"""
+
+import argparse
+import glob
+import io
+import os
+import sys
+from importlib.machinery import SourceFileLoader
+from importlib.util import module_from_spec, spec_from_loader
+
+import plugins
+import snmp_bench
+import snmpsim
+
+AGENT = os.path.join(plugins.REPO, "eltek_checks", "libexec", "agent_eltek_poller")
+
+
+def load_agent():
+    spec = spec_from_loader("agent_eltek_poller", SourceFileLoader("agent_eltek_poller", AGENT))
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def split_output(text):
+    """{piggyback host or None: {section name: [[value]]}} of agent output"""
+    hosts = {None: {}}
+    host, section = None, None
+    for line in text.splitlines():
+        if line.startswith("<<<<") and line.endswith(">>>>"):
+            host = line[4:-4] or None
+            hosts.setdefault(host, {})
+        elif line.startswith("<<<") and line.endswith(">>>"):
+            section = line[3:-3].split(":", 1)[0]
+            hosts[host].setdefault(section, [])
+        else:
+            hosts[host][section].append(line.split("\t"))
+    return hosts
+
+
+def reference(walk, sections):
+    """{parsed section name: parsed section} of a walk, fetched like Checkmk"""
+    responder = snmpsim.Responder(walk).start()
+    client = snmpsim.Client(responder.address)
+    try:
+        parsed = {}
+        for name in snmp_bench.detect(client, sections):
+            section = sections[name]
+            tables = [snmp_bench.fetch_tree(client, tree, 10) for tree in snmp_bench.trees_of(section)]
+            parsed[name] = section.parse_function(tables if isinstance(section.fetch, list) else tables[0])
+        return parsed
+    finally:
+        client.close()
+        responder.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--walk", action="append", help="stored snmpwalk to serve (default: tools/harness/walks)")
+    parser.add_argument("--latency", default="metro", help="latency profile or <ms>[,<jitter ms>[,<loss %%>]]")
+    parser.add_argument("--unreachable", type=int, default=0, help="devices that never answer")
+    args, agent_args = parser.parse_known_args(argv)
+
+    registry = plugins.load_registry()
+    agent = load_agent()
+    paths = args.walk or sorted(glob.glob(os.path.join(snmp_bench.WALKS_DIR, "*.walk")))
+    walks = {path: snmpsim.read_walk(path) for path in paths}
+    polled = {plugins.parsed_section_name(registry.sections[section.name]) for section in agent.POLLED_SECTIONS}
+    snmp_sections = {n: s for n, s in snmp_bench.snmp_sections(registry).items() if n in polled}
+    expected = {path: reference(walk, snmp_sections) for path, walk in walks.items()}
+    latency = snmp_bench.parse_latency(args.latency)
+
+    responders = []
+    devices = {}
+    for number in range(args.devices):
+        path = paths[number % len(paths)]
+        responder = snmpsim.Responder(walks[path], latency=latency, seed=number).start()
+        responders.append(responder)
+        devices[f"device-{number:04d}"] = (path, responder.address)
+    if args.unreachable:
+        # A bound socket nobody reads from: requests time out
+        silent = snmpsim.Responder({}, latency=snmpsim.Latency(0.0, 0.0, 1.0)).start()
+        responders.append(silent)
+        for number in range(args.unreachable):
+            devices[f"silent-{number:04d}"] = (None, silent.address)
+
+    out = io.StringIO()
+    try:
+        agent.main(
+            agent_args + [f"{name}={host}:{port}" for name, (_path, (host, port)) in devices.items()],
+            out=out,
+        )
+    finally:
+        for responder in responders:
+            responder.stop()
+
+    hosts = split_output(out.getvalue())
+    summary = registry.sections["eltek_poller"].parse_function(hosts[None].get("eltek_poller", []))
+    problems = []
+    for name, (path, _address) in devices.items():
+        parsed = {}
+        for raw_name, string_table in hosts.get(name, {}).items():
+            section = registry.sections[raw_name]
+            parsed[plugins.parsed_section_name(section)] = section.parse_function(string_table)
+        if path is not None and parsed != expected[path]:
+            problems.append(f"{name} ({os.path.basename(path)}): sections differ from the SNMP fetch")
+    reported = {device.name for device in summary.devices}
+    problems += [f"{name}: missing in summary" for name in devices if name not in reported]
+
+    by_status = {}
+    for device in summary.devices:
+        by_status[device.status] = by_status.get(device.status, 0) + 1
+    pdus = sum(device.pdus for device in summary.devices)
+    sequential = sum(device.seconds for device in summary.devices)
+    print(
+        f"latency {1000 * latency.mean:.1f} ms +-{1000 * latency.jitter:.1f} ms, "
+        f"loss {100 * latency.loss:.1f} %, max. {summary.concurrency} devices at once"
+    )
+    print(f"devices        {len(summary.devices)} ({', '.join(f'{n} {s}' for s, n in sorted(by_status.items()))})")
+    print(f"PDUs           {pdus} ({pdus / max(len(summary.devices), 1):.1f} per device)")
+    print(f"run time       {summary.wall:.2f} s (sum of poll times {sequential:.2f} s)")
+    if summary.latency:
+        print("poll time      " + "  ".join(f"{k} {1000 * v:.0f} ms" for k, v in summary.latency.items()))
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""Run all SNMP plugins of this repo against stored snmpwalks, fleet-wide
+
+For every Checkmk stored walk (one file per host, named like the host, as
+written by cmk --snmpwalk to ~/var/check_mk/snmpwalks) the detect specs of
+all SNMP sections are evaluated, the string tables of the detected
+sections are built from the walk like Checkmk's stored-walk backend does,
+and parse, discovery and check of all plugins are run against the offline
+cmk stand-in. The walks are spread over a process pool; only the OIDs the
+sections and detect specs can touch are kept while a walk is read.
+
+Prints one line per service (host, service, state, summary; tab
+separated), or writes them to --output, and compares them with the report
+of a previous run:
+
+    python3 tools/harness/replay.py ~/var/check_mk/snmpwalks -o before.tsv
+    # change a plugin
+    python3 tools/harness/replay.py ~/var/check_mk/snmpwalks -o after.tsv --diff before.tsv
+
+The number of metrics per host (default check parameters, so every
+metric) is printed as well, to size the RRD storage of the fleet. Without
+--output, this summary and the diff go to stderr, so stdout is the report.
+
+--root replays the plugins of another checkout (e.g. a git worktree of the
+last release) against the same walks. Exits with 1 if any function raised
+(state CRASH in the report).
+"""
+
+import argparse
+import bisect
+import concurrent.futures
+import os
+import re
+import sys
+import time
+from typing import NamedTuple
+
+import plugins
+
+SITE_WALKS_DIR = os.path.join(os.environ.get("OMD_ROOT", os.path.expanduser("~")), "var", "check_mk", "snmpwalks")
+
+# Octet strings that are not text are stored as "B0 30 40 66 " (trailing space)
+HEX_STRING = re.compile(r"(?:[0-9A-Fa-f]{2} )+")
+
+CRASH = "CRASH"
+# Report line of a host none of the sections was detected for
+NO_SECTION = ("-", "-", "no section detected")
+
+
+class Column(NamedTuple):
+    prefix: str | None  # full OID of the column, None for OIDEnd
+    is_bytes: bool
+
+
+class HostReport(NamedTuple):
+    host: str
+    seconds: float
+    sections: list
+    services: list  # [(service, state, summary)]
+    metrics: int
+
+
+# ------------------------
+# Stored walks
+# ------------------------
+
+
+def read_walk(path, roots=None):
+    """Stream a Checkmk stored snmpwalk into {oid: value as stored}
+
+    Only OIDs starting with one of roots (a tuple of prefixes) are kept.
+    Lines not starting with "." continue the string value of the previous
+    OID (values with newlines).
+    """
+    values = {}
+    last = None
+    with open(path, encoding="utf-8", errors="replace") as walk:
+        for line in walk:
+            if not line.startswith("."):
+                if last is not None:
+                    values[last] += "\n" + line.rstrip("\n")
+                continue
+            if roots is not None and not line.startswith(roots):
+                last = None
+                continue
+            last, _, value = line.rstrip("\n").partition(" ")
+            values[last] = value
+    return values
+
+
+def decode_value(stored, is_bytes=False):
+    """A stored value as the string table has it, like Checkmk's stored-walk backend
+
+    Quoted hex strings are binary; text is UTF-8, else Latin-1. OIDBytes
+    columns get the list of byte values.
+    """
+    stored = stored.strip()
+    if len(stored) >= 2 and stored[0] == stored[-1] == '"':
+        text = stored[1:-1]
+        if len(text) > 2 and HEX_STRING.fullmatch(text):
+            data = bytes.fromhex(text)
+        else:
+            data = text.strip().replace("\\\\", "\\").encode()
+    else:
+        data = stored.encode()
+    if is_bytes:
+        return list(data)
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode("latin-1")
+
+
+def walk_roots(sections):
+    """Shortest OID prefixes covering all columns and detect OIDs"""
+    prefixes = {oid for section in sections.values() for conjunction in section.detect for oid, _, _ in conjunction}
+    for columns in fetch_plan(sections).values():
+        prefixes.update(c.prefix for tree in columns for c in tree if c.prefix is not None)
+    roots = []
+    for prefix in sorted(prefixes):
+        if not roots or not prefix.startswith(roots[-1]):
+            roots.append(prefix)
+    return tuple(roots)
+
+
+# ------------------------
+# Detect and fetch, like Checkmk
+# ------------------------
+
+
+def detected_sections(sections, values):
+    """Names of the sections whose detect spec matches the walk
+
+    A missing OID only satisfies a not_exists() atom, as in Checkmk.
+    """
+    detected = []
+    for name, section in sections.items():
+        for conjunction in section.detect:
+            for oid, pattern, flag in conjunction:
+                value = values.get(oid)
+                if value is not None:
+                    value = decode_value(value)
+                if value is None:
+                    matched = pattern == ".*" and not flag
+                else:
+                    matched = (re.fullmatch(pattern, value, re.IGNORECASE | re.DOTALL) is not None) is flag
+                if not matched:
+                    break
+            else:
+                detected.append(name)
+                break
+    return detected
+
+
+def fetch_plan(sections):
+    """{section: [[Column, ...] per SNMPTree]}"""
+    plan = {}
+    for name, section in sections.items():
+        trees = section.fetch if isinstance(section.fetch, list) else [section.fetch]
+        plan[name] = [
+            [
+                Column(
+                    None if isinstance(oid, plugins.v2.OIDEnd) else f"{tree.base}.{oid}",
+                    isinstance(oid, plugins.v2.OIDBytes),
+                )
+                for oid in tree.oids
+            ]
+            for tree in trees
+        ]
+    return plan
+
+
+def _index_key(index):
+    return tuple(int(part) for part in index.split(".") if part.isdigit())
+
+
+def string_table(columns, oids, values):
+    """String table of one SNMPTree; oids are the sorted OIDs of the walk
+
+    A column is the OID itself (scalars) or the OIDs below it. Rows are
+    joined on the OID end, rows missing in a column get "" (as Checkmk
+    fills gaps of devices that skip entries).
+    """
+    walked = []
+    indexes = {}
+    for column in columns:
+        if column.prefix is None:
+            walked.append(None)
+            continue
+        found = {}
+        if column.prefix in values:
+            found[""] = values[column.prefix]
+        below = column.prefix + "."
+        start = bisect.bisect_left(oids, below)
+        stop = bisect.bisect_left(oids, column.prefix + "/", start)
+        for oid in oids[start:stop]:
+            found[oid[len(below):]] = values[oid]
+        walked.append(found)
+        indexes.update(dict.fromkeys(found))
+
+    rows = []
+    for index in sorted(indexes, key=_index_key):
+        row = []
+        for column, found in zip(columns, walked):
+            if found is None:
+                row.append(index)
+            else:
+                row.append(decode_value(found.get(index, '""'), column.is_bytes))
+        rows.append(row)
+    return rows
+
+
+# ------------------------
+# Worker
+# ------------------------
+
+_worker = {}
+
+
+def _init_worker(root):
+    registry = plugins.load_registry(root)
+    sections = {name: s for name, s in registry.sections.items() if getattr(s, "detect", None) is not None}
+    _worker.update(
+        registry=registry,
+        sections=sections,
+        plan=fetch_plan(sections),
+        roots=walk_roots(sections),
+    )
+
+
+def _service_name(plugin, item):
+    return plugin.service_name % item if item is not None else plugin.service_name
+
+
+def replay_walk(path):
+    """Detect, parse, discover and check one stored walk"""
+    registry, sections, plan = _worker["registry"], _worker["sections"], _worker["plan"]
+    host = os.path.basename(path)
+    start = time.perf_counter()
+    try:
+        values = read_walk(path, _worker["roots"])
+    except OSError as exc:
+        return HostReport(host, 0.0, [], [("-", CRASH, f"cannot read walk: {exc}")], 0)
+    oids = sorted(values)
+
+    detected = detected_sections(sections, values)
+    raw = {}
+    for name in detected:
+        tables = [string_table(columns, oids, values) for columns in plan[name]]
+        raw[name] = tables if isinstance(sections[name].fetch, list) else tables[0]
+
+    services = []
+    metrics = 0
+    try:
+        results = plugins.run_host(registry, raw)
+    except Exception as exc:  # pylint: disable=broad-except
+        # A parse function raised
+        results = []
+        services.append(("-", CRASH, f"parse: {exc!r}"))
+    for result in results:
+        plugin = registry.check_plugins[result.plugin]
+        if result.exception is not None:
+            services.append((_service_name(plugin, result.item), CRASH, repr(result.exception)))
+            continue
+        texts = [r.summary for r in result.results if isinstance(r, plugins.v2.Result) and r.summary]
+        state = plugins.service_state(result.results).name
+        metrics += sum(isinstance(r, plugins.v2.Metric) for r in result.results)
+        services.append((_service_name(plugin, result.item), state, ", ".join(texts)))
+    if not detected:
+        services.append(NO_SECTION)
+    return HostReport(host, time.perf_counter() - start, detected, sorted(services), metrics)
+
+
+# ------------------------
+# Report and diff
+# ------------------------
+
+
+def walk_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if os.path.isfile(os.path.join(path, name)) and not name.startswith(".")
+            )
+        else:
+            files.append(path)
+    return files
+
+
+def _clean(text):
+    return text.replace("\t", " ").replace("\n", " ")
+
+
+def write_report(output, reports):
+    for report in sorted(reports):
+        for service, state, summary in report.services:
+            output.write(f"{_clean(report.host)}\t{_clean(service)}\t{state}\t{_clean(summary)}\n")
+
+
+def report_services(reports):
+    """{(host, service): (state, summary)}, as read_report() returns it"""
+    return {
+        (_clean(report.host), _clean(service)): (state, _clean(summary))
+        for report in reports
+        for service, state, summary in report.services
+    }
+
+
+def read_report(path):
+    """{(host, service): (state, summary)}"""
+    services = {}
+    with open(path, encoding="utf-8") as report:
+        for line in report:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) == 4:
+                services[(fields[0], fields[1])] = (fields[2], fields[3])
+    return services
+
+
+def diff(before, after, limit, out=sys.stdout):
+    """Print the changes between two reports, return the number of state changes"""
+    hosts_before = {host for host, _service in before}
+    hosts_after = {host for host, _service in after}
+    changed_state, changed_summary, new, vanished = [], [], [], []
+    for key in sorted(before.keys() | after.keys()):
+        if key[0] not in hosts_before or key[0] not in hosts_after:
+            continue
+        if key not in before:
+            new.append(key)
+        elif key not in after:
+            vanished.append(key)
+        elif before[key][0] != after[key][0]:
+            changed_state.append(key)
+        elif before[key][1] != after[key][1]:
+            changed_summary.append(key)
+
+    out.write(
+        f"\ndiff: {len(changed_state)} state changes, {len(changed_summary)} summary changes, "
+        f"{len(new)} new and {len(vanished)} vanished services; "
+        f"{len(hosts_after - hosts_before)} new and {len(hosts_before - hosts_after)} missing hosts\n"
+    )
+    for title, keys in (("state changes", changed_state), ("new services", new), ("vanished services", vanished), ("summary changes", changed_summary)):
+        if not keys:
+            continue
+        out.write(f"\n{title}:\n")
+        for host, service in keys[:limit]:
+            old, now = before.get((host, service)), after.get((host, service))
+            states = f"{old[0] if old else '-'} -> {now[0] if now else '-'}"
+            out.write(f"  {host:28} {service:36} {states:18} {(now or old)[1]}\n")
+            if old and now and old[1] != now[1]:
+                out.write(f"  {'':28} {'':36} {'was':18} {old[1]}\n")
+        if len(keys) > limit:
+            out.write(f"  ... {len(keys) - limit} more\n")
+    return len(changed_state)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("walks", nargs="*", default=[SITE_WALKS_DIR], help="stored walks or directories of them")
+    parser.add_argument("-o", "--output", help="report file (default: stdout)")
+    parser.add_argument("--diff", metavar="REPORT", help="report of a previous run to compare with")
+    parser.add_argument("--root", default=plugins.REPO, help="checkout whose plugins are run")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--limit", type=int, default=50, help="changes listed per kind of change")
+    args = parser.parse_args(argv)
+
+    files = walk_files(args.walks)
+    if not files:
+        parser.exit(1, "no stored walks found\n")
+
+    start = time.perf_counter()
+    chunksize = max(1, min(64, len(files) // (4 * max(args.jobs, 1))))
+    with concurrent.futures.ProcessPoolExecutor(args.jobs, initializer=_init_worker, initargs=(args.root,)) as pool:
+        reports = list(pool.map(replay_walk, files, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            write_report(output, reports)
+        out = sys.stdout
+    else:
+        write_report(sys.stdout, reports)
+        out = sys.stderr
+
+    states = {}
+    for report in reports:
+        for _service, state, _summary in report.services:
+            states[state] = states.get(state, 0) + 1
+    busy = sum(report.seconds for report in reports)
+    print(
+        f"{len(files)} walks in {elapsed:.1f} s ({len(files) / elapsed:.0f}/s, {args.jobs} processes, "
+        f"{1000 * busy / len(files):.1f} ms per walk and process)",
+        file=out,
+    )
+    print("services: " + ", ".join(f"{states[s]} {s}" for s in sorted(states)), file=out)
+    largest = max(reports, key=lambda report: report.metrics)
+    print(
+        f"metrics: {sum(report.metrics for report in reports)}, "
+        f"{sum(report.metrics for report in reports) / len(reports):.1f} per host, "
+        f"max. {largest.metrics} ({largest.host})",
+        file=out,
+    )
+    crashes = [(r.host, s) for r in reports for s in r.services if s[1] == CRASH]
+    for host, (service, _state, summary) in crashes[:args.limit]:
+        print(f"CRASH {host} {service}: {summary}", file=out)
+    if args.output:
+        print(f"report: {args.output}", file=out)
+
+    if args.diff:
+        diff(read_report(args.diff), report_services(reports), args.limit, out)
+    return 1 if crashes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
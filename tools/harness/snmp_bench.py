@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""End-to-end SNMP cost of the sections in this repo, against a local agent
+
+Serves each stored walk in tools/harness/walks (or --walk) from an SNMPv2c
+responder on loopback and fetches it the way Checkmk does:
+
+    detect  one GET of the prefetched sysDescr and sysObjectID, then one GET
+            per further OID the detect specs of all sections evaluate
+            (lazily, cached for the host)
+    fetch   for every detected section, one walk (GETBULK, or GETNEXT with
+            --bulk-size 0) per column of each SNMPTree; a column whose walk
+            finds nothing is read with an extra GET (scalar OIDs)
+
+Sections no check plugin subscribes to (only inventory plugins or host
+labels use them) are not fetched in the check cycle; their cost is
+reported separately in the "inventory" phase.
+
+The fetched tables are run through the section's parse function as a
+sanity check. Reported: GET/GETNEXT/GETBULK PDUs, bytes on the wire and
+wall time per host, per section and per SNMPTree, the trees ranked by
+fetch cost.
+
+    python3 tools/harness/snmp_bench.py
+    python3 tools/harness/snmp_bench.py --latency cellular --bulk-size 25
+    python3 tools/harness/snmp_bench.py --latency 80,20,0.5 --walk ~/var/check_mk/snmpwalks/site-17
+
+--latency is a profile name (none, lan, metro, cellular, satellite) or
+"<ms>[,<jitter ms>[,<loss %>]]" and delays every answer of the agent;
+lost answers are retransmitted after --timeout, like Checkmk does.
+"""
+
+import argparse
+import glob
+import os
+import re
+import sys
+from itertools import zip_longest
+from typing import NamedTuple
+
+import plugins
+import snmpsim
+
+WALKS_DIR = os.path.join(plugins.HARNESS_DIR, "walks")
+
+SYS_DESCR = ".1.3.6.1.2.1.1.1.0"
+SYS_OBJECT_ID = ".1.3.6.1.2.1.1.2.0"
+
+
+class Cost(NamedTuple):
+    get: int
+    getnext: int
+    getbulk: int
+    sent: int
+    received: int
+    retries: int
+    seconds: float
+
+    @classmethod
+    def zero(cls):
+        return cls(0, 0, 0, 0, 0, 0, 0.0)
+
+    @classmethod
+    def from_delta(cls, delta):
+        pdus, sent, received, retries, seconds = delta
+        return cls(pdus[snmpsim.GET], pdus[snmpsim.GETNEXT], pdus[snmpsim.GETBULK], sent, received, retries, seconds)
+
+    def __add__(self, other):
+        return Cost(*(a + b for a, b in zip(self, other)))
+
+    @property
+    def pdus(self):
+        return self.get + self.getnext + self.getbulk
+
+    @property
+    def bytes(self):
+        return self.sent + self.received
+
+
+class Measured:
+    """Cost of the client requests issued inside a with block"""
+
+    def __init__(self, client):
+        self.client = client
+        self.cost = Cost.zero()
+
+    def __enter__(self):
+        self._before = self.client.stats.snapshot()
+        return self
+
+    def __exit__(self, *_exc):
+        self.cost = Cost.from_delta(snmpsim.Stats.delta(self._before, self.client.stats.snapshot()))
+
+
+def parse_latency(text):
+    if text in snmpsim.LATENCY_PROFILES:
+        return snmpsim.LATENCY_PROFILES[text]
+    values = [float(v) for v in text.split(",")]
+    mean, jitter, loss = (values + [0.0, 0.0])[:3]
+    return snmpsim.Latency(mean / 1000, jitter / 1000, loss / 100)
+
+
+def snmp_sections(registry):
+    return {name: s for name, s in registry.sections.items() if getattr(s, "detect", None) is not None}
+
+
+def trees_of(section):
+    return section.fetch if isinstance(section.fetch, list) else [section.fetch]
+
+
+def detect(client, sections):
+    """Evaluate all detect specs like Checkmk, return the detected section names"""
+    cache = client.get([SYS_DESCR, SYS_OBJECT_ID])
+    detected = []
+    for name, section in sections.items():
+        for conjunction in section.detect:
+            for oid, pattern, flag in conjunction:
+                if oid not in cache:
+                    cache.update(client.get([oid]))
+                value = cache[oid]
+                matched = value is not None and re.fullmatch(
+                    pattern, str(value), re.IGNORECASE | re.DOTALL
+                ) is not None
+                if matched is not flag:
+                    break
+            else:
+                detected.append(name)
+                break
+    return detected
+
+
+def fetch_tree(client, tree, bulk_size):
+    """Walk all columns of an SNMPTree, return its string table"""
+    columns = []
+    suffixes = None
+    for oid in tree.oids:
+        if isinstance(oid, plugins.v2.OIDEnd):
+            columns.append(None)
+            continue
+        column_oid = f"{tree.base}.{oid}"
+        rows = client.walk(column_oid, bulk_size=bulk_size)
+        if suffixes is None:
+            suffixes = [found[len(column_oid) + 1:] for found, _value in rows]
+        if isinstance(oid, plugins.v2.OIDBytes):
+            columns.append([list(str(value).encode()) for _found, value in rows])
+        else:
+            columns.append([str(value) for _found, value in rows])
+    columns = [suffixes or [] if c is None else c for c in columns]
+    return [["" if v is None else v for v in row] for row in zip_longest(*columns)]
+
+
+class TreeResult(NamedTuple):
+    host: str
+    section: str
+    base: str
+    columns: int
+    rows: int
+    cost: Cost
+
+
+class HostResult(NamedTuple):
+    host: str
+    detected: list
+    detect_cost: Cost
+    section_costs: dict
+    parsed: dict
+    trees: list
+    inventory_only: set
+
+
+def check_sections(registry):
+    """Names of the sections fetched in the check cycle"""
+    subscribed = {name for plugin in registry.check_plugins.values() for name in plugins.subscribed_sections(plugin)}
+    return {name for name, section in registry.sections.items() if plugins.parsed_section_name(section) in subscribed}
+
+
+def run_host(host, values, sections, checked, latency, bulk_size, timeout, retries):
+    responder = snmpsim.Responder(values, latency=latency).start()
+    client = snmpsim.Client(responder.address, timeout=timeout, retries=retries)
+    try:
+        with Measured(client) as measured_detect:
+            detected = detect(client, sections)
+        section_costs = {}
+        parsed = {}
+        trees = []
+        for name in detected:
+            section = sections[name]
+            tables = []
+            with Measured(client) as measured_section:
+                for tree in trees_of(section):
+                    with Measured(client) as measured_tree:
+                        table = fetch_tree(client, tree, bulk_size)
+                    tables.append(table)
+                    columns = sum(not isinstance(o, plugins.v2.OIDEnd) for o in tree.oids)
+                    trees.append(TreeResult(host, name, tree.base, columns, len(table), measured_tree.cost))
+            section_costs[name] = measured_section.cost
+            string_table = tables if isinstance(section.fetch, list) else tables[0]
+            parsed[name] = section.parse_function(string_table) is not None
+        return HostResult(
+            host, detected, measured_detect.cost, section_costs, parsed, trees, set(detected) - checked
+        )
+    finally:
+        client.close()
+        responder.stop()
+
+
+def _cost_columns(cost, runs=1):
+    return (
+        f"{cost.get / runs:6.0f} {cost.getnext / runs:8.0f} {cost.getbulk / runs:8.0f} "
+        f"{cost.bytes / runs:9.0f} {1000 * cost.seconds / runs:9.1f}"
+    )
+
+
+COST_HEADER = f"{'GET':>6} {'GETNEXT':>8} {'GETBULK':>8} {'bytes':>9} {'ms':>9}"
+
+
+def report(results):
+    print(f"{'host':28} {'phase':9} {COST_HEADER}  sections")
+    for result in results:
+        phases = {}
+        for inventory in (False, True):
+            names = [n for n in result.detected if (n in result.inventory_only) is inventory]
+            cost = sum((result.section_costs[n] for n in names), Cost.zero())
+            text = ", ".join(n + ("" if result.parsed[n] else " (parse: None)") for n in names)
+            phases[inventory] = (cost, text)
+        fetch, sections = phases[False]
+        print(f"{result.host:28} {'detect':9} {_cost_columns(result.detect_cost)}")
+        print(f"{'':28} {'fetch':9} {_cost_columns(fetch)}  {sections or '-'}")
+        print(f"{'':28} {'total':9} {_cost_columns(result.detect_cost + fetch)}")
+        if phases[True][1]:
+            print(f"{'':28} {'inventory':9} {_cost_columns(phases[True][0])}  {phases[True][1]}")
+
+    print(f"\n{'section (mean per host fetching it)':44} {'hosts':>5} {COST_HEADER}")
+    per_section = {}
+    for result in results:
+        for name, cost in result.section_costs.items():
+            total, hosts = per_section.get(name, (Cost.zero(), 0))
+            per_section[name] = (total + cost, hosts + 1)
+    for name, (cost, hosts) in sorted(per_section.items(), key=lambda i: -i[1][0].pdus / i[1][1]):
+        print(f"{name:44} {hosts:5} {_cost_columns(cost, hosts)}")
+
+    print(f"\n{'SNMPTree by fetch cost (mean per host)':52} {'cols':>4} {'rows':>5} {COST_HEADER}")
+    per_tree = {}
+    for result in results:
+        for tree in result.trees:
+            key = (tree.section, tree.base)
+            total, runs, columns, rows = per_tree.get(key, (Cost.zero(), 0, tree.columns, 0))
+            per_tree[key] = (total + tree.cost, runs + 1, columns, max(rows, tree.rows))
+    ranked = sorted(per_tree.items(), key=lambda i: (-i[1][0].pdus / i[1][1], -i[1][0].bytes / i[1][1]))
+    for (section, base), (cost, runs, columns, rows) in ranked:
+        print(f"{section:22} {base:29} {columns:4} {rows:5} {_cost_columns(cost, runs)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--walk", action="append", help="stored snmpwalk to serve (default: tools/harness/walks)")
+    parser.add_argument("--latency", default="none", help="latency profile or <ms>[,<jitter ms>[,<loss %%>]]")
+    parser.add_argument("--bulk-size", type=int, default=10, help="max-repetitions, 0 for GETNEXT walks")
+    parser.add_argument("--timeout", type=float, default=1.0, help="seconds before a request is resent")
+    parser.add_argument("--retries", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    walks = args.walk or sorted(glob.glob(os.path.join(WALKS_DIR, "*.walk")))
+    latency = parse_latency(args.latency)
+    registry = plugins.load_registry()
+    sections = snmp_sections(registry)
+    checked = check_sections(registry)
+
+    print(
+        f"latency {1000 * latency.mean:.1f} ms +-{1000 * latency.jitter:.1f} ms, "
+        f"loss {100 * latency.loss:.1f} %, bulk size {args.bulk_size}\n"
+    )
+    results = []
+    for path in walks:
+        host = os.path.splitext(os.path.basename(path))[0]
+        results.append(
+            run_host(
+                host, snmpsim.read_walk(path), sections, checked, latency, args.bulk_size, args.timeout,
+                args.retries,
+            )
+        )
+    report(results)
+    return 0 if all(all(r.parsed.values()) for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,414 @@
+"""Minimal SNMPv2c agent and manager over loopback, for benchmarks only
+
+    agent = Responder(read_walk("walks/edfamux.walk"), latency=LATENCY_PROFILES["cellular"])
+    agent.start()
+    client = Client(agent.address)
+    client.get([".1.3.6.1.2.1.1.1.0"])
+    client.walk(".1.3.6.1.4.1.55872.1.4.1.1.3", bulk_size=10)
+    print(client.stats)
+
+Only the BER subset SNMP needs is implemented: INTEGER, OCTET STRING,
+NULL, OBJECT IDENTIFIER, the application types and the GET, GETNEXT,
+GETBULK and Response PDUs. The responder serves a stored snmpwalk
+(Checkmk format, one "<oid> <value>" per line) and can delay or drop
+answers according to a latency profile. The client counts every PDU
+and every byte it sends and receives, including retransmissions.
+"""
+
+import bisect
+import random
+import socket
+import threading
+import time
+from typing import NamedTuple
+
+# ------------------------
+# BER encoding
+# ------------------------
+
+INTEGER = 0x02
+OCTET_STRING = 0x04
+NULL = 0x05
+OBJECT_IDENTIFIER = 0x06
+SEQUENCE = 0x30
+IP_ADDRESS = 0x40
+COUNTER32 = 0x41
+GAUGE32 = 0x42
+TIMETICKS = 0x43
+COUNTER64 = 0x46
+NO_SUCH_OBJECT = 0x80
+NO_SUCH_INSTANCE = 0x81
+END_OF_MIB_VIEW = 0x82
+
+GET = 0xA0
+GETNEXT = 0xA1
+RESPONSE = 0xA2
+GETBULK = 0xA5
+
+PDU_NAMES = {GET: "GET", GETNEXT: "GETNEXT", GETBULK: "GETBULK", RESPONSE: "RESPONSE"}
+
+SNMP_V2C = 1
+
+
+def _encode_length(length):
+    if length < 0x80:
+        return bytes([length])
+    raw = length.to_bytes((length.bit_length() + 7) // 8, "big")
+    return bytes([0x80 | len(raw)]) + raw
+
+
+def encode_tlv(tag, payload):
+    return bytes([tag]) + _encode_length(len(payload)) + payload
+
+
+def _integer_bytes(value):
+    return value.to_bytes(max(1, (value.bit_length() + 8) // 8), "big", signed=True)
+
+
+def encode_integer(value, tag=INTEGER):
+    return encode_tlv(tag, _integer_bytes(value))
+
+
+def encode_oid(oid):
+    parts = oid if isinstance(oid, tuple) else parse_oid(oid)
+    body = bytearray([parts[0] * 40 + parts[1]])
+    for part in parts[2:]:
+        chunk = [part & 0x7F]
+        part >>= 7
+        while part:
+            chunk.append(0x80 | (part & 0x7F))
+            part >>= 7
+        body.extend(reversed(chunk))
+    return encode_tlv(OBJECT_IDENTIFIER, bytes(body))
+
+
+def encode_sequence(*items, tag=SEQUENCE):
+    return encode_tlv(tag, b"".join(items))
+
+
+def decode_tlv(data, pos=0):
+    """Return (tag, payload, position after the TLV)"""
+    tag = data[pos]
+    length = data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        count = length & 0x7F
+        length = int.from_bytes(data[pos:pos + count], "big")
+        pos += count
+    return tag, data[pos:pos + length], pos + length
+
+
+def decode_sequence(payload):
+    items = []
+    pos = 0
+    while pos < len(payload):
+        tag, value, pos = decode_tlv(payload, pos)
+        items.append((tag, value))
+    return items
+
+
+def decode_oid(payload):
+    parts = [payload[0] // 40, payload[0] % 40]
+    value = 0
+    for byte in payload[1:]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            parts.append(value)
+            value = 0
+    return tuple(parts)
+
+
+def decode_value(tag, payload):
+    if tag == INTEGER:
+        return int.from_bytes(payload, "big", signed=True)
+    if tag in (COUNTER32, GAUGE32, TIMETICKS, COUNTER64):
+        return int.from_bytes(payload, "big")
+    if tag == OCTET_STRING:
+        return payload.decode("utf-8", "replace")
+    if tag == OBJECT_IDENTIFIER:
+        return format_oid(decode_oid(payload))
+    if tag == IP_ADDRESS:
+        return ".".join(str(b) for b in payload)
+    return None  # NULL, noSuchObject, noSuchInstance, endOfMibView
+
+
+def parse_oid(oid):
+    return tuple(int(part) for part in oid.strip(".").split("."))
+
+
+def format_oid(parts):
+    return "." + ".".join(str(p) for p in parts)
+
+
+# ------------------------
+# Messages
+# ------------------------
+
+
+class Pdu(NamedTuple):
+    kind: int
+    request_id: int
+    error_status: int  # non-repeaters for GETBULK
+    error_index: int  # max-repetitions for GETBULK
+    varbinds: list  # [(oid tuple, tag, raw value)]
+
+
+def encode_message(community, pdu):
+    varbinds = [
+        encode_sequence(encode_oid(oid), encode_tlv(tag, raw)) for oid, tag, raw in pdu.varbinds
+    ]
+    return encode_sequence(
+        encode_integer(SNMP_V2C),
+        encode_tlv(OCTET_STRING, community.encode()),
+        encode_sequence(
+            encode_integer(pdu.request_id),
+            encode_integer(pdu.error_status),
+            encode_integer(pdu.error_index),
+            encode_sequence(*varbinds),
+            tag=pdu.kind,
+        ),
+    )
+
+
+def decode_message(data):
+    """Return (community, Pdu) of an SNMPv2c message"""
+    _tag, message, _end = decode_tlv(data)
+    (_vtag, _version), (_ctag, community), (kind, body) = decode_sequence(message)
+    fields = decode_sequence(body)
+    request_id, error_status, error_index = (decode_value(INTEGER, v) for _t, v in fields[:3])
+    varbinds = []
+    for _stag, varbind in decode_sequence(fields[3][1]):
+        (_otag, oid), (tag, raw) = decode_sequence(varbind)
+        varbinds.append((decode_oid(oid), tag, raw))
+    return community.decode(), Pdu(kind, request_id, error_status, error_index, varbinds)
+
+
+# ------------------------
+# Agent
+# ------------------------
+
+
+def read_walk(path):
+    """Read a Checkmk stored snmpwalk into {oid: value string}"""
+    values = {}
+    with open(path, encoding="utf-8", errors="replace") as walk:
+        for line in walk:
+            oid, _, value = line.rstrip("\n").partition(" ")
+            if len(value) >= 2 and value[0] == value[-1] == '"':
+                value = value[1:-1]
+            values[oid] = value
+    return values
+
+
+def _typed(value):
+    """(tag, raw) of a stored walk value: integer, OID or string"""
+    if value.lstrip("-").isdigit():
+        return INTEGER, _integer_bytes(int(value))
+    if value.startswith(".1.") and all(p.isdigit() for p in value[1:].split(".")):
+        return OBJECT_IDENTIFIER, decode_tlv(encode_oid(value))[1]
+    return OCTET_STRING, value.encode()
+
+
+class Latency(NamedTuple):
+    """Per request: delay = mean +- jitter (uniform), dropped with probability loss"""
+
+    mean: float
+    jitter: float = 0.0
+    loss: float = 0.0
+
+    def delay(self, rng):
+        return max(self.mean + rng.uniform(-self.jitter, self.jitter), 0.0)
+
+
+LATENCY_PROFILES = {
+    "none": Latency(0.0),
+    "lan": Latency(0.0005, 0.0002),
+    "metro": Latency(0.015, 0.005),
+    "cellular": Latency(0.120, 0.060, 0.01),
+    "satellite": Latency(0.600, 0.050, 0.02),
+}
+
+
+class Responder:
+    """SNMPv2c agent on a loopback UDP port serving one stored walk"""
+
+    def __init__(self, values, latency=LATENCY_PROFILES["none"], community="public", seed=0):
+        self.oids = sorted(parse_oid(oid) for oid in values)
+        self.values = {parse_oid(oid): _typed(value) for oid, value in values.items()}
+        self.latency = latency
+        self.community = community
+        self._rng = random.Random(seed)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind(("127.0.0.1", 0))
+        self.address = self._sock.getsockname()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._sock.close()
+
+    def _next(self, oid):
+        pos = bisect.bisect_right(self.oids, oid)
+        if pos == len(self.oids):
+            return oid, END_OF_MIB_VIEW, b""
+        found = self.oids[pos]
+        return (found,) + self.values[found]
+
+    def answer(self, pdu):
+        varbinds = []
+        if pdu.kind == GET:
+            for oid, _tag, _raw in pdu.varbinds:
+                tag, raw = self.values.get(oid, (NO_SUCH_INSTANCE, b""))
+                varbinds.append((oid, tag, raw))
+        elif pdu.kind == GETNEXT:
+            varbinds = [self._next(oid) for oid, _tag, _raw in pdu.varbinds]
+        elif pdu.kind == GETBULK:
+            # RFC 3416: the repetitions of all repeaters interleaved, row by
+            # row, until every one of them has reached the end of the MIB
+            non_repeaters = pdu.error_status
+            varbinds = [self._next(oid) for oid, _tag, _raw in pdu.varbinds[:non_repeaters]]
+            current = [oid for oid, _tag, _raw in pdu.varbinds[non_repeaters:]]
+            for _ in range(pdu.error_index if current else 0):
+                row = [self._next(oid) for oid in current]
+                varbinds.extend(row)
+                if all(tag == END_OF_MIB_VIEW for _oid, tag, _raw in row):
+                    break
+                current = [oid for oid, _tag, _raw in row]
+        return Pdu(RESPONSE, pdu.request_id, 0, 0, varbinds)
+
+    def _reply(self, data, peer):
+        try:
+            community, pdu = decode_message(data)
+        except (IndexError, ValueError):
+            return
+        if community != self.community:
+            return
+        try:
+            self._sock.sendto(encode_message(community, self.answer(pdu)), peer)
+        except OSError:
+            pass
+
+    def _serve(self):
+        while True:
+            try:
+                data, peer = self._sock.recvfrom(65535)
+            except OSError:
+                return
+            with self._lock:
+                dropped = self._rng.random() < self.latency.loss
+                delay = self.latency.delay(self._rng)
+            if dropped:
+                continue
+            if delay:
+                threading.Timer(delay, self._reply, (data, peer)).start()
+            else:
+                self._reply(data, peer)
+
+
+# ------------------------
+# Manager
+# ------------------------
+
+
+class Stats:
+    """PDU and byte counters of a client, by PDU type"""
+
+    def __init__(self):
+        self.pdus = {GET: 0, GETNEXT: 0, GETBULK: 0}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.seconds = 0.0
+
+    def snapshot(self):
+        return (dict(self.pdus), self.bytes_sent, self.bytes_received, self.retries, self.seconds)
+
+    @staticmethod
+    def delta(before, after):
+        pdus = {kind: after[0][kind] - before[0][kind] for kind in after[0]}
+        return (pdus,) + tuple(a - b for a, b in zip(after[1:], before[1:]))
+
+
+class SNMPTimeout(Exception):
+    pass
+
+
+class Client:
+    """Blocking SNMPv2c manager with Checkmk-like timeout and retries"""
+
+    def __init__(self, address, community="public", timeout=1.0, retries=5):
+        self.address = address
+        self.community = community
+        self.timeout = timeout
+        self.retries = retries
+        self.stats = Stats()
+        self._request_id = 0
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def close(self):
+        self._sock.close()
+
+    def request(self, kind, oids, non_repeaters=0, max_repetitions=0):
+        self._request_id += 1
+        pdu = Pdu(kind, self._request_id, non_repeaters, max_repetitions, [(o, NULL, b"") for o in oids])
+        data = encode_message(self.community, pdu)
+        start = time.perf_counter()
+        try:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    self.stats.retries += 1
+                self._sock.sendto(data, self.address)
+                self.stats.pdus[kind] += 1
+                self.stats.bytes_sent += len(data)
+                deadline = time.perf_counter() + self.timeout
+                while (remaining := deadline - time.perf_counter()) > 0:
+                    self._sock.settimeout(remaining)
+                    try:
+                        answer = self._sock.recv(65535)
+                    except socket.timeout:
+                        break
+                    self.stats.bytes_received += len(answer)
+                    _community, response = decode_message(answer)
+                    if response.request_id == self._request_id:
+                        return response.varbinds
+            raise SNMPTimeout(f"no answer from {self.address} after {self.retries} retries")
+        finally:
+            self.stats.seconds += time.perf_counter() - start
+
+    def get(self, oids):
+        """{oid: value or None} of the given OIDs"""
+        varbinds = self.request(GET, [parse_oid(o) for o in oids])
+        return {format_oid(oid): decode_value(tag, raw) for oid, tag, raw in varbinds}
+
+    def walk(self, oid, bulk_size=10):
+        """[(oid, value)] below oid, like snmpbulkwalk (snmpwalk if bulk_size is 0)
+
+        Like net-snmp, a walk that finds nothing below oid falls back to a
+        GET of oid itself, so scalar OIDs in an SNMPTree cost one more PDU.
+        """
+        root = parse_oid(oid)
+        rows = []
+        current = root
+        while True:
+            if bulk_size:
+                varbinds = self.request(GETBULK, [current], 0, bulk_size)
+            else:
+                varbinds = self.request(GETNEXT, [current])
+            for found, tag, raw in varbinds:
+                if tag == END_OF_MIB_VIEW or found[: len(root)] != root:
+                    break
+                rows.append((format_oid(found), decode_value(tag, raw)))
+                current = found
+            else:
+                if varbinds:
+                    continue
+            break
+        if not rows:
+            value = self.get([oid])[oid]
+            if value is not None:
+                rows.append((oid, value))
+        return rows